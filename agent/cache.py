@@ -0,0 +1,76 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from config import LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES
+from logger import logger
+
+
+class LLMCache:
+    # Persistent content-addressed store of LLM answers, keyed on model + prompt template + listing text.
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model, prompt_template, text):
+        raw = "\x1f".join([model, prompt_template.strip(), text])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key, track=True):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                row = None
+            if row is None:
+                self.misses += track
+                return None
+            self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += track
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        if self.ttl:
+            self._db.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if self.max_entries and count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            logger.info(f"LLM cache evicted {count - self.max_entries} least recently used entries.")
+
+    def describe(self):
+        return f"LLM cache: {self.hits} hits, {self.misses} misses."
+
+    def close(self):
+        with self._lock:
+            self._db.close()
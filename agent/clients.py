@@ -0,0 +1,108 @@
+import atexit
+import hashlib
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from config import LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, LLM_POOL_SIZE, LLM_KEEPALIVE_EXPIRY
+
+# One configured, connection-pooled client per provider/model/endpoint for the whole process,
+# so batched extraction reuses TCP/TLS connections instead of rebuilding clients per call.
+_clients = {}
+_clients_lock = threading.Lock()
+_created = {"count": 0}
+
+
+def _secret(value):
+    return hashlib.sha256((value or "").encode("utf-8")).hexdigest()[:12]
+
+
+def get_client(key, factory):
+    with _clients_lock:
+        if key not in _clients:
+            if not _clients:
+                atexit.register(close_clients)
+            _clients[key] = factory()
+            _created["count"] += 1
+        return _clients[key]
+
+
+def timeout():
+    return (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+
+
+class _ThreadSessions:
+    # requests.Session is not thread-safe, so each thread gets its own; they all mount one
+    # HTTPAdapter, whose connection pool is.
+    def __init__(self):
+        self.adapter = HTTPAdapter(pool_connections=LLM_POOL_SIZE, pool_maxsize=LLM_POOL_SIZE)
+        self._local = threading.local()
+
+    def get(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+        return session
+
+    def close(self):
+        self.adapter.close()
+
+
+def http_session(name="default"):
+    # The calling thread's session for `name`.
+    return get_client(("session", name), _ThreadSessions).get()
+
+
+def openai_chat(model, api_key, base_url=None):
+    def factory():
+        import httpx
+        from langchain_openai import ChatOpenAI
+        http_client = httpx.Client(
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE,
+                                keepalive_expiry=LLM_KEEPALIVE_EXPIRY),
+        )
+        return ChatOpenAI(
+            temperature=0,
+            model=model,
+            openai_api_key=api_key,
+            base_url=base_url,
+            timeout=LLM_READ_TIMEOUT,
+            http_client=http_client
+        )
+    return get_client(("openai", model, base_url, _secret(api_key)), factory)
+
+
+def ollama_chat(model, base_url):
+    def factory():
+        from langchain_community.chat_models import ChatOllama
+        return ChatOllama(
+            temperature=0,
+            model=model,
+            base_url=base_url,
+            timeout=int(LLM_READ_TIMEOUT)
+        )
+    return get_client(("ollama", model, base_url), factory)
+
+
+def describe():
+    with _clients_lock:
+        kinds = sorted({key[0] for key in _clients})
+        return f"LLM clients: {len(_clients)} live ({', '.join(kinds) or 'none'}), {_created['count']} created."
+
+
+def close_clients():
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        close = getattr(client, "close", None)
+        http_client = getattr(client, "http_client", None)
+        try:
+            if close is not None:
+                close()
+            elif http_client is not None:
+                http_client.close()
+        except Exception:
+            pass
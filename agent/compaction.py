@@ -0,0 +1,80 @@
+import math
+import re
+from collections import Counter
+from agent.tokens import estimate_tokens
+from config import COMPACTION_MIN_SHARE, COMPACTION_MAX_TOKENS
+
+SEPARATOR = " | "
+SPACE_RE = re.compile(r"\s+")
+DIGIT_RE = re.compile(r"\d")
+NUMBER_RE = re.compile(r"[\d\s$€£.,%+/-]*\d[\d\s$€£.,%+/-]*")
+
+
+def fragments(text):
+    # Splits a listing on the extractor's separator, collapsing whitespace and
+    # dropping empty and immediately repeated fragments (e.g. alt text echoing a title).
+    result = []
+    for part in text.split("|"):
+        part = SPACE_RE.sub(" ", part).strip()
+        if part and (not result or result[-1] != part):
+            result.append(part)
+    return result
+
+
+def learn_boilerplate(listings, min_share=COMPACTION_MIN_SHARE, outside=None):
+    # A fragment is boilerplate when it recurs across a large share of the page's listings,
+    # carries no digits (prices, beds, addresses) and is not usually a label next to a bare number.
+    # With `outside` (fragments of the page text around the cards), it must also appear there:
+    # a value most listings share, like the suburb or "House", is still a field value.
+    split = [fragments(text) for text in listings]
+    if len(split) < 2:
+        return set()
+    counts, labels = Counter(), Counter()
+    for parts in split:
+        for i, part in enumerate(parts):
+            neighbours = parts[max(0, i - 1):i] + parts[i + 1:i + 2]
+            if any(NUMBER_RE.fullmatch(n) for n in neighbours):
+                labels[part] += 1
+        counts.update(set(parts))
+    threshold = max(2, math.ceil(min_share * len(split)))
+    return {
+        part for part, count in counts.items()
+        if count >= threshold and not DIGIT_RE.search(part) and labels[part] * 2 <= count
+        and (outside is None or part in outside)
+    }
+
+
+def truncate(parts, max_tokens):
+    kept, used = [], 0
+    for part in parts:
+        cost = estimate_tokens(part) + 1
+        if kept and used + cost > max_tokens:
+            break
+        kept.append(part)
+        used += cost
+    return kept
+
+
+def compact_listings(listings, learn_from=None, max_tokens=COMPACTION_MAX_TOKENS, outside=None):
+    # Returns (compacted listings, report). Boilerplate is learned from `learn_from`
+    # (e.g. every listing on the crawled pages) so small trimmed sets still benefit.
+    boilerplate = learn_boilerplate(learn_from if learn_from is not None else listings, outside=outside)
+    compacted = []
+    for text in listings:
+        parts = [part for part in fragments(text) if part not in boilerplate]
+        if max_tokens:
+            parts = truncate(parts, max_tokens)
+        compacted.append(SEPARATOR.join(parts) if parts else text.strip())
+    report = {
+        "tokens_before": sum(estimate_tokens(text) for text in listings),
+        "tokens_after": sum(estimate_tokens(text) for text in compacted),
+        "boilerplate": sorted(boilerplate),
+    }
+    return compacted, report
+
+
+def describe_report(report):
+    before, after = report["tokens_before"], report["tokens_after"]
+    saved = 100 * (before - after) / before if before else 0
+    return (f"Compacted listings: {before} -> {after} tokens (-{saved:.0f}%), "
+            f"stripped {len(report['boilerplate'])} boilerplate fragments.")
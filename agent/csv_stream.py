@@ -0,0 +1,108 @@
+import csv
+import io
+from config import LLM_STREAM_MAX_BAD_ROWS
+
+
+class MalformedOutput(ValueError):
+    pass
+
+
+def normalize_header(header):
+    return [col.strip().strip('"').lower() for col in header]
+
+
+class CsvStreamParser:
+    # Turns streamed LLM text into CSV rows as each record completes: preamble and code
+    # fences are skipped, quoted fields may span lines, rows are padded to the header width
+    # and too many malformed rows abort the stream with MalformedOutput.
+    #
+    # Batches of one run share `reference` (a dict); the first header seen becomes the
+    # canonical one and later headers with the same columns in another order are remapped.
+    def __init__(self, reference=None, max_bad_rows=LLM_STREAM_MAX_BAD_ROWS):
+        self.reference = reference if reference is not None else {}
+        self.max_bad_rows = max_bad_rows
+        self.header = None
+        self.rows = []
+        self.bad_rows = []
+        self._order = None
+        self._buffer = ""
+        self._record = ""
+        self._in_fence = False
+        self._done = False
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        new_rows = []
+        for line in lines:
+            new_rows.extend(self._line(line))
+        return new_rows
+
+    def finish(self):
+        new_rows = self._line(self._buffer) if self._buffer else []
+        self._buffer = ""
+        if self._record and not self._done:
+            record, self._record = self._record, ""
+            new_rows.extend(self._complete(record))
+        return new_rows
+
+    def text(self):
+        if self.header is None:
+            return ""
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows([self.header] + self.rows)
+        return buffer.getvalue().rstrip("\n")
+
+    def _line(self, line):
+        if self._done:
+            return []
+        if not self._record and line.strip().startswith("```"):
+            # An opening fence starts the table; a closing one (or a fence after the rows) ends it.
+            if self._in_fence or self.header is not None:
+                self._done = True
+            self._in_fence = True
+            return []
+        if self.header is None:
+            return self._complete(line)
+        self._record = f"{self._record}\n{line}" if self._record else line
+        if self._record.count('"') % 2:
+            return []
+        record, self._record = self._record, ""
+        return self._complete(record)
+
+    def _complete(self, record):
+        if not record.strip():
+            return []
+        if self.header is None:
+            # Inside a fence the first line is the header, even a one-column one.
+            header = next(csv.reader([record.strip()]), [])
+            if (len(header) > 1 or self._in_fence) and not record.rstrip().endswith(":"):
+                self._set_header(header)
+            return []
+        row = self._validate(record)
+        if row is None:
+            return []
+        self.rows.append(row)
+        return [row]
+
+    def _set_header(self, header):
+        header = [col.strip() for col in header]
+        canonical = self.reference.setdefault("header", header)
+        names, wanted = normalize_header(header), normalize_header(canonical)
+        if names != wanted and sorted(names) == sorted(wanted):
+            self._order = [names.index(name) for name in wanted]
+            header = list(canonical)
+        self.header = header
+
+    def _validate(self, record):
+        width = len(self.header)
+        row = next(csv.reader(io.StringIO(record.strip())), [])
+        if (width > 1 and len(row) < 2) or any(col.strip() for col in row[width:]):
+            self.bad_rows.append(record)
+            if len(self.bad_rows) > self.max_bad_rows:
+                raise MalformedOutput(f"{len(self.bad_rows)} malformed CSV rows, last: {record.strip()[:80]!r}")
+            return None
+        row = [" ".join(col.split()) for col in (row + [""] * width)[:width]]
+        if not any(row):
+            return None
+        return [row[i] for i in self._order] if self._order else row
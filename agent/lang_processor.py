@@ -1,7 +1,312 @@
+import csv
+import hashlib
+import io
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from langchain.prompts import PromptTemplate
+from agent.csv_stream import CsvStreamParser, normalize_header
 from agent.llm import LLMHandler
+from agent.tokens import estimate_tokens, input_budget
+from config import LLM_CONCURRENCY, LLM_MAX_BACKOFF, LLM_STREAMING
+from logger import logger
+from metrics import timed
+
+FENCE_RE = re.compile(r"^```")
+NON_WORD_RE = re.compile(r"[^\w]+")
+# Minimum seconds between partial-row reports from one streamed batch.
+STREAM_REPORT_INTERVAL = 0.1
+# Seconds between checks of a run's cancel event while waiting on LLM batches.
+CANCEL_POLL_INTERVAL = 0.2
+
 
 def langchain_process(scraped_data, prompt_text):
     content = "\n".join(scraped_data)
     prompt = PromptTemplate.from_template(prompt_text.strip()).format(data=content)
-    return LLMHandler().generate_response(prompt)
\ No newline at end of file
+    return LLMHandler().generate_response(prompt)
+
+
+def make_batches(scraped_data, prompt_text, budget):
+    # Greedily packs listings into batches whose prompt stays under `budget` tokens.
+    available = max(1, budget - estimate_tokens(prompt_text))
+    batches, current, used = [], [], 0
+    for item in scraped_data:
+        cost = estimate_tokens(item) + 1
+        if current and used + cost > available:
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _retry_delay(error, attempt):
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    message = str(error).lower()
+    if status in (429, 503) or "rate limit" in message or "429" in message:
+        retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+        try:
+            return min(LLM_MAX_BACKOFF, float(retry_after))
+        except (TypeError, ValueError):
+            return min(LLM_MAX_BACKOFF, 2 ** attempt) * (0.5 + random.random())
+    return 1
+
+
+class LLMCancelled(Exception):
+    pass
+
+
+def _with_backoff(call, retries, stop=None):
+    # `stop` (a threading.Event) ends the retries: no new attempt starts and backoff waits are cut short.
+    for attempt in range(retries):
+        if stop is not None and stop.is_set():
+            raise LLMCancelled("LLM batch cancelled.")
+        try:
+            return call()
+        except LLMCancelled:
+            raise
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning(f"LLM attempt {attempt + 1} failed: {e}; retrying in {delay:.1f}s")
+            if stop is None:
+                time.sleep(delay)
+            elif stop.wait(delay):
+                raise LLMCancelled("LLM batch cancelled.")
+
+
+def _generate_with_backoff(handler, prompt, retries, stop=None):
+    # A request already sent is not interrupted, but no retry follows once `stop` is set.
+    return _with_backoff(lambda: handler.generate_response(prompt), retries, stop)
+
+
+def _stream_rows(handler, prompt, reference, on_rows, stop=None):
+    # One streamed attempt: rows reach `on_rows` line by line, and a MalformedOutput from the
+    # parser or a set `stop` closes the stream (and its HTTP request) early.
+    parser = CsvStreamParser(reference)
+    reported, last_report = 0, 0.0
+    with closing(handler.stream_response(prompt)) as stream:
+        for chunk in stream:
+            if stop is not None and stop.is_set():
+                raise LLMCancelled("LLM batch cancelled.")
+            if parser.feed(chunk) and time.monotonic() - last_report >= STREAM_REPORT_INTERVAL:
+                on_rows(parser)
+                reported, last_report = len(parser.rows), time.monotonic()
+    parser.finish()
+    if len(parser.rows) > reported:
+        on_rows(parser)
+    if parser.header is None:
+        raise ValueError("LLM output contained no CSV header.")
+    return parser.text()
+
+
+def _stream_with_backoff(handler, prompt, retries, reference, on_rows, stop=None):
+    return _with_backoff(lambda: _stream_rows(handler, prompt, reference, on_rows, stop), retries, stop)
+
+
+def _split_cached(scraped_data, keys, cache):
+    cached, pending = [], []
+    for item in scraped_data:
+        row = cache.get(keys[item])
+        if row is None:
+            pending.append(item)
+        else:
+            cached.append((item, row))
+    return cached, pending
+
+
+def _words(text):
+    return " " + " ".join(NON_WORD_RE.sub(" ", text.lower()).split()) + " "
+
+
+def match_rows(batch, rows, min_share=0.5):
+    # Pairs rows (lists of cell values) with the listing whose text contains the most of their
+    # cell text (by length, whole words only); returns {listing: row index}. Rows found less
+    # than min_share in any listing, tied between listings or sharing a listing with another
+    # row are left out.
+    texts = [_words(item) for item in batch]
+    claims = {}
+    for r, row in enumerate(rows):
+        cells = [cell for cell in map(_words, row) if len(cell.strip()) >= 3]
+        scores = sorted(((sum(len(cell) for cell in cells if cell in text), i) for i, text in enumerate(texts)),
+                        reverse=True)
+        best = scores[0][0] if scores else 0
+        if best and best >= min_share * sum(map(len, cells)) and (len(scores) == 1 or best > scores[1][0]):
+            claims.setdefault(scores[0][1], []).append(r)
+    return {batch[i]: matched[0] for i, matched in claims.items() if len(matched) == 1}
+
+
+def _store_rows(cache, keys, header_key, batch, output):
+    # Rows are cached under the listing they were matched to by content, never by position, so
+    # a model that reorders, merges or drops rows cannot file a row under the wrong listing.
+    lines = csv_lines(output)
+    if not lines:
+        return
+    rows = lines[1:]
+    matched = match_rows(batch, [next(csv.reader([row]), []) for row in rows])
+    if len(matched) < len(batch):
+        logger.info(f"Matched {len(matched)} of {len(batch)} LLM rows to their listings; only those are cached.")
+    if not matched:
+        return
+    cache.set(header_key, lines[0])
+    for item, r in matched.items():
+        cache.set(keys[item], rows[r])
+
+
+def batch_key(model, prompt_text, batch):
+    raw = "\x1f".join([model, prompt_text.strip(), *batch])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def process_batches(scraped_data, prompt_text, concurrency=LLM_CONCURRENCY, retries=3, cache=None,
+                    stream=LLM_STREAMING, metrics=None, results=None, key_texts=None, cancel_event=None):
+    # Yields (batch_index, batch, output, done). With streaming, a batch reports its CSV so far
+    # (done=False) whenever new rows complete, then its final output (done=True). With a cache,
+    # previously seen listings come back first as one synthetic batch and skip the model.
+    # `key_texts`, parallel to scraped_data, are what the cache keys are built from instead of the
+    # listings themselves, e.g. the text before compaction, which depends on the other listings.
+    # Setting cancel_event, or closing the generator, stops batches in flight between stream
+    # chunks and retries, and ends the generator.
+    # `results` (a CrawlFrontier) keeps whole batch outputs, so a resumed run re-prompts nothing
+    # it already finished, even when the per-listing cache could not attribute the rows.
+    handler = LLMHandler()
+    model = f"{handler.llm_type}:{handler.model_name}"
+    keys, header_key = {}, None
+    if cache is not None:
+        sources = dict(zip(scraped_data, key_texts)) if key_texts is not None else {}
+        keys = {item: cache.make_key(model, prompt_text, sources.get(item, item)) for item in scraped_data}
+        header_key = cache.make_key(model, prompt_text, "")
+        cached, scraped_data = _split_cached(scraped_data, keys, cache)
+        header = cache.get(header_key, track=False) if cached else None
+        if cached and header is not None:
+            yield -1, [item for item, _ in cached], "\n".join([header] + [row for _, row in cached]), True
+        elif cached:
+            scraped_data = [item for item, _ in cached] + scraped_data
+
+    batches = make_batches(scraped_data, prompt_text, input_budget(handler.model_name))
+    if not batches:
+        return
+    batch_keys = [batch_key(model, prompt_text, batch) for batch in batches] if results is not None else []
+    pending, reference = [], {}
+    for i, batch in enumerate(batches):
+        saved = results.batch_output(batch_keys[i]) if results is not None else None
+        if saved is None:
+            pending.append(i)
+            continue
+        lines = csv_lines(saved)
+        if lines and "header" not in reference:
+            # Streamed batches still line their columns up with the header of the saved ones.
+            reference["header"] = next(csv.reader([lines[0]]))
+        yield i, batch, saved, True
+    if not pending:
+        return
+    template = PromptTemplate.from_template(prompt_text.strip())
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def run(i, batch):
+        prompt = template.format(data="\n".join(batch))
+        with timed(metrics, "llm", model=model, batch=i, listings=len(batch), stream=stream,
+                   tokens_in=estimate_tokens(prompt)) as fields:
+            if not stream:
+                output = _generate_with_backoff(handler, prompt, retries, stop)
+            else:
+                output = _stream_with_backoff(handler, prompt, retries, reference,
+                                              lambda parser: events.put((i, batch, parser.text(), None)), stop)
+            fields["tokens_out"] = estimate_tokens(output)
+        return output
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pending))), thread_name_prefix="llm")
+    try:
+        for i in pending:
+            future = pool.submit(run, i, batches[i])
+            future.add_done_callback(lambda f, i=i, batch=batches[i]: events.put((i, batch, None, f)))
+        remaining = len(pending)
+        while remaining:
+            try:
+                i, batch, partial, future = events.get(timeout=CANCEL_POLL_INTERVAL)
+            except queue.Empty:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                continue
+            if future is None:
+                yield i, batch, partial, False
+                continue
+            remaining -= 1
+            output = future.result()
+            if cache is not None:
+                _store_rows(cache, keys, header_key, batch, output)
+            if results is not None:
+                results.save_batch(batch_keys[i], output)
+            yield i, batch, output, True
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def csv_lines(output):
+    # The table in an LLM answer: the fenced block if there is one, from its header on. Unfenced,
+    # the header is the first line with several fields (or, for a one-column table, the first
+    # line not introducing it with a colon). Rows are kept when csv.reader finds them a fit for
+    # the header: several fields for a multi-column table, no non-empty fields past its width.
+    lines = output.strip().splitlines()
+    fences = [i for i, line in enumerate(lines) if FENCE_RE.match(line.strip())]
+    if len(fences) >= 2:
+        lines = lines[fences[0] + 1:fences[1]]
+    elif fences:
+        lines = lines[fences[0] + 1:]
+    lines = [line.strip() for line in lines if line.strip()]
+    rows = [next(csv.reader([line]), []) for line in lines]
+    prose = [line.endswith(":") for line in lines]
+    start = None if fences else next((i for i, row in enumerate(rows) if len(row) > 1 and not prose[i]), None)
+    if start is None:
+        start = next((i for i in range(len(lines)) if not prose[i]), None)
+    if start is None:
+        return []
+    width = len(rows[start])
+    return [lines[start]] + [line for line, row in zip(lines[start + 1:], rows[start + 1:])
+                             if (len(row) > 1 or width == 1) and not any(col.strip() for col in row[width:])]
+
+
+def merge_csv_outputs(outputs):
+    # Joins per-batch CSV answers under the header of the first one.
+    header = None
+    merged = []
+    for output in outputs:
+        lines = csv_lines(output)
+        if not lines:
+            continue
+        if header is None:
+            header = lines[0]
+            merged.append(header)
+            lines = lines[1:]
+        elif normalize_header(next(csv.reader([lines[0]]))) == normalize_header(next(csv.reader([header]))):
+            lines = lines[1:]
+        else:
+            logger.warning(f"Batch header mismatch, keeping rows: {lines[0]}")
+        merged.extend(lines)
+    return "\n".join(merged)
+
+
+def parse_csv(text):
+    # Returns (header, rows) with every row padded or trimmed to the header width.
+    reader = csv.reader(io.StringIO("\n".join(csv_lines(text))))
+    rows = [row for row in reader if any(col.strip() for col in row)]
+    if not rows:
+        return [], []
+    header, width = rows[0], len(rows[0])
+    return header, [(row + [""] * width)[:width] for row in rows[1:]]
+
+
+def langchain_process_batched(scraped_data, prompt_text, concurrency=LLM_CONCURRENCY, retries=3, cache=None):
+    outputs = {i: output for i, _, output, done in process_batches(scraped_data, prompt_text, concurrency, retries, cache)
+               if done}
+    return merge_csv_outputs([outputs[i] for i in sorted(outputs)])
@@ -1,19 +1,30 @@
-import requests
+import json
 from langchain.schema import HumanMessage
+from agent import clients
 from config import (
     LLM_TYPE,
     OPENAI_MODEL,
     OLLAMA_MODEL,
     OLLAMA_API_URL,
+    DEEPSEEK_API_URL,
     cfg
 )
 
 class LLMHandler:
     def __init__(self):
         self.llm_type = LLM_TYPE.lower()
+        self.deepseek_url = DEEPSEEK_API_URL
+
+    @property
+    def model_name(self):
+        if self.llm_type == "deepseek":
+            return cfg.get("llm", {}).get("deepseek_model_name", "deepseek-chat")
+        if self.llm_type == "ollama":
+            return OLLAMA_MODEL
+        return OPENAI_MODEL
 
     def _call_deepseek_api(self, prompt, model_name, api_key):
-        url = "https://api.deepseek.com/v1/chat/completions"
+        url = f"{self.deepseek_url.rstrip('/')}/chat/completions"
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
@@ -22,25 +33,41 @@ class LLMHandler:
             "model": model_name,
             "messages": [{"role": "user", "content": prompt}]
         }
-        response = requests.post(url, headers=headers, json=payload)
+        response = clients.http_session("deepseek").post(url, headers=headers, json=payload,
+                                                         timeout=clients.timeout())
         response.raise_for_status()
         return response.json()["choices"][0]["message"]["content"].strip()
 
+    def _stream_deepseek_api(self, prompt, model_name, api_key):
+        url = f"{self.deepseek_url.rstrip('/')}/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True
+        }
+        # Server-sent events: one "data: {json}" line per delta, terminated by "data: [DONE]".
+        session = clients.http_session("deepseek")
+        with session.post(url, headers=headers, json=payload, stream=True, timeout=clients.timeout()) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                content = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
     def _get_langchain_llm(self):
         if self.llm_type == "openai":
-            from langchain_openai import ChatOpenAI
-            return ChatOpenAI(
-                temperature=0,
-                model=OPENAI_MODEL,
-                openai_api_key=cfg.get("llm", {}).get("openai_api_key", "")
-            )
+            return clients.openai_chat(OPENAI_MODEL, cfg.get("llm", {}).get("openai_api_key", ""))
         elif self.llm_type == "ollama":
-            from langchain_community.chat_models import ChatOllama
-            return ChatOllama(
-                temperature=0,
-                model=OLLAMA_MODEL,
-                base_url=OLLAMA_API_URL
-            )
+            return clients.ollama_chat(OLLAMA_MODEL, OLLAMA_API_URL)
         else:
             raise ValueError(f"Unsupported LangChain-based LLM type: {self.llm_type}")
 
@@ -53,3 +80,15 @@ class LLMHandler:
             llm = self._get_langchain_llm()
             response = llm.invoke([HumanMessage(content=prompt)])
             return response.content.strip()
+
+    def stream_response(self, prompt: str):
+        # Yields text chunks as the model produces them; closing the generator aborts the request.
+        if self.llm_type == "deepseek":
+            model = cfg.get("llm", {}).get("deepseek_model_name", "deepseek-chat")
+            key = cfg.get("llm", {}).get("deepseek_api_key", "")
+            yield from self._stream_deepseek_api(prompt, model, key)
+        else:
+            llm = self._get_langchain_llm()
+            for chunk in llm.stream([HumanMessage(content=prompt)]):
+                if chunk.content:
+                    yield chunk.content
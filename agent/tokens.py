@@ -0,0 +1,43 @@
+from config import LLM_BATCH_TOKENS
+
+# Context window per model (tokens). Unknown models fall back to DEFAULT_CONTEXT.
+MODEL_CONTEXT = {
+    "gpt-4": 8192,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-3.5-turbo": 16385,
+    "llama3": 8192,
+    "gemma": 8192,
+    "mistral": 32768,
+    "phi3": 4096,
+    "deepseek-chat": 64000,
+}
+DEFAULT_CONTEXT = 8192
+
+_encoder = None
+
+
+def _get_encoder():
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    return _encoder
+
+
+def estimate_tokens(text):
+    encoder = _get_encoder()
+    if encoder:
+        return len(encoder.encode(text))
+    # ~4 characters per token for English text when tiktoken is unavailable.
+    return (len(text) + 3) // 4
+
+
+def input_budget(model_name):
+    # Keep roughly two thirds of the window free for the CSV the model writes back,
+    # and cap batches so a single slow call does not dominate the run.
+    context = MODEL_CONTEXT.get(model_name, DEFAULT_CONTEXT)
+    return min(context // 3, LLM_BATCH_TOKENS)
@@ -1,4 +1,9 @@
 from ui import demo
+from config import METRICS_PORT, RUN_QUEUE_SIZE
+from metrics import start_metrics_server
 
 if __name__ == "__main__":
-    demo.queue().launch()
\ No newline at end of file
+    start_metrics_server(METRICS_PORT)
+    # Gradio lets up to RUN_QUEUE_SIZE runs in; runs.RUN_SCHEDULER decides how many execute at once,
+    # so queued users see their position and ETA instead of a blank spinner.
+    demo.queue(default_concurrency_limit=RUN_QUEUE_SIZE).launch()
\ No newline at end of file
@@ -0,0 +1,265 @@
+# End-to-end benchmark against a local mock listing site and a stub LLM endpoint, so the
+# whole pipeline (crawl, extract, batch, LLM, CSV) can be compared per engine offline.
+#
+#   python -m benchmarks.bench_e2e [--engines requests async playwright] [--modes stream batch layouts]
+#                                  [--pages 10] [--cards 50] [--site-latency 0.05] [--llm-latency 0.2]
+#                                  [--crawl-delay 0]
+#                                  [--save results.json] [--baseline results.json --tolerance 0.2]
+#
+# Each engine/mode pair runs in a fresh interpreter (working directory is a temp dir, LLM cache
+# off) and reports pages/s and listings/s over the crawl, p50/p95 page-fetch and LLM-call
+# latency and peak RSS of the whole process tree (browsers included). The per-host crawl delay defaults to 0 so politeness does not mask
+# engine cost. LLM modes: "stream" and "batch" (streamed vs whole responses) and "layouts"
+# (second run with a learned layout, i.e. no LLM). With --baseline, the exit status is
+# non-zero when throughput drops by more than --tolerance or latency grows by more.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from benchmarks.mock_site import MockSite, load_recorded
+from benchmarks.stub_llm import StubLLMServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPT = "Extract each listing's Title and Price as CSV with a header row:\n{data}"
+HIGHER_IS_BETTER = ["pages_per_s", "listings_per_s"]
+LOWER_IS_BETTER = ["page_p95_ms", "llm_p95_ms"]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+def _tree_rss(pid):
+    # Bytes resident in `pid` and all its descendants, so browser engines are charged for Chrome.
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0
+        total = 0
+        for proc in procs:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    # Without psutil, walk /proc (Linux); elsewhere this reports 0 and RUSAGE_* values are used.
+    parents = {}
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents.setdefault(int(f.read().rsplit(")", 1)[1].split()[1]), []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    total, todo = 0, [pid]
+    while todo:
+        current = todo.pop()
+        todo.extend(parents.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                total += next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration, ValueError):
+            pass
+    return total
+
+
+class PeakRSS(threading.Thread):
+    # Samples the process tree's total RSS until stopped; `peak` is in bytes.
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            self.peak = max(self.peak, _tree_rss(os.getpid()))
+            if self._stop_event.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def child(engine, mode, site_url, llm_url, max_pages, max_listings, crawl_delay):
+    import functools
+    import resource
+    import time
+    import agent.llm
+    import agent.lang_processor as lang_processor
+    import pipeline
+    from scraper.crawler import Crawler
+
+    fetches, calls, crawl_time, found = [], [], [0.0], [0]
+
+    class TimedCrawler(Crawler):
+        def __init__(self, **kwargs):
+            super().__init__(delay=crawl_delay, **kwargs)
+
+        def _fetch(self, scraper, url):
+            started = time.perf_counter()
+            try:
+                listings, links = super()._fetch(scraper, url)
+            finally:
+                fetches.append(time.perf_counter() - started)
+            found[0] += len(listings)
+            return listings, links
+
+        def crawl(self, start_url):
+            started = time.perf_counter()
+            try:
+                yield from super().crawl(start_url)
+            finally:
+                crawl_time[0] = time.perf_counter() - started
+
+    class TimedHandler(agent.llm.LLMHandler):
+        def generate_response(self, prompt):
+            started = time.perf_counter()
+            try:
+                return super().generate_response(prompt)
+            finally:
+                calls.append(time.perf_counter() - started)
+
+        def stream_response(self, prompt):
+            started = time.perf_counter()
+            try:
+                yield from super().stream_response(prompt)
+            finally:
+                calls.append(time.perf_counter() - started)
+
+    agent.llm.LLM_TYPE = "deepseek"
+    agent.llm.DEEPSEEK_API_URL = f"{llm_url}/v1"
+    lang_processor.LLMHandler = TimedHandler
+    pipeline.Crawler = TimedCrawler
+    pipeline.LLM_CACHE_ENABLED = False
+    pipeline.process_batches = functools.partial(lang_processor.process_batches, stream=mode != "batch")
+
+    def run():
+        state = None
+        for state in pipeline.run_pipeline(site_url, PROMPT, engine=engine, max_pages=max_pages,
+                                           max_listings=max_listings, use_layouts=mode == "layouts",
+                                           output_path="out.csv"):
+            pass
+        return state
+
+    sampler = PeakRSS()
+    sampler.start()
+    if mode == "layouts":
+        run()  # learn the layout with the LLM, then measure the run that reuses it
+        fetches.clear(), calls.clear()
+        found[0] = 0
+    started = time.perf_counter()
+    state = run()
+    total = time.perf_counter() - started
+    crawl = crawl_time[0] or total
+    # Fallback when sampling is unavailable: this process plus the largest exited child.
+    rusage_kb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                 + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    peak_mb = max(sampler.stop() / 2 ** 20, rusage_kb / 1024)
+    return {
+        "engine": engine, "mode": mode, "pages": len(fetches), "listings": found[0], "rows": len(state.rows),
+        "pages_per_s": round(len(fetches) / crawl, 2), "listings_per_s": round(found[0] / crawl, 1),
+        "page_p50_ms": _ms(percentile(fetches, 50)), "page_p95_ms": _ms(percentile(fetches, 95)),
+        "llm_calls": len(calls), "llm_p50_ms": _ms(percentile(calls, 50)), "llm_p95_ms": _ms(percentile(calls, 95)),
+        "total_s": round(total, 3), "peak_rss_mb": round(peak_mb, 1),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def run_child(engine, mode, site_url, llm_url, max_pages, max_listings, crawl_delay, workdir):
+    env = {**os.environ, "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    args = [engine, mode, site_url, llm_url, str(max_pages), str(max_listings), str(crawl_delay)]
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.bench_e2e", "--child", *args],
+                          cwd=workdir, env=env, capture_output=True, text=True, timeout=900)
+    if proc.returncode != 0 or not proc.stdout.strip():
+        error = (proc.stderr.strip().splitlines() or ["no output"])[-1][:100]
+        return {"engine": engine, "mode": mode, "error": error}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def regressions(results, baseline, tolerance):
+    previous = {(r["engine"], r["mode"]): r for r in baseline if "error" not in r}
+    found = []
+    for result in results:
+        before = previous.get((result["engine"], result["mode"]))
+        if before is None or "error" in result:
+            continue
+        for key in HIGHER_IS_BETTER:
+            if before.get(key) and result.get(key) is not None and result[key] < before[key] * (1 - tolerance):
+                found.append(f"{result['engine']}/{result['mode']} {key}: {before[key]} -> {result[key]}")
+        for key in LOWER_IS_BETTER:
+            if before.get(key) and result.get(key) is not None and result[key] > before[key] * (1 + tolerance):
+                found.append(f"{result['engine']}/{result['mode']} {key}: {before[key]} -> {result[key]}")
+    return found
+
+
+def main(argv):
+    if argv and argv[0] == "--child":
+        engine, mode, site_url, llm_url, max_pages, max_listings, crawl_delay = argv[1:8]
+        print(json.dumps(child(engine, mode, site_url, llm_url, int(max_pages), int(max_listings),
+                               float(crawl_delay))))
+        return 0
+
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local stubs.")
+    parser.add_argument("--engines", nargs="+", default=["requests", "async"])
+    parser.add_argument("--modes", nargs="+", default=["stream", "batch", "layouts"])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--cards", type=int, default=50)
+    parser.add_argument("--recorded", help="glob of saved pages to serve instead of synthetic ones")
+    parser.add_argument("--site-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--crawl-delay", type=float, default=0.0)
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    recorded = load_recorded(args.recorded) if args.recorded else None
+    results = []
+    columns = ["pages", "listings", "rows", "pages_per_s", "listings_per_s", "page_p50_ms", "page_p95_ms",
+               "llm_calls", "llm_p50_ms", "llm_p95_ms", "total_s", "peak_rss_mb"]
+    print(f"{'engine':16} {'mode':8} " + " ".join(f"{c:>14}" for c in columns))
+    with MockSite(args.pages, args.cards, args.site_latency, recorded) as site, \
+            StubLLMServer(reply=None, latency=args.llm_latency) as llm:
+        for engine in args.engines:
+            for mode in args.modes:
+                with tempfile.TemporaryDirectory() as workdir:
+                    result = run_child(engine, mode, site.url, llm.url, site.pages, site.pages * args.cards,
+                                       args.crawl_delay, workdir)
+                results.append(result)
+                if "error" in result:
+                    print(f"{engine:16} {mode:8} error: {result['error']}")
+                else:
+                    print(f"{engine:16} {mode:8} " + " ".join(f"{str(result[c]):>14}" for c in columns))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,71 @@
+# Compares the lxml and BeautifulSoup listing extractors on saved pages.
+#
+#   python -m benchmarks.bench_extract [page.html ...]
+#   python -m benchmarks.bench_extract --snapshots [url-prefix]
+#
+# With no arguments it uses output/html/*.html (written by WebScraper.get_html with a
+# filename_prefix), or a synthetic 500-card results page if none have been saved yet.
+# --snapshots takes the latest archived copy of every URL in the snapshot store instead.
+import glob
+import sys
+import time
+from scraper.extractors import LxmlExtractor, SoupExtractor
+
+
+def synthetic_page(cards=500):
+    card = (
+        '<div class="tm-property-search-card"><div class="card-body">'
+        '<h3>{i} Queen Street, Auckland Central</h3><span>$1,{i:03d},000</span>'
+        '<ul><li>3 beds</li><li>2 baths</li></ul><button>Save</button></div></div>'
+    )
+    body = "".join(card.format(i=i) for i in range(cards))
+    return f"<html><head><script>var x = 1;</script></head><body><main>{body}</main></body></html>"
+
+
+def load_snapshots(prefix=""):
+    from scraper.snapshots import SnapshotStore
+    store = SnapshotStore()
+    try:
+        return {url: store.latest(url) for url in store.urls(prefix)}
+    finally:
+        store.close()
+
+
+def load_pages(paths):
+    if paths and paths[0] == "--snapshots":
+        return load_snapshots(paths[1] if len(paths) > 1 else "")
+    paths = paths or sorted(glob.glob("output/html/*.html"))
+    if not paths:
+        return {"synthetic (500 cards)": synthetic_page()}
+    pages = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages[path] = f.read()
+    return pages
+
+
+def bench(extractor, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        listings = extractor.extract(html)
+        best = min(best, time.perf_counter() - start)
+    return best, listings
+
+
+def main(argv):
+    repeat = 5
+    backends = {"bs4": SoupExtractor(), "lxml": LxmlExtractor()}
+    print(f"{'page':40} {'backend':8} {'best ms':>10} {'listings':>9} {'chars':>10}")
+    for name, html in load_pages(argv).items():
+        timings = {}
+        for backend, extractor in backends.items():
+            seconds, listings = bench(extractor, html, repeat)
+            timings[backend] = seconds
+            chars = sum(len(item) for item in listings)
+            print(f"{name[-40:]:40} {backend:8} {seconds * 1000:10.2f} {len(listings):9d} {chars:10d}")
+        print(f"{'':40} speedup  {timings['bs4'] / timings['lxml']:10.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,79 @@
+# Per-call cost of fresh vs pooled LLM clients against a local OpenAI-compatible stub.
+#
+#   python -m benchmarks.bench_llm_clients [--calls N] [--threads N] [--latency SECONDS]
+#
+# "fresh" is the old behaviour (module-level requests.post / a new ChatOpenAI per call, so a
+# new TCP connection and client each time); "pooled" goes through agent.clients. The OpenAI
+# rows need langchain_openai and are skipped without it.
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from agent import clients
+from agent.llm import LLMHandler
+from benchmarks.stub_llm import StubLLMServer
+
+
+def fresh_deepseek(url):
+    def call(prompt):
+        response = requests.post(f"{url}/v1/chat/completions", json={"model": "stub", "messages": [
+            {"role": "user", "content": prompt}]})
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+    return call
+
+
+def pooled_deepseek(url):
+    handler = LLMHandler()
+    handler.deepseek_url = f"{url}/v1"
+    return lambda prompt: handler._call_deepseek_api(prompt, "stub", "key")
+
+
+def fresh_openai(url):
+    from langchain.schema import HumanMessage
+    from langchain_openai import ChatOpenAI
+    return lambda prompt: ChatOpenAI(model="stub", openai_api_key="key", base_url=f"{url}/v1").invoke(
+        [HumanMessage(content=prompt)]).content
+
+
+def pooled_openai(url):
+    from langchain.schema import HumanMessage
+    return lambda prompt: clients.openai_chat("stub", "key", base_url=f"{url}/v1").invoke(
+        [HumanMessage(content=prompt)]).content
+
+
+def run(call, calls, threads):
+    call("warm-up")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(call, [f"prompt {i}" for i in range(calls)]))
+    return time.perf_counter() - started
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Fresh vs pooled LLM clients against a local stub.")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub server delay per request")
+    args = parser.parse_args(argv)
+
+    modes = [("deepseek", "fresh", fresh_deepseek), ("deepseek", "pooled", pooled_deepseek),
+             ("openai", "fresh", fresh_openai), ("openai", "pooled", pooled_openai)]
+    print(f"{'provider':10} {'client':8} {'ms/call':>9} {'calls/s':>9} {'connections':>12}")
+    for provider, label, build in modes:
+        with StubLLMServer(latency=args.latency) as server:
+            try:
+                seconds = run(build(server.url), args.calls, args.threads)
+            except ImportError as e:
+                print(f"{provider:10} {label:8} skipped ({e.name} not installed)")
+                continue
+            finally:
+                clients.close_clients()
+            print(f"{provider:10} {label:8} {seconds * 1000 / args.calls:9.2f} {args.calls / seconds:9.0f} "
+                  f"{len(server.connections):12d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,101 @@
+# Startup cost per scraping engine, measured in a fresh interpreter for each engine:
+# import time, construction time and time to first fetch against a local page.
+#
+#   python -m benchmarks.bench_startup [engine ...] [--check]
+#
+# --check exits non-zero if the HTTP engines pull in a browser stack, which is the
+# regression this benchmark exists to catch.
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["selenium", "webdriver_manager", "playwright", "gradio", "cryptography"]
+HTTP_ENGINES = ["requests", "async"]
+
+PROBE = """
+import json, sys, time
+engine, url, heavy = sys.argv[1], sys.argv[2], sys.argv[3].split(",")
+t0 = time.perf_counter()
+from scraper.strategies import load_strategy_class, get_strategy
+load_strategy_class(engine)
+t1 = time.perf_counter()
+result = {"engine": engine, "import_ms": round((t1 - t0) * 1000, 1)}
+try:
+    strategy = get_strategy(engine)
+    t2 = time.perf_counter()
+    strategy.fetch_html(url)
+    t3 = time.perf_counter()
+    strategy.close()
+    result["construct_ms"] = round((t2 - t1) * 1000, 1)
+    result["first_fetch_ms"] = round((t3 - t2) * 1000, 1)
+except Exception as e:
+    result["error"] = f"{type(e).__name__}: {str(e).splitlines()[0][:60] if str(e) else ''}"
+result["heavy_modules"] = [m for m in heavy if m in sys.modules]
+print(json.dumps(result))
+"""
+
+
+class _Page(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"<html><body><div class='card'>Listing</div></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def probe(engine, url, workdir):
+    env = {**os.environ, "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE, engine, url, ",".join(HEAVY_MODULES)],
+        cwd=workdir, env=env, capture_output=True, text=True, timeout=180,
+    )
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return {"engine": engine, "error": (proc.stderr.strip().splitlines() or ["no output"])[-1][:80],
+                "heavy_modules": []}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv):
+    check = "--check" in argv
+    engines = [a for a in argv if not a.startswith("--")]
+    if not engines:
+        sys.path.insert(0, ROOT)
+        from scraper.strategies import STRATEGIES
+        engines = list(STRATEGIES)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Page)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    failures = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            print(f"{'engine':16} {'import ms':>10} {'construct ms':>13} {'1st fetch ms':>13}  heavy modules / error")
+            for engine in engines:
+                r = probe(engine, url, workdir)
+                extra = ", ".join(r["heavy_modules"]) or "-"
+                if r.get("error"):
+                    extra += f" | {r['error']}"
+                print(f"{engine:16} {r.get('import_ms', '-'):>10} {r.get('construct_ms', '-'):>13} "
+                      f"{r.get('first_fetch_ms', '-'):>13}  {extra}")
+                if engine in HTTP_ENGINES and r["heavy_modules"]:
+                    failures.append(engine)
+    finally:
+        server.shutdown()
+    if check and failures:
+        print(f"Browser stacks imported by HTTP engines: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
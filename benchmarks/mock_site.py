@@ -0,0 +1,92 @@
+# Local listing site for offline benchmarks and tests: /listings?page=N serves N of `pages`
+# results pages with `cards` listings each (or recorded pages, in order), a rel=next link to
+# the following page and an optional per-request latency.
+import glob
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CARD = (
+    '<div class="tm-property-search-card"><a class="tile" href="/listing/{id}">'
+    '<h3 class="title">{id} Queen Street, Auckland Central</h3><span class="price">${price:,}</span>'
+    '<ul><li>{beds} beds</li><li>2 baths</li></ul></a><button>Save</button></div>'
+)
+
+
+def synthetic_page(page, cards):
+    body = "".join(
+        CARD.format(id=(page - 1) * cards + i, price=500000 + 1000 * i, beds=1 + i % 4) for i in range(cards)
+    )
+    return f"<html><head><script>var page = {page};</script></head><body><main>{body}</main></body></html>"
+
+
+def load_recorded(pattern="output/html/*.html"):
+    pages = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+class MockSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path != "/listings":
+            return self._send(404, b"not found")
+        page = int(parse_qs(parsed.query).get("page", ["1"])[0])
+        site = self.server
+        if not 1 <= page <= site.pages:
+            return self._send(404, b"no such page")
+        if site.latency:
+            time.sleep(site.latency)
+        html = site.page_html(page)
+        if page < site.pages:
+            html = html.replace("</body>", f'<a rel="next" href="/listings?page={page + 1}">Next</a></body>', 1)
+        site.record()
+        self._send(200, html.encode("utf-8"))
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockSite(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, pages=5, cards=50, latency=0.0, recorded=None):
+        super().__init__(("127.0.0.1", 0), MockSiteHandler)
+        self.recorded = recorded or []
+        self.pages = len(self.recorded) or pages
+        self.cards = cards
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def page_html(self, page):
+        return self.recorded[page - 1] if self.recorded else synthetic_page(page, self.cards)
+
+    def record(self):
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/listings"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,100 @@
+# Minimal LLM endpoints for offline benchmarks and tests, after an optional artificial latency:
+#   POST /v1/chat/completions  OpenAI/DeepSeek-compatible (JSON, or SSE when "stream" is set)
+#   POST /api/chat, /api/generate  Ollama-compatible (JSON, or NDJSON when streaming)
+# With no fixed reply, each listing line in the prompt ("a | b | ...") becomes one CSV row
+# of its first fragment and its price. HTTP/1.1 so clients can keep connections alive.
+import csv
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "Title,Price\nListing 1,$1"
+
+
+def csv_reply(prompt):
+    rows = [["Title", "Price"]]
+    for line in prompt.splitlines():
+        parts = [part.strip() for part in line.split("|") if part.strip()]
+        if len(parts) >= 2:
+            rows.append([parts[0], next((p.lstrip("$") for p in parts if p.startswith("$")), "")])
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return "```csv\n" + buffer.getvalue() + "```"
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.record(self)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if "messages" in body:
+            prompt = "\n".join(m.get("content", "") for m in body["messages"])
+        else:
+            prompt = body.get("prompt", "")
+        reply = self.server.reply if self.server.reply is not None else csv_reply(prompt)
+        chunks = [reply[i:i + 8] for i in range(0, len(reply), 8)]
+
+        if self.path.startswith("/v1/"):
+            if body.get("stream"):
+                events = [{"choices": [{"delta": {"content": chunk}}]} for chunk in chunks]
+                data = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                return self._send(data.encode(), "text/event-stream")
+            return self._send(json.dumps(
+                {"choices": [{"message": {"role": "assistant", "content": reply}}]}).encode())
+
+        if self.path in ("/api/chat", "/api/generate"):
+            def event(text, done):
+                if self.path == "/api/chat":
+                    return {"model": body.get("model"), "message": {"role": "assistant", "content": text}, "done": done}
+                return {"model": body.get("model"), "response": text, "done": done}
+            if body.get("stream", True):
+                lines = [event(chunk, False) for chunk in chunks] + [event("", True)]
+                return self._send("".join(json.dumps(line) + "\n" for line in lines).encode(), "application/x-ndjson")
+            return self._send(json.dumps(event(reply, True)).encode())
+
+        self.send_error(404)
+
+    def _send(self, data, content_type="application/json"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, reply=DEFAULT_REPLY, latency=0.0, handler=StubLLMHandler):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.reply = reply
+        self.latency = latency
+        self.requests = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+
+    def record(self, handler):
+        with self._lock:
+            self.requests += 1
+            self.connections.add(handler.client_address)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
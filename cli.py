@@ -0,0 +1,170 @@
+# Headless batch runner: python cli.py jobs.json [--workers N] [--output-dir DIR]
+#
+# The job file is a JSON list of jobs (or {"defaults": {...}, "jobs": [...]}), each with
+# url and prompt plus any of: name, engine, headless, retries, max_listings, max_pages,
+# incremental, use_layouts, resume. Jobs run in parallel worker processes; each worker keeps one browser/HTTP
+# pool per engine for all the jobs it picks up. With --queue PATH the jobs only coordinate, and
+# distributed workers (python -m distributed worker --queue PATH) do the fetching and LLM calls.
+# Nothing here imports gradio.
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
+
+JOB_DEFAULTS = {
+    "engine": "requests",
+    "headless": True,
+    "retries": 3,
+    "max_listings": 20,
+    "max_pages": 1,
+    "incremental": False,
+    "use_layouts": False,
+    "resume": True,
+}
+# Engines whose scraper is safe to share between jobs (and crawler threads) in one worker.
+SHARED_ENGINES = {"async", "playwright-pool", "selenium-pool", "replay"}
+
+_shared_scrapers = {}
+
+
+def load_jobs(path):
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    if isinstance(spec, list):
+        spec = {"jobs": spec}
+    defaults = {**JOB_DEFAULTS, **spec.get("defaults", {})}
+    jobs = []
+    for i, job in enumerate(spec.get("jobs", [])):
+        if not job.get("url") or not job.get("prompt"):
+            raise ValueError(f"Job {i + 1} needs both 'url' and 'prompt'.")
+        job = {**defaults, **job}
+        name = job.get("name") or f"job{i + 1}"
+        job["name"] = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+        jobs.append(job)
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("Job names must be unique.")
+    return jobs
+
+
+class _KeepOpen:
+    # Hands a worker's shared scraper to each job; it is really closed when the worker exits.
+    def __init__(self, scraper):
+        self._scraper = scraper
+
+    def __getattr__(self, name):
+        return getattr(self._scraper, name)
+
+    def close(self):
+        pass
+
+
+def _close_shared_scrapers():
+    for scraper in _shared_scrapers.values():
+        try:
+            scraper.close()
+        except Exception:
+            pass
+    _shared_scrapers.clear()
+    if "scraper.browser_pool" in sys.modules:
+        sys.modules["scraper.browser_pool"].shutdown_browser_pools()
+    if "scraper.selenium_pool" in sys.modules:
+        sys.modules["scraper.selenium_pool"].shutdown_selenium_pools()
+
+
+def _scraper_factory(engine, headless):
+    if engine not in SHARED_ENGINES:
+        return None
+
+    def factory():
+        key = (engine, headless)
+        if key not in _shared_scrapers:
+            from scraper.web_scraper import WebScraper
+            if not _shared_scrapers:
+                # Pool workers skip atexit hooks, but multiprocessing finalizers still run.
+                Finalize(None, _close_shared_scrapers, exitpriority=10)
+            _shared_scrapers[key] = WebScraper(engine=engine, headless=headless)
+        return _KeepOpen(_shared_scrapers[key])
+    return factory
+
+
+def run_job(job, output_dir, queue_path=None):
+    from pipeline import run_pipeline
+
+    started = time.time()
+    output_path = os.path.join(output_dir, f"{job['name']}.csv")
+    summary = {"name": job["name"], "url": job["url"], "engine": job["engine"], "output": None,
+               "rows": 0, "status": "ok", "error": None}
+    state = None
+    try:
+        for state in run_pipeline(
+            job["url"], job["prompt"], engine=job["engine"], headless=job["headless"], retries=job["retries"],
+            max_listings=job["max_listings"], max_pages=job["max_pages"], incremental=job["incremental"],
+            output_path=output_path, scraper_factory=_scraper_factory(job["engine"], job["headless"]),
+            delta_path=os.path.join(output_dir, f"{job['name']}.delta.csv"), use_layouts=job["use_layouts"],
+            resume=job["resume"], queue_path=queue_path,
+        ):
+            pass
+        summary["output"] = state.output_path
+        summary["rows"] = len(state.rows)
+        if state.metrics is not None:
+            summary["stages"] = state.metrics.summary()["stages"]
+    except Exception as e:
+        summary["status"] = "failed"
+        summary["error"] = str(e)
+    finally:
+        if state is not None:
+            with open(os.path.join(output_dir, f"{job['name']}.log"), "w", encoding="utf-8") as f:
+                f.write("\n".join(state.log))
+    summary["seconds"] = round(time.time() - started, 2)
+    return summary
+
+
+def run_jobs(jobs, workers, output_dir, queue_path=None):
+    os.makedirs(output_dir, exist_ok=True)
+    summaries = []
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        futures = {pool.submit(run_job, job, output_dir, queue_path): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {"name": job["name"], "url": job["url"], "engine": job["engine"], "output": None,
+                           "rows": 0, "status": "failed", "error": f"worker crashed: {e}", "seconds": None}
+            print(f"[{summary['status']}] {summary['name']}: {summary['rows']} rows "
+                  f"({summary['seconds']}s){' - ' + summary['error'] if summary['error'] else ''}", flush=True)
+            summaries.append(summary)
+    order = {job["name"]: i for i, job in enumerate(jobs)}
+    summaries.sort(key=lambda s: order[s["name"]])
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=2)
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run ChatCrawler jobs without the UI.")
+    parser.add_argument("job_file", help="JSON file listing the jobs to run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel worker processes")
+    parser.add_argument("--output-dir", default="output/jobs", help="where per-job CSVs and summary.json go")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="coordinate only: hand pages and LLM batches to `python -m distributed worker` processes")
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs(args.job_file)
+    if not jobs:
+        print("No jobs to run.")
+        return 0
+    summaries = run_jobs(jobs, args.workers, args.output_dir, args.queue)
+    failed = sum(1 for s in summaries if s["status"] != "ok")
+    print(f"{len(summaries) - failed}/{len(summaries)} jobs succeeded. Summary: "
+          f"{os.path.join(args.output_dir, 'summary.json')}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
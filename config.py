@@ -9,6 +9,18 @@ def load_config():
             return json.load(f)
     return {}
 
+
+def as_bool(value):
+    # JSON booleans and numbers as usual; strings are read as words, so "false" is False.
+    if not isinstance(value, str):
+        return bool(value)
+    word = value.strip().lower()
+    if word in ("true", "yes", "on", "1"):
+        return True
+    if word in ("false", "no", "off", "0", ""):
+        return False
+    raise ValueError(f"Expected true or false, got {value!r}")
+
 cfg = load_config()
 
 # Global values
@@ -21,6 +33,62 @@ JS_WAIT_SELECTOR = cfg.get("JS_WAIT_SELECTOR", "div.dynamic-section")
 RETRY_COUNT = int(cfg.get("RETRY_COUNT", 3))
 MAX_PAGES = int(cfg.get("MAX_PAGES", 3))
 
+# Crawl concurrency and per-host politeness
+CRAWL_WORKERS = int(cfg.get("CRAWL_WORKERS", 4))
+CRAWL_PER_HOST = int(cfg.get("CRAWL_PER_HOST", 2))
+CRAWL_DELAY = float(cfg.get("CRAWL_DELAY", 0.5))
+
+# Fetch retries with jittered exponential backoff (seconds), token-bucket burst per host and
+# a per-host circuit breaker that opens after N consecutive failures for a cooldown (seconds)
+FETCH_RETRIES = int(cfg.get("FETCH_RETRIES", 3))
+FETCH_BACKOFF = float(cfg.get("FETCH_BACKOFF", 0.5))
+FETCH_MAX_BACKOFF = float(cfg.get("FETCH_MAX_BACKOFF", 30))
+FETCH_BURST = int(cfg.get("FETCH_BURST", 1))
+FETCH_BREAKER_THRESHOLD = int(cfg.get("FETCH_BREAKER_THRESHOLD", 5))
+FETCH_BREAKER_COOLDOWN = float(cfg.get("FETCH_BREAKER_COOLDOWN", 30))
+
+# Async HTTP engine connection pool
+HTTP_TIMEOUT = float(cfg.get("HTTP_TIMEOUT", 30))
+HTTP_MAX_CONNECTIONS = int(cfg.get("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(cfg.get("HTTP_MAX_KEEPALIVE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(cfg.get("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_PER_HOST = int(cfg.get("HTTP_PER_HOST", 8))
+HTTP2 = as_bool(cfg.get("HTTP2", True))
+
+# "auto" engine: plain HTTP first, escalating to AUTO_BROWSER_ENGINE for domains whose served HTML
+# matches neither JS_WAIT_SELECTOR nor AUTO_MIN_LISTINGS listing cards; per-domain choices are
+# kept in AUTO_ENGINE_PATH and re-probed after AUTO_DECISION_TTL seconds
+AUTO_BROWSER_ENGINE = cfg.get("AUTO_BROWSER_ENGINE", "playwright")
+AUTO_MIN_LISTINGS = int(cfg.get("AUTO_MIN_LISTINGS", 3))
+AUTO_ENGINE_PATH = cfg.get("AUTO_ENGINE_PATH", "output/state/auto_engines.json")
+AUTO_DECISION_TTL = float(cfg.get("AUTO_DECISION_TTL", 7 * 24 * 3600))
+
+# Long-lived Playwright browser pool
+BROWSER_POOL_SIZE = int(cfg.get("BROWSER_POOL_SIZE", 3))
+BROWSER_POOL_MAX_NAVIGATIONS = int(cfg.get("BROWSER_POOL_MAX_NAVIGATIONS", 50))
+
+# Selenium: warm Chrome instances kept by the "selenium-pool" engine (SELENIUM_POOL_MIN_SIZE of them
+# started in the background as soon as the pool is built), explicit wait for JS_WAIT_SELECTOR
+# (seconds) and chromedriver resolution (a fixed SELENIUM_DRIVER_PATH, or webdriver_manager's answer
+# cached for SELENIUM_DRIVER_TTL seconds)
+SELENIUM_POOL_SIZE = int(cfg.get("SELENIUM_POOL_SIZE", 2))
+SELENIUM_POOL_MIN_SIZE = int(cfg.get("SELENIUM_POOL_MIN_SIZE", 1))
+SELENIUM_POOL_MAX_NAVIGATIONS = int(cfg.get("SELENIUM_POOL_MAX_NAVIGATIONS", 100))
+SELENIUM_WAIT_TIMEOUT = float(cfg.get("SELENIUM_WAIT_TIMEOUT", 10))
+SELENIUM_DRIVER_PATH = cfg.get("SELENIUM_DRIVER_PATH", "")
+SELENIUM_DRIVER_TTL = float(cfg.get("SELENIUM_DRIVER_TTL", 24 * 3600))
+
+# Browser request blocking and page-load wait policy ("commit", "domcontentloaded", "load", "networkidle")
+BLOCK_RESOURCE_TYPES = cfg.get("BLOCK_RESOURCE_TYPES", ["image", "media", "font"])
+BLOCK_DOMAINS = cfg.get("BLOCK_DOMAINS", [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.net",
+    "hotjar.com"
+])
+PAGE_LOAD_WAIT = cfg.get("PAGE_LOAD_WAIT", "load")
+
 # Listing selectors used for scraping repeated items
 LISTING_SELECTORS = cfg.get("LISTING_SELECTORS", [
     "div[class*='card']",
@@ -29,6 +97,19 @@ LISTING_SELECTORS = cfg.get("LISTING_SELECTORS", [
     ".tm-property-search-card"
 ])
 
+# Listing extraction backend: "lxml" (fast, single pass) or "bs4"
+EXTRACTOR_BACKEND = cfg.get("EXTRACTOR_BACKEND", "lxml")
+
+# Learned per-domain layouts: field selectors derived from an LLM run, reused without the LLM
+# as long as every column is filled in at least LAYOUT_MIN_FILL of the extracted rows
+LAYOUTS_DIR = cfg.get("LAYOUTS_DIR", "output/layouts")
+LAYOUT_MIN_FILL = float(cfg.get("LAYOUT_MIN_FILL", 0.8))
+
+# Structured-data fast path: rows read from JSON-LD / __NEXT_DATA__ for the CSV header in the prompt.
+# A listing whose record fills at least STRUCTURED_MIN_FILL of the columns skips the LLM
+STRUCTURED_DATA_ENABLED = as_bool(cfg.get("STRUCTURED_DATA_ENABLED", True))
+STRUCTURED_MIN_FILL = float(cfg.get("STRUCTURED_MIN_FILL", 1.0))
+
 # LLM Config
 llm_cfg = cfg.get("llm", {})
 LLM_TYPE = llm_cfg.get("model_type", "OpenAI")
@@ -36,4 +117,71 @@ MODEL_TYPE = llm_cfg.get("model_type", "OpenAI")
 OPENAI_API_KEY = llm_cfg.get("openai_api_key", "")
 OPENAI_MODEL = llm_cfg.get("openai_model_name", "gpt-4")
 OLLAMA_MODEL = llm_cfg.get("ollama_model_name", "llama3")
-OLLAMA_API_URL = llm_cfg.get("ollama_api_url", "http://localhost:11434")
\ No newline at end of file
+OLLAMA_API_URL = llm_cfg.get("ollama_api_url", "http://localhost:11434")
+DEEPSEEK_API_URL = llm_cfg.get("deepseek_api_url", "https://api.deepseek.com/v1")
+
+# Shared LLM clients: timeouts in seconds, pooled connections per client, idle keep-alive expiry
+LLM_CONNECT_TIMEOUT = float(llm_cfg.get("connect_timeout", 10))
+LLM_READ_TIMEOUT = float(llm_cfg.get("read_timeout", 120))
+LLM_POOL_SIZE = int(llm_cfg.get("pool_size", 10))
+LLM_KEEPALIVE_EXPIRY = float(llm_cfg.get("keepalive_expiry", 60))
+
+# Batched LLM extraction
+LLM_CONCURRENCY = int(llm_cfg.get("concurrency", 4))
+LLM_BATCH_TOKENS = int(llm_cfg.get("batch_tokens", 4000))
+LLM_MAX_BACKOFF = float(llm_cfg.get("max_backoff", 30))
+
+# Streamed LLM output, parsed into CSV rows as they arrive; a batch is retried once it
+# produces more than stream_max_bad_rows malformed rows
+LLM_STREAMING = as_bool(llm_cfg.get("streaming", True))
+LLM_STREAM_MAX_BAD_ROWS = int(llm_cfg.get("stream_max_bad_rows", 3))
+
+# Prompt-input compaction (boilerplate stripping and per-listing token cap, 0 = no cap)
+COMPACTION_ENABLED = as_bool(llm_cfg.get("compaction_enabled", True))
+COMPACTION_MIN_SHARE = float(llm_cfg.get("compaction_min_share", 0.5))
+COMPACTION_MAX_TOKENS = int(llm_cfg.get("compaction_max_tokens", 256))
+
+# Persistent LLM response cache (TTL in seconds, 0 disables expiry)
+LLM_CACHE_ENABLED = as_bool(llm_cfg.get("cache_enabled", True))
+LLM_CACHE_PATH = llm_cfg.get("cache_path", "output/cache/llm_cache.sqlite3")
+LLM_CACHE_TTL = float(llm_cfg.get("cache_ttl", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(llm_cfg.get("cache_max_entries", 50000))
+
+# UI runs: each gets its own folder under RUNS_DIR; at most RUN_LIMITS[class] runs per engine class
+# ("browser" or "http") execute at once and the rest queue, with ETAs seeded from RUN_ETA_DEFAULT
+# seconds until real durations are known. RUN_QUEUE_SIZE caps the sessions the app serves at once.
+RUNS_DIR = cfg.get("RUNS_DIR", "output/runs")
+RUN_LIMITS = cfg.get("RUN_LIMITS", {"browser": 2, "http": 4})
+RUN_ETA_DEFAULT = float(cfg.get("RUN_ETA_DEFAULT", 60))
+RUN_QUEUE_SIZE = int(cfg.get("RUN_QUEUE_SIZE", 32))
+
+# Run metrics: per-stage timings as JSON lines ("" disables) and a Prometheus /metrics port (0 disables)
+METRICS_PATH = cfg.get("METRICS_PATH", "logs/metrics.jsonl")
+METRICS_PORT = int(cfg.get("METRICS_PORT", 0))
+
+# Compressed, content-addressed archive of every fetched page, served back by the "replay" engine
+SNAPSHOTS_ENABLED = as_bool(cfg.get("SNAPSHOTS_ENABLED", True))
+SNAPSHOT_DIR = cfg.get("SNAPSHOT_DIR", "output/snapshots")
+# Fetches older than this many days are dropped (with any page no other fetch shares) whenever
+# a scraper opens the archive; 0 keeps everything
+SNAPSHOT_RETENTION_DAYS = float(cfg.get("SNAPSHOT_RETENTION_DAYS", 30))
+
+# Durable crawl frontier: page states, listings and finished LLM batches per run, so an
+# interrupted run resumes where it stopped instead of starting over
+FRONTIER_ENABLED = as_bool(cfg.get("FRONTIER_ENABLED", True))
+FRONTIER_PATH = cfg.get("FRONTIER_PATH", "output/state/frontier.sqlite3")
+# A run that started more than this many hours ago is not resumed (its pages may be stale); 0 never expires
+FRONTIER_RESUME_MAX_AGE = float(cfg.get("FRONTIER_RESUME_MAX_AGE", 24))
+
+# Distributed runs: task queue for `python -m distributed worker` processes (a SQLite file, so on
+# one host only); a leased task returns to the queue when its worker stops heartbeating for
+# QUEUE_LEASE_SECONDS, and fails for good after QUEUE_MAX_ATTEMPTS tries. A coordinator gives up
+# after QUEUE_IDLE_TIMEOUT seconds without any finished task (0 waits forever)
+QUEUE_PATH = cfg.get("QUEUE_PATH", "output/state/queue.sqlite3")
+QUEUE_LEASE_SECONDS = float(cfg.get("QUEUE_LEASE_SECONDS", 60))
+QUEUE_POLL_INTERVAL = float(cfg.get("QUEUE_POLL_INTERVAL", 0.5))
+QUEUE_MAX_ATTEMPTS = int(cfg.get("QUEUE_MAX_ATTEMPTS", 3))
+QUEUE_IDLE_TIMEOUT = float(cfg.get("QUEUE_IDLE_TIMEOUT", 600))
+
+# Incremental re-crawl state (conditional HTTP validators and listing fingerprints)
+INCREMENTAL_DB_PATH = cfg.get("INCREMENTAL_DB_PATH", "output/state/incremental.sqlite3")
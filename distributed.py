@@ -0,0 +1,445 @@
+# Coordinator/worker mode for large sweeps. The coordinator (cli.py --queue, or run_pipeline with
+# queue_path) enqueues page fetches and LLM batches; any number of worker processes pull tasks and
+# push results back through a TaskQueue. The built-in backend is a SQLite file, which only works
+# for processes on one host (WAL needs shared memory, so not over NFS or SMB):
+#
+#   python -m distributed worker [--queue PATH] [--kinds page llm] [--engine ENGINE] [--exit-when-idle SECONDS]
+#   python -m distributed status [--queue PATH]
+#
+# Delivery is at-least-once: a task stays leased while its worker heartbeats, and goes back to
+# the queue when the lease lapses (crashed or stuck worker) or the task fails, until it has been
+# tried QUEUE_MAX_ATTEMPTS times. The first result reported for a task wins.
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import closing
+from config import (
+    QUEUE_PATH, QUEUE_LEASE_SECONDS, QUEUE_POLL_INTERVAL, QUEUE_MAX_ATTEMPTS, QUEUE_IDLE_TIMEOUT, LLM_CACHE_ENABLED,
+)
+from logger import logger
+
+KINDS = ("page", "llm")
+
+
+class Task:
+    def __init__(self, id, run_id, kind, key, payload, attempts):
+        self.id = id
+        self.run_id = run_id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+
+
+class TaskQueue:
+    # What the coordinator and workers need from a queue backend: push tasks (put), claim them
+    # under a lease kept alive by heartbeats (lease, heartbeat), ack them (complete, or fail to
+    # retry) and read results back in finishing order (finished, keys, pending). Tasks are unique
+    # per (run_id, kind, key), and only the first result reported for a task counts.
+    path = None  # where the queue lives, for logs
+
+    def put(self, run_id, kind, key, payload):
+        raise NotImplementedError
+
+    def lease(self, worker, kinds=KINDS, lease_seconds=QUEUE_LEASE_SECONDS):
+        raise NotImplementedError
+
+    def heartbeat(self, task, worker, lease_seconds=QUEUE_LEASE_SECONDS):
+        raise NotImplementedError
+
+    def complete(self, task, result):
+        raise NotImplementedError
+
+    def fail(self, task, error):
+        raise NotImplementedError
+
+    def finished(self, run_id, kind, after=0):
+        raise NotImplementedError
+
+    def keys(self, run_id, kind):
+        raise NotImplementedError
+
+    def pending(self, run_id, kind):
+        raise NotImplementedError
+
+    def clear(self, run_id):
+        raise NotImplementedError
+
+    def counts(self, run_id=None):
+        raise NotImplementedError
+
+    def describe(self, run_id=None):
+        return "Queue: " + ("; ".join(
+            f"{kind} " + ", ".join(f"{n} {status}" for status, n in sorted(statuses.items()))
+            for kind, statuses in sorted(self.counts(run_id).items())) or "empty")
+
+    def close(self):
+        pass
+
+
+class SqliteQueue(TaskQueue):
+    # TaskQueue in one SQLite file, for workers on the same host as the coordinator. Enqueueing
+    # is idempotent, so a restarted coordinator picks up the results its tasks already have.
+    def __init__(self, path=QUEUE_PATH, max_attempts=QUEUE_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY, run_id TEXT NOT NULL, kind TEXT NOT NULL, key TEXT NOT NULL, "
+            "payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, "
+            "worker TEXT, lease_until REAL, seq INTEGER, result TEXT, error TEXT, updated REAL NOT NULL, "
+            "UNIQUE (run_id, kind, key));"
+            "CREATE INDEX IF NOT EXISTS tasks_ready ON tasks(status, kind, id);"
+            "CREATE INDEX IF NOT EXISTS tasks_finished ON tasks(run_id, kind, seq);"
+        )
+
+    def _write(self, fn):
+        # BEGIN IMMEDIATE takes the write lock up front, so a read-then-update (leasing) cannot
+        # interleave with another process doing the same.
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def _read(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def put(self, run_id, kind, key, payload):
+        return self._write(lambda db: db.execute(
+            "INSERT OR IGNORE INTO tasks (run_id, kind, key, payload, updated) VALUES (?, ?, ?, ?, ?)",
+            (run_id, kind, key, json.dumps(payload), time.time()),
+        ).rowcount == 1)
+
+    def lease(self, worker, kinds=KINDS, lease_seconds=QUEUE_LEASE_SECONDS):
+        def take(db):
+            now = time.time()
+            marks = ",".join("?" * len(kinds))
+            expired = db.execute("SELECT id, attempts FROM tasks WHERE status = 'leased' AND lease_until < ? "
+                                 "AND attempts >= ?", (now, self.max_attempts)).fetchall()
+            for task_id, attempts in expired:
+                self._finish(db, task_id, "failed", error=f"lease expired {attempts} times")
+            row = db.execute(
+                f"SELECT id, run_id, kind, key, payload, attempts FROM tasks WHERE kind IN ({marks}) AND "
+                "(status = 'queued' OR (status = 'leased' AND lease_until < ?)) ORDER BY id LIMIT 1",
+                (*kinds, now),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                       "updated = ? WHERE id = ?", (worker, now + lease_seconds, now, row[0]))
+            return Task(row[0], row[1], row[2], row[3], json.loads(row[4]), row[5] + 1)
+        return self._write(take)
+
+    def heartbeat(self, task, worker, lease_seconds=QUEUE_LEASE_SECONDS):
+        # Returns False once the lease is lost (expired and taken over, or already finished).
+        return self._write(lambda db: db.execute(
+            "UPDATE tasks SET lease_until = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, time.time(), task.id, worker),
+        ).rowcount == 1)
+
+    def _finish(self, db, task_id, status, result=None, error=None):
+        # Every finished task (done, failed or given up on) gets the next seq, so finished() reports it.
+        seq = db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM tasks").fetchone()[0]
+        return db.execute(
+            "UPDATE tasks SET status = ?, seq = ?, result = ?, error = ?, lease_until = NULL, updated = ? "
+            "WHERE id = ? AND status NOT IN ('done', 'failed')",
+            (status, seq, None if result is None else json.dumps(result), error, time.time(), task_id),
+        ).rowcount == 1
+
+    def complete(self, task, result):
+        return self._write(lambda db: self._finish(db, task.id, "done", result=result))
+
+    def fail(self, task, error):
+        # Back to the queue for another worker while attempts remain, otherwise failed for good.
+        def fail(db):
+            if task.attempts < self.max_attempts:
+                return db.execute("UPDATE tasks SET status = 'queued', error = ?, lease_until = NULL, updated = ? "
+                                  "WHERE id = ? AND status = 'leased'", (error, time.time(), task.id)).rowcount == 1
+            return self._finish(db, task.id, "failed", error=error)
+        return self._write(fail)
+
+    def finished(self, run_id, kind, after=0):
+        # (seq, key, status, result, error) for tasks finished since `after`, in finishing order.
+        rows = self._read("SELECT seq, key, status, result, error FROM tasks WHERE run_id = ? AND kind = ? "
+                          "AND seq > ? ORDER BY seq", (run_id, kind, after))
+        return [(seq, key, status, json.loads(result) if result else None, error)
+                for seq, key, status, result, error in rows]
+
+    def keys(self, run_id, kind):
+        return [key for key, in self._read("SELECT key FROM tasks WHERE run_id = ? AND kind = ?", (run_id, kind))]
+
+    def pending(self, run_id, kind):
+        return self._read("SELECT COUNT(*) FROM tasks WHERE run_id = ? AND kind = ? AND status IN ('queued', 'leased')",
+                          (run_id, kind))[0][0]
+
+    def clear(self, run_id):
+        self._write(lambda db: db.execute("DELETE FROM tasks WHERE run_id = ?", (run_id,)))
+
+    def counts(self, run_id=None):
+        sql = "SELECT kind, status, COUNT(*) FROM tasks" + (" WHERE run_id = ?" if run_id else "") + \
+              " GROUP BY kind, status"
+        counts = {}
+        for kind, status, n in self._read(sql, (run_id,) if run_id else ()):
+            counts.setdefault(kind, {})[status] = n
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_queue(path=QUEUE_PATH):
+    # The one place a backend is chosen; everything else only uses the TaskQueue methods.
+    return SqliteQueue(path)
+
+
+class _Progress:
+    # Gives up once nothing has finished for `timeout` seconds (0 waits forever), so a coordinator
+    # without live workers does not hang.
+    def __init__(self, timeout, what):
+        self.timeout = timeout
+        self.what = what
+        self.last = time.monotonic()
+
+    def advanced(self):
+        self.last = time.monotonic()
+
+    def check(self):
+        if self.timeout and time.monotonic() - self.last > self.timeout:
+            raise RuntimeError(f"No {self.what} finished by a distributed worker in {self.timeout:.0f}s.")
+
+
+class RemoteCrawler:
+    # Stands in for scraper.crawler.Crawler: each page becomes a queue task for the workers, and
+    # pagination links they report are enqueued in turn, up to max_pages.
+    def __init__(self, queue, run_id, engine="requests", headless=True, max_pages=1, poll=QUEUE_POLL_INTERVAL,
+                 cancel_event=None, idle_timeout=QUEUE_IDLE_TIMEOUT):
+        self.queue = queue
+        self.run_id = run_id
+        self.engine = engine
+        self.headless = headless
+        self.max_pages = max(1, int(max_pages))
+        self.poll = poll
+        self.cancel_event = cancel_event
+        self.idle_timeout = idle_timeout
+
+    def _put(self, url):
+        self.queue.put(self.run_id, "page", url, {"url": url, "engine": self.engine, "headless": self.headless,
+                                                  "follow": self.max_pages > 1})
+
+    def crawl(self, start_url):
+        self._put(start_url)
+        seen = set(self.queue.keys(self.run_id, "page"))
+        after = 0
+        progress = _Progress(self.idle_timeout, "page")
+        while self.cancel_event is None or not self.cancel_event.is_set():
+            # Counted before reading results, so a task finishing in between is picked up next round.
+            pending = self.queue.pending(self.run_id, "page")
+            events = self.queue.finished(self.run_id, "page", after)
+            for seq, url, status, result, error in events:
+                after = seq
+                if status != "done":
+                    logger.warning(f"Remote fetch failed for {url}: {error}")
+                    yield url, [], RuntimeError(error)
+                    continue
+                for link in result["links"]:
+                    if link not in seen and len(seen) < self.max_pages:
+                        seen.add(link)
+                        self._put(link)
+                yield url, result["listings"], None
+            if events:
+                progress.advanced()
+            elif not pending:
+                break
+            else:
+                progress.check()
+                time.sleep(self.poll)
+        logger.info(self.queue.describe(self.run_id))
+
+
+def remote_batches(queue, run_id, poll=QUEUE_POLL_INTERVAL, cancel_event=None, idle_timeout=QUEUE_IDLE_TIMEOUT):
+    # Same contract as agent.lang_processor.process_batches, with each batch answered by a worker.
+    # Stops early once cancel_event is set; the caller checks it after the loop.
+    from agent.lang_processor import batch_key, make_batches
+    from agent.llm import LLMHandler
+    from agent.tokens import input_budget
+
+    def process(scraped_data, prompt_text, retries=3, key_texts=None, **kwargs):
+        handler = LLMHandler()
+        model = f"{handler.llm_type}:{handler.model_name}"
+        batches = make_batches(scraped_data, prompt_text, input_budget(handler.model_name))
+        sources = dict(zip(scraped_data, key_texts)) if key_texts is not None else {}
+        index = {}
+        for i, batch in enumerate(batches):
+            key = batch_key(model, prompt_text, batch)
+            index[key] = i
+            queue.put(run_id, "llm", key, {"prompt": prompt_text, "batch": batch, "retries": retries,
+                                           "key_texts": [sources.get(item, item) for item in batch]})
+        after, remaining = 0, set(index)
+        progress = _Progress(idle_timeout, "LLM batch")
+        while remaining and (cancel_event is None or not cancel_event.is_set()):
+            events = queue.finished(run_id, "llm", after)
+            for seq, key, status, result, error in events:
+                after = seq
+                if key not in remaining:
+                    continue
+                remaining.discard(key)
+                if status != "done":
+                    raise RuntimeError(f"Remote LLM batch failed: {error}")
+                yield index[key], batches[index[key]], result["output"], True
+            if events:
+                progress.advanced()
+            else:
+                progress.check()
+                time.sleep(poll)
+    return process
+
+
+class Worker:
+    # Pulls tasks until stopped (or idle for `exit_when_idle` seconds). Page tasks are fetched
+    # with this worker's own WebScraper per engine (logged in once, politeness per host as in a
+    # local crawl); LLM tasks go through the normal batch code, including the LLM cache.
+    def __init__(self, queue, worker_id=None, kinds=KINDS, engine=None, lease_seconds=QUEUE_LEASE_SECONDS,
+                 poll=QUEUE_POLL_INTERVAL, exit_when_idle=None, scraper_factory=None):
+        from scraper.scheduling import FetchScheduler
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+        self.kinds = tuple(kinds)
+        self.engine = engine
+        self.lease_seconds = lease_seconds
+        self.poll = poll
+        self.exit_when_idle = exit_when_idle
+        self.scraper_factory = scraper_factory
+        self.scheduler = FetchScheduler()
+        self.stop_event = threading.Event()
+        self.done = 0
+        self.failed = 0
+        self._scrapers = {}
+
+    def _scraper(self, engine, headless):
+        key = (engine, headless)
+        if key not in self._scrapers:
+            if self.scraper_factory is not None:
+                scraper = self.scraper_factory(engine, headless)
+            else:
+                from scraper.web_scraper import WebScraper
+                scraper = WebScraper(engine=engine, headless=headless)
+            scraper.login()
+            self._scrapers[key] = scraper
+        return self._scrapers[key]
+
+    def handle_page(self, payload):
+        from scraper.crawler import find_pagination_links
+        from scraper.snapshots import content_hash
+        url = payload["url"]
+        scraper = self._scraper(self.engine or payload["engine"], payload["headless"])
+        html = self.scheduler.fetch(url, lambda: scraper.get_html(url))
+        listings = scraper.extract_data(html)
+        links = find_pagination_links(html, url) if payload["follow"] else []
+        return {"listings": listings, "links": links, "html_hash": content_hash(html)}
+
+    def handle_llm(self, payload):
+        from agent.cache import LLMCache
+        from agent.lang_processor import merge_csv_outputs, process_batches
+        cache = LLMCache() if LLM_CACHE_ENABLED else None
+        try:
+            outputs = {i: output for i, _, output, done in process_batches(
+                payload["batch"], payload["prompt"], concurrency=1, retries=payload["retries"], cache=cache,
+                stream=False, key_texts=payload.get("key_texts")) if done}
+        finally:
+            if cache is not None:
+                cache.close()
+        return {"output": merge_csv_outputs([outputs[i] for i in sorted(outputs)])}
+
+    def _heartbeat(self, task, finished):
+        while not finished.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(task, self.worker_id, self.lease_seconds):
+                logger.warning(f"Lost the lease on {task.kind} task {task.key}; another worker may redo it.")
+                return
+
+    def run_once(self):
+        task = self.queue.lease(self.worker_id, self.kinds, self.lease_seconds)
+        if task is None:
+            return False
+        finished = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(task, finished), daemon=True)
+        beat.start()
+        try:
+            result = self.handle_page(task.payload) if task.kind == "page" else self.handle_llm(task.payload)
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Worker {self.worker_id}: {task.kind} task {task.key} failed "
+                           f"(attempt {task.attempts}): {e}")
+            self.queue.fail(task, f"{type(e).__name__}: {e}")
+        else:
+            self.done += 1
+            self.queue.complete(task, result)
+        finally:
+            finished.set()
+            beat.join()
+        return True
+
+    def run(self):
+        logger.info(f"Worker {self.worker_id} pulling {', '.join(self.kinds)} tasks from {self.queue.path}.")
+        idle_since = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                if self.run_once():
+                    idle_since = time.monotonic()
+                elif self.exit_when_idle is not None and time.monotonic() - idle_since >= self.exit_when_idle:
+                    break
+                else:
+                    self.stop_event.wait(self.poll)
+        finally:
+            self.close()
+        return self.done, self.failed
+
+    def close(self):
+        for scraper in self._scrapers.values():
+            try:
+                scraper.close()
+            except Exception as e:
+                logger.warning(f"Failed to close scraper: {e}")
+        self._scrapers.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed ChatCrawler worker.")
+    parser.add_argument("command", choices=["worker", "status"])
+    parser.add_argument("--queue", default=QUEUE_PATH, help="SQLite queue file shared with the coordinator (same host)")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS), help="task kinds to take")
+    parser.add_argument("--engine", help="fetch with this engine instead of the one each task asks for")
+    parser.add_argument("--id", help="worker name shown in leases (default host-pid)")
+    parser.add_argument("--exit-when-idle", type=float, help="stop after this many seconds without work")
+    args = parser.parse_args(argv)
+
+    with closing(open_queue(args.queue)) as queue:
+        if args.command == "status":
+            print(queue.describe())
+            return 0
+        worker = Worker(queue, worker_id=args.id, kinds=args.kinds, engine=args.engine,
+                        exit_when_idle=args.exit_when_idle)
+        done, failed = worker.run()
+        print(f"Worker {worker.worker_id}: {done} tasks done, {failed} failed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
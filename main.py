@@ -1,12 +1,6 @@
 import os
 import json
-import time
-from cryptography.fernet import Fernet
-import gradio as gr
-import io
 
-from scraper.web_scraper import WebScraper
-from agent.lang_processor import langchain_process
 from logger import logger
 
 CONFIG_PATH = "config.json"
@@ -16,6 +10,7 @@ KEY_FILE = "secret.key"
 # 🔐 Encryption Utilities
 # ===============================
 def load_key():
+    from cryptography.fernet import Fernet
     if os.path.exists(KEY_FILE):
         return open(KEY_FILE, "rb").read()
     else:
@@ -24,10 +19,18 @@ def load_key():
             f.write(key)
         return key
 
-fernet = Fernet(load_key())
+_fernet = None
 
-def encrypt_password(pw): return fernet.encrypt(pw.encode()).decode()
-def decrypt_password(enc_pw): return fernet.decrypt(enc_pw.encode()).decode() if enc_pw else ""
+def get_fernet():
+    # Created on first use so importing main does not load cryptography or touch the key file.
+    global _fernet
+    if _fernet is None:
+        from cryptography.fernet import Fernet
+        _fernet = Fernet(load_key())
+    return _fernet
+
+def encrypt_password(pw): return get_fernet().encrypt(pw.encode()).decode()
+def decrypt_password(enc_pw): return get_fernet().decrypt(enc_pw.encode()).decode() if enc_pw else ""
 
 # ===============================
 # ⚙️ Config I/O
@@ -55,92 +58,45 @@ def save_config(cfg):
 # ===============================
 # 🧠 Scraper Runner
 # ===============================
-def run_scraper_live(url, prompt, engine, headless, retries, max_listings):
-    from agent.lang_processor import langchain_process
-    from scraper.web_scraper import WebScraper
+def run_scraper_live(url, prompt, engine, headless, retries, max_listings, max_pages=1, incremental=False,
+                     use_layouts=False, resume=True):
+    from pipeline import run_pipeline
+    from runs import RUN_SCHEDULER, new_workspace
     from logger import logger
-    import os
-    import csv
-    import re
 
     if not url or not url.startswith("http"):
         yield "❌ Invalid URL. Please enter a valid website starting with http/https.", "", [], None
         return
 
-    log = []
+    # Yields after every page and LLM batch so the UI fills in while the run is in flight.
+    # Cancelling from the UI closes this generator, which shuts down crawler workers and stops
+    # LLM batches, queued or in flight, through the pipeline's cleanup, or gives up its place
+    # in the queue.
+    state = None
+    workspace = None
+    ticket = RUN_SCHEDULER.submit(engine)
     try:
-        log.append(f"🌐 Scraping with {engine}...")
-        scraper = WebScraper(engine=engine, headless=headless)
-        scraper.login()
-        html = scraper.get_html(url)
-        #structure = scraper.extract_structure(html)
-        data = scraper.extract_data(html)
-        scraper.close()
-
-        log.append(f"✅ Scraping done. Found {len(data)} listings before trimming.")
-        if data:
-            log.append(f"🧪 Sample card preview: {data[0][:300]}...")
-
-        trimmed_data = data[:max_listings]
-        log.append(f"✂️ Trimmed to {len(trimmed_data)} listings for LLM.")
-        log.append("🧠 Analyzing listings with LLM...")
-
-        ai_output = None
-        error = None
-        for attempt in range(retries):
-            try:
-                ai_output = langchain_process(trimmed_data, prompt)
-                break  # Success
-            except Exception as e:
-                error = e
-                logger.warning(f"LLM attempt {attempt + 1} failed: {e}")
-                time.sleep(1)
-
-        if ai_output is None:
-            raise RuntimeError(f"LLM failed after {retries} retries: {error}")
-
-        output_path = "output/ai_output.csv"
-        os.makedirs("output", exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(ai_output)
-
-        log.append(f"📁 Output saved to {output_path}")
-
-        # Strip markdown-style CSV code block if present
-        ai_output = ai_output.strip()
-        if ai_output.startswith("```csv"):
-            ai_output = re.sub(r"^```csv\\s*", "", ai_output, flags=re.IGNORECASE)
-            ai_output = re.sub(r"```\\s*$", "", ai_output)
-
-        # Remove accidental double newlines or non-CSV preambles
-        lines = ai_output.splitlines()
-        csv_lines = [line for line in lines if "," in line or "Title" in line]
-        corrected_csv = "\n".join(csv_lines)
-
-        # Use csv.reader with fallback safety
-        rows = []
-        try:
-            csv_reader = csv.reader(io.StringIO(corrected_csv))
-            rows = [row for row in csv_reader if any(col.strip() for col in row)]
-        except Exception as e:
-            logger.warning(f"CSV parsing error: {e}")
-            rows = []
-
-        # Normalize all rows to match header length
-        headers = rows[0] if rows else []
-        csv_data = []
-        for row in rows[1:]:
-            if len(row) < len(headers):
-                row += [""] * (len(headers) - len(row))  # pad short rows
-            elif len(row) > len(headers):
-                row = row[:len(headers)]  # trim long rows
-            csv_data.append(row)
-
-        yield "\n".join(log), ai_output, csv_data, output_path
-
+        while not ticket.wait(timeout=1):
+            yield f"⏳ {ticket.describe()}", "", [], None
+        workspace = new_workspace(url)
+        for state in run_pipeline(url, prompt, engine=engine, headless=headless, retries=retries,
+                                  max_listings=max_listings, max_pages=max_pages, incremental=incremental,
+                                  use_layouts=use_layouts, resume=resume,
+                                  output_path=os.path.join(workspace, "ai_output.csv"),
+                                  delta_path=os.path.join(workspace, "delta.csv")):
+            yield state.ui()
     except Exception as e:
         logger.exception("Scraper error")
-        yield f"❌ Error: {str(e)}", "", [], None
+        if state is None:
+            yield f"❌ Error: {str(e)}", "", [], None
+        else:
+            logs, csv_text, rows, path = state.ui()
+            yield logs + f"\n❌ Error: {str(e)}", csv_text, rows, path
+    finally:
+        ticket.release()
+        if state is not None and workspace is not None:
+            with open(os.path.join(workspace, "run.log"), "w", encoding="utf-8") as f:
+                f.write("\n".join(state.log))
 
 # ===============================
 # ⚙️ Config Save Hook
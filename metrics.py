@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_PATH
+from logger import logger
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+STAGE_ORDER = ["startup", "login", "throttle", "fetch", "backoff", "parse", "layout", "compact", "llm", "csv_parse", "write"]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+class Registry:
+    # Process-wide aggregates across runs, rendered in the Prometheus text format.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            buckets, total = self._stages.setdefault(stage, ([0] * len(STAGE_BUCKETS), [0.0, 0]))
+            for i, bound in enumerate(STAGE_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            total[0] += seconds
+            total[1] += 1
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def render(self):
+        lines = [
+            "# HELP chatcrawler_stage_seconds Time spent per pipeline stage.",
+            "# TYPE chatcrawler_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, (buckets, (total, count)) in sorted(self._stages.items()):
+                for bound, n in zip(STAGE_BUCKETS, buckets):
+                    lines.append(f'chatcrawler_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {n}')
+                lines.append(f'chatcrawler_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+                lines.append(f'chatcrawler_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+                lines.append(f'chatcrawler_stage_seconds_count{{stage="{stage}"}} {count}')
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f"# TYPE chatcrawler_{name} counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                        lines.append(f"chatcrawler_{name}{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class RunMetrics:
+    # Timings for one run. Stages are recorded from crawler and LLM worker threads, each as a
+    # JSON line in METRICS_PATH (or path; "" keeps no log), and summarized per stage at the end of the run.
+    def __init__(self, path=None, registry=REGISTRY, **context):
+        path = METRICS_PATH if path is None else path
+        self.run_id = uuid.uuid4().hex[:12]
+        self.context = context
+        self.path = path
+        self.registry = registry
+        self.started = time.time()
+        self.totals = {"tokens_in": 0, "tokens_out": 0, "bytes": 0}
+        self._durations = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def _write(self, event):
+        if self._file is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), "run_id": self.run_id, **event})
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record(self, stage, seconds, **fields):
+        with self._lock:
+            self._durations.setdefault(stage, []).append(seconds)
+            for key in self.totals:
+                self.totals[key] += fields.get(key, 0) or 0
+        if self.registry is not None:
+            self.registry.observe(stage, seconds)
+            for direction in ("in", "out"):
+                if fields.get(f"tokens_{direction}"):
+                    self.registry.inc("llm_tokens_total", {"direction": direction}, fields[f"tokens_{direction}"])
+        self._write({"event": "stage", "stage": stage, "seconds": round(seconds, 6), **fields})
+
+    @contextmanager
+    def stage(self, name, **fields):
+        # Yields a dict the caller can add fields to (e.g. counts known only afterwards).
+        started = time.perf_counter()
+        error = None
+        try:
+            yield fields
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if error is not None:
+                fields["error"] = error
+            self.record(name, time.perf_counter() - started, **fields)
+
+    def summary(self):
+        with self._lock:
+            durations = {stage: list(values) for stage, values in self._durations.items()}
+        stages = sorted(durations, key=lambda s: (STAGE_ORDER.index(s) if s in STAGE_ORDER else len(STAGE_ORDER), s))
+        return {
+            "run_id": self.run_id,
+            "seconds": round(time.time() - self.started, 3),
+            **self.totals,
+            "stages": {
+                stage: {
+                    "count": len(durations[stage]),
+                    "total": round(sum(durations[stage]), 4),
+                    "p50": round(_percentile(durations[stage], 50), 4),
+                    "p95": round(_percentile(durations[stage], 95), 4),
+                    "max": round(max(durations[stage]), 4),
+                }
+                for stage in stages
+            },
+        }
+
+    def describe(self):
+        summary = self.summary()
+        lines = [f"⏱️ Run {summary['run_id']} took {summary['seconds']:.2f}s "
+                 f"(LLM tokens in/out: {summary['tokens_in']}/{summary['tokens_out']})"]
+        for stage, s in summary["stages"].items():
+            lines.append(f"   {stage:<9} {s['count']:>4} × p50 {s['p50'] * 1000:7.1f} ms, "
+                         f"p95 {s['p95'] * 1000:7.1f} ms, total {s['total']:.2f}s")
+        return "\n".join(lines)
+
+    def finish(self, status="ok"):
+        if self.registry is not None:
+            self.registry.inc("runs_total", {"status": status})
+        self._write({"event": "summary", "status": status, **self.context, **self.summary()})
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+@contextmanager
+def timed(metrics, name, **fields):
+    # Like RunMetrics.stage, but a no-op when the caller was not given a metrics object.
+    if metrics is None:
+        yield fields
+        return
+    with metrics.stage(name, **fields) as fields:
+        yield fields
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    global _server
+    if _server is None and port:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        logger.info(f"Prometheus metrics on http://{host}:{_server.server_port}/metrics")
+    return _server
+
+
+def stop_metrics_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
@@ -0,0 +1,324 @@
+import csv
+import io
+import os
+from contextlib import closing
+from agent.cache import LLMCache
+from agent.compaction import compact_listings, describe_report, fragments
+from agent.lang_processor import process_batches, merge_csv_outputs, parse_csv, match_rows
+from config import LLM_CACHE_ENABLED, COMPACTION_ENABLED, FRONTIER_ENABLED, FRONTIER_RESUME_MAX_AGE, STRUCTURED_DATA_ENABLED
+from distributed import RemoteCrawler, open_queue, remote_batches
+from logger import logger
+from metrics import RunMetrics, timed
+from scraper.crawler import Crawler
+from scraper.extractors import LxmlExtractor
+from scraper.frontier import CrawlFrontier, run_id
+from scraper.incremental import ListingFingerprints, write_delta_csv
+from scraper.layouts import load_layout, learn_layout, save_layout, apply_layout, validate_rows
+from scraper.structured import requested_columns, extract_records, identity_columns, structured_rows
+
+OUTPUT_PATH = "output/ai_output.csv"
+DELTA_PATH = "output/delta.csv"
+# Output slot for rows read from structured data, ahead of cached (-1) and LLM (0..n) batches
+STRUCTURED_INDEX = -2
+
+
+def _csv_text(header, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows([header] + rows)
+    return buffer.getvalue()
+
+
+class RunCancelled(Exception):
+    pass
+
+
+class RunState:
+    # Everything a caller needs to render a run in progress; yielded after every step.
+    def __init__(self):
+        self.log = []
+        self.outputs = {}
+        self.csv_text = ""
+        self.header = []
+        self.rows = []
+        self.output_path = None
+        self.metrics = None
+
+    def add_output(self, index, output):
+        self.outputs[index] = output
+        self.csv_text = merge_csv_outputs([self.outputs[i] for i in sorted(self.outputs)])
+        self.header, self.rows = parse_csv(self.csv_text)
+
+    def set_rows(self, header, rows):
+        self.csv_text = _csv_text(header, rows)
+        self.header, self.rows = list(header), rows
+
+    def ui(self):
+        return "\n".join(self.log), self.csv_text, self.rows, self.output_path
+
+
+def run_pipeline(url, prompt, engine="requests", headless=True, retries=3, max_listings=5, max_pages=1,
+                 incremental=False, output_path=OUTPUT_PATH, cancel_event=None, scraper_factory=None,
+                 delta_path=DELTA_PATH, use_layouts=False, resume=True, queue_path=None):
+    # Wraps the stages with per-run metrics; the timing summary lands in the log however the run ends.
+    # Progress is kept in the crawl frontier until the run completes, so a crashed or cancelled
+    # run with the same URL and page budget picks up where it stopped (unless resume is off).
+    # With queue_path, pages and LLM batches go to distributed workers instead, and the queue
+    # itself keeps the run's progress.
+    state = RunState()
+    state.metrics = RunMetrics(url=url, engine=engine)
+    queue = open_queue(queue_path) if queue_path else None
+    key = run_id(url, max_pages)
+    if queue is not None and not resume:
+        queue.clear(key)
+    frontier = CrawlFrontier(url, max_pages, resume=resume) if FRONTIER_ENABLED and queue is None else None
+    status = "failed"
+    try:
+        yield from _run_stages(state, url, prompt, engine, headless, retries, max_listings, max_pages, incremental,
+                               output_path, cancel_event, scraper_factory, delta_path, use_layouts, frontier,
+                               (queue, key) if queue is not None else None)
+        status = "ok"
+    except (RunCancelled, GeneratorExit):
+        status = "cancelled"
+        raise
+    finally:
+        if frontier is not None:
+            frontier.finish("complete" if status == "ok" else status)
+            frontier.close()
+        if queue is not None:
+            if status == "ok":
+                queue.clear(key)
+            queue.close()
+        state.log.append(state.metrics.describe())
+        logger.info(state.metrics.describe())
+        state.metrics.finish(status)
+    yield state
+
+
+def _run_stages(state, url, prompt, engine, headless, retries, max_listings, max_pages, incremental, output_path,
+                cancel_event, scraper_factory, delta_path, use_layouts, frontier=None, remote=None):
+    metrics = state.metrics
+
+    def check_cancelled():
+        if cancel_event is not None and cancel_event.is_set():
+            raise RunCancelled("Run cancelled.")
+
+    if frontier is not None and frontier.resumed:
+        state.log.append(f"♻️ Resuming interrupted run. {frontier.describe()}")
+    elif frontier is not None and frontier.expired:
+        state.log.append(f"♻️ Interrupted run is older than {FRONTIER_RESUME_MAX_AGE:g}h; starting over.")
+    pages_html = {}
+    # Embedded records are read in the crawler threads, while the HTML is at hand.
+    pages_records = {}
+    columns = requested_columns(prompt) if STRUCTURED_DATA_ENABLED else None
+    # Compaction only strips fragments that also appear around the cards (nav, footer, filters).
+    page_chrome = set()
+
+    def on_page(page_url, html):
+        if use_layouts:
+            pages_html[page_url] = html
+        if columns:
+            pages_records[page_url] = extract_records(html)
+        if COMPACTION_ENABLED:
+            page_chrome.update(fragments(LxmlExtractor().outside_text(html)))
+
+    if remote is not None:
+        queue, key = remote
+        if queue.counts(key):
+            state.log.append(f"♻️ Resuming distributed run. {queue.describe(key)}")
+        state.log.append(f"🌐 Queueing pages for distributed workers ({engine}, up to {int(max_pages)} pages) "
+                         f"in {queue.path}...")
+        disabled = [name for name, on in (("structured data", columns), ("learned layouts", use_layouts),
+                                          ("boilerplate stripping", COMPACTION_ENABLED)) if on]
+        if disabled:
+            # Workers keep the page HTML, and these stages all read it.
+            use_layouts, columns = False, None
+            state.log.append(f"🛰️ Page HTML stays on the workers, so {', '.join(disabled)} "
+                             f"{'is' if len(disabled) == 1 else 'are'} disabled for distributed runs.")
+        crawler = RemoteCrawler(queue, key, engine=engine, headless=headless, max_pages=max_pages,
+                                cancel_event=cancel_event)
+    else:
+        state.log.append(f"🌐 Scraping with {engine} (up to {int(max_pages)} pages)...")
+        crawler = Crawler(engine=engine, headless=headless, max_pages=max_pages, incremental=incremental,
+                          scraper_factory=scraper_factory, on_page=on_page if use_layouts or columns or COMPACTION_ENABLED else None,
+                          metrics=metrics, frontier=frontier)
+    yield state
+
+    data = []
+    seen = set()
+    pages = 0
+    with closing(crawler.crawl(url)) as crawl:
+        for page_url, listings, error in crawl:
+            check_cancelled()
+            if error is not None:
+                state.log.append(f"⚠️ Failed to fetch {page_url}: {error}")
+                yield state
+                continue
+            pages += 1
+            new_listings = [item for item in listings if item not in seen]
+            seen.update(new_listings)
+            data.extend(new_listings)
+            state.log.append(f"📄 {page_url}: {len(new_listings)} new listings.")
+            yield state
+    check_cancelled()
+
+    if not pages:
+        raise RuntimeError("No pages could be fetched.")
+
+    state.log.append(f"✅ Scraping done. Crawled {pages} pages, found {len(data)} listings before trimming.")
+    if engine == "playwright-pool":
+        from scraper.browser_pool import get_browser_pool
+        state.log.append(f"🧰 {get_browser_pool(headless).describe()}")
+    elif engine == "selenium-pool":
+        from scraper.selenium_pool import get_selenium_pool
+        state.log.append(f"🧰 {get_selenium_pool(headless).describe()}")
+    if data:
+        state.log.append(f"🧪 Sample card preview: {data[0][:300]}...")
+    missing_html = getattr(crawler, "missing_html", [])
+    if use_layouts and missing_html:
+        # A layout applied to, or learned from, only some of the pages would give partial rows.
+        use_layouts = False
+        state.log.append(f"📐 {len(missing_html)} resumed pages have no archived HTML, so learned layouts are "
+                         f"skipped this run.")
+
+    # Incremental fingerprints are only recorded for listings this run actually processed, once
+    # it has succeeded, so trimmed or failed listings stay new for the next run.
+    crawled = data
+    if incremental:
+        with closing(ListingFingerprints()) as fingerprints:
+            added, changed, removed = fingerprints.diff(url, data)
+        write_delta_csv(delta_path, added, changed, removed)
+        state.log.append(f"🔁 Incremental: {len(added)} added, {len(changed)} changed, {len(removed)} removed. "
+                         f"Delta saved to {delta_path}")
+        data = added + changed
+        if not data:
+            state.log.append("✅ No new or changed listings, skipping LLM.")
+            _commit_fingerprints(url, crawled, [])
+            state.output_path = delta_path
+            yield state
+            return
+
+    trimmed_data = processed = data[:int(max_listings)]
+    state.log.append(f"✂️ Trimmed to {len(trimmed_data)} listings for LLM.")
+    if columns and any(pages_records.values()):
+        # Each listing is paired with its record by content; listings without a complete record
+        # (including those on pages whose HTML a resumed run no longer has) stay with the LLM.
+        with timed(metrics, "structured", pages=len(pages_records)) as fields:
+            rows, reason = structured_rows(pages_records, columns)
+            matched = _match_records(trimmed_data, rows, columns)
+            fields.update(rows=len(rows), matched=len(matched))
+        if rows and (not data or len(matched) == len(trimmed_data)):
+            # Without listing cards (e.g. a page rendered from __NEXT_DATA__) the records are all there is.
+            state.set_rows(columns, [rows[matched[item]] for item in trimmed_data] if data else rows[:int(max_listings)])
+            state.log.append(f"🧬 Read {len(state.rows)} rows from the page's embedded structured data, skipping LLM.")
+            _write_output(state, output_path, metrics)
+            if incremental:
+                _commit_fingerprints(url, crawled, processed)
+            yield state
+            return
+        if matched:
+            state.add_output(STRUCTURED_INDEX, _csv_text(columns, [rows[matched[item]] for item in trimmed_data
+                                                                   if item in matched]))
+            trimmed_data = [item for item in trimmed_data if item not in matched]
+            state.log.append(f"🧬 Read {len(matched)} rows from the page's embedded structured data; "
+                             f"{len(trimmed_data)} listings without a complete record go on.")
+        else:
+            state.log.append(f"🧬 Embedded structured data is incomplete ({reason or 'no records match the listings'}), "
+                             f"using the listings instead.")
+    layout = load_layout(url, prompt) if use_layouts else None
+    if layout is not None:
+        with timed(metrics, "layout", pages=len(pages_html)) as fields:
+            rows = apply_layout(layout, pages_html, wanted=set(trimmed_data))[:len(trimmed_data)]
+            valid, reason = validate_rows(layout, rows)
+            fields.update(rows=len(rows), valid=valid)
+        if valid:
+            if state.outputs:
+                state.add_output(0, _csv_text(layout["header"], rows))
+            else:
+                state.set_rows(layout["header"], rows)
+            state.log.append(f"📐 Extracted {len(rows)} rows with the learned {layout['domain']} layout, skipping LLM.")
+            _write_output(state, output_path, metrics)
+            if incremental:
+                _commit_fingerprints(url, crawled, processed)
+            yield state
+            return
+        state.log.append(f"📐 Learned layout failed validation ({reason}), falling back to LLM.")
+        logger.info(f"Layout for {layout['domain']} failed validation: {reason}")
+    # The LLM cache is keyed on listings as extracted: compaction depends on the page's other listings.
+    key_texts = trimmed_data
+    if COMPACTION_ENABLED and trimmed_data:
+        with timed(metrics, "compact", listings=len(trimmed_data)):
+            trimmed_data, report = compact_listings(trimmed_data, learn_from=data, outside=page_chrome)
+        state.log.append(f"🗜️ {describe_report(report)}")
+        logger.info(describe_report(report))
+    state.log.append("🧠 Analyzing listings with LLM...")
+    yield state
+
+    # Distributed workers consult their own LLM cache.
+    cache = LLMCache() if LLM_CACHE_ENABLED and remote is None else None
+    process = remote_batches(*remote, cancel_event=cancel_event) if remote is not None else process_batches
+    try:
+        batches = process(trimmed_data, prompt, retries=int(retries), cache=cache, metrics=metrics, results=frontier,
+                          key_texts=key_texts, cancel_event=cancel_event)
+        with closing(batches):
+            for index, batch, output, done in batches:
+                check_cancelled()
+                with timed(metrics, "csv_parse", batch=index, done=done) as fields:
+                    state.add_output(index, output)
+                    fields["rows"] = len(state.rows)
+                # Streamed batches report rows as they complete; the log only notes finished batches.
+                if done and index < 0:
+                    state.log.append(f"🗃️ {len(batch)} listings served from LLM cache.")
+                elif done:
+                    state.log.append(f"🧩 Batch {index + 1}: {len(batch)} listings analyzed, "
+                                     f"{len(state.rows)} rows so far.")
+                yield state
+    except RunCancelled:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"LLM failed after {retries} retries: {e}")
+    finally:
+        if cache is not None:
+            state.log.append(f"🗃️ {cache.describe()}")
+            logger.info(cache.describe())
+            cache.close()
+    check_cancelled()
+
+    _write_output(state, output_path, metrics)
+    if incremental:
+        _commit_fingerprints(url, crawled, processed)
+    if use_layouts and state.rows:
+        learned = learn_layout(url, prompt, pages_html, state.header, state.rows)
+        if learned is not None:
+            path = save_layout(learned, url)
+            state.log.append(f"📐 Learned {learned['domain']} layout from {learned['learned_from_rows']} rows, "
+                             f"saved to {path}. Next runs can skip the LLM.")
+        else:
+            state.log.append("📐 Could not derive a reliable layout from this run's rows.")
+    yield state
+
+
+def _match_records(listings, rows, columns):
+    # Records are paired with listing cards on one identifying column at a time (title, address,
+    # URL), so shared values such as a price or suburb cannot pair a card with another listing's
+    # record. Records that match no card are left out. Without such columns, whole rows must match.
+    matched = {}
+    for i in identity_columns(columns) or [None]:
+        taken = set(matched.values())
+        candidates = [r for r in range(len(rows)) if r not in taken]
+        cells = [rows[r] if i is None else [rows[r][i]] for r in candidates]
+        for item, c in match_rows([item for item in listings if item not in matched], cells).items():
+            matched[item] = candidates[c]
+    return matched
+
+
+def _commit_fingerprints(url, crawled, processed):
+    with closing(ListingFingerprints()) as fingerprints:
+        fingerprints.commit(url, crawled, processed)
+
+
+def _write_output(state, output_path, metrics=None):
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with timed(metrics, "write", rows=len(state.rows)), open(output_path, "w", encoding="utf-8") as f:
+        f.write(state.csv_text)
+    state.output_path = output_path
+    state.log.append(f"📁 Output saved to {output_path}")
@@ -0,0 +1,151 @@
+import heapq
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from urllib.parse import urlparse
+from config import RUNS_DIR, RUN_LIMITS, RUN_ETA_DEFAULT
+
+# Engines that never start a browser; everything else (including "auto", which may escalate)
+# is scheduled as a browser run.
+HTTP_ENGINES = {"requests", "async", "replay"}
+
+
+def engine_class(engine):
+    return "http" if engine in HTTP_ENGINES else "browser"
+
+
+def new_workspace(url, runs_dir=RUNS_DIR):
+    # Every UI run writes its CSV, delta and log into its own folder, so concurrent runs never
+    # overwrite each other's files.
+    domain = re.sub(r"[^a-z0-9.-]+", "_", urlparse(url).netloc.lower()) or "run"
+    path = os.path.join(runs_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{domain}-{uuid.uuid4().hex[:6]}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def format_eta(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    return f"{seconds // 60}m {seconds % 60:02d}s"
+
+
+class RunTicket:
+    def __init__(self, scheduler, engine):
+        self.scheduler = scheduler
+        self.engine = engine
+        self.engine_class = engine_class(engine)
+        self.admitted = False
+        self.started = None
+
+    def wait(self, timeout=None):
+        return self.scheduler.wait(self, timeout)
+
+    def position(self):
+        return self.scheduler.position(self)
+
+    def eta(self):
+        return self.scheduler.eta(self)
+
+    def describe(self):
+        return (f"Waiting for a {self.engine_class} slot: position {self.position()} in queue, "
+                f"about {format_eta(self.eta())} until it starts.")
+
+    def release(self):
+        self.scheduler.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class RunScheduler:
+    # Admits runs in FIFO order with a separate concurrency limit per engine class, since a
+    # browser run costs far more CPU and memory than an HTTP one. Run durations are tracked
+    # per class (moving average) to estimate when a queued run will start.
+    def __init__(self, limits=RUN_LIMITS, default_duration=RUN_ETA_DEFAULT):
+        self.limits = {name: max(1, int(limit)) for name, limit in limits.items()}
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._running = {}
+        self._durations = {}
+        self.default_duration = default_duration
+        self.completed = 0
+
+    def limit(self, cls):
+        return self.limits.get(cls, 1)
+
+    def submit(self, engine):
+        ticket = RunTicket(self, engine)
+        with self._cond:
+            self._queues.setdefault(ticket.engine_class, deque()).append(ticket)
+            self._admit(ticket.engine_class)
+        return ticket
+
+    def _admit(self, cls):
+        queue, running = self._queues.setdefault(cls, deque()), self._running.setdefault(cls, set())
+        while queue and len(running) < self.limit(cls):
+            ticket = queue.popleft()
+            ticket.admitted, ticket.started = True, time.monotonic()
+            running.add(ticket)
+        self._cond.notify_all()
+
+    def wait(self, ticket, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: ticket.admitted, timeout)
+
+    def position(self, ticket):
+        with self._cond:
+            if ticket.admitted:
+                return 0
+            return list(self._queues.get(ticket.engine_class, ())).index(ticket) + 1
+
+    def eta(self, ticket):
+        # Each run ahead takes the slot that frees up first and holds it for an average run.
+        with self._cond:
+            if ticket.admitted:
+                return 0.0
+            cls = ticket.engine_class
+            average = self._durations.get(cls, self.default_duration)
+            now = time.monotonic()
+            slots = [max(0.0, average - (now - t.started)) for t in self._running.get(cls, ())]
+            slots += [0.0] * max(0, self.limit(cls) - len(slots))
+            heapq.heapify(slots)
+            for _ in range(self.position(ticket) - 1):
+                heapq.heappush(slots, heapq.heappop(slots) + average)
+            return slots[0]
+
+    def release(self, ticket):
+        with self._cond:
+            cls = ticket.engine_class
+            if ticket.admitted:
+                if ticket in self._running.get(cls, ()):
+                    self._running[cls].discard(ticket)
+                    duration = time.monotonic() - ticket.started
+                    previous = self._durations.get(cls)
+                    self._durations[cls] = duration if previous is None else 0.7 * previous + 0.3 * duration
+                    self.completed += 1
+            elif ticket in self._queues.get(cls, ()):
+                self._queues[cls].remove(ticket)
+            self._admit(cls)
+
+    def stats(self):
+        with self._cond:
+            return {
+                cls: {"limit": self.limit(cls), "running": len(self._running.get(cls, ())),
+                      "queued": len(self._queues.get(cls, ())),
+                      "avg_seconds": round(self._durations.get(cls, self.default_duration), 1)}
+                for cls in sorted(set(self.limits) | set(self._queues))
+            }
+
+    def describe(self):
+        return "Runs: " + ", ".join(f"{cls} {s['running']}/{s['limit']} running, {s['queued']} queued"
+                                    for cls, s in self.stats().items())
+
+
+RUN_SCHEDULER = RunScheduler()
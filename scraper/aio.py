@@ -0,0 +1,25 @@
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    # Runs an asyncio event loop on a daemon thread so synchronous callers
+    # (Gradio handlers, crawler workers) can share async resources safely.
+    def __init__(self, name="aio-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self):
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
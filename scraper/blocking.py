@@ -0,0 +1,105 @@
+import json
+from urllib.parse import urlparse
+from config import BLOCK_RESOURCE_TYPES, BLOCK_DOMAINS, PAGE_LOAD_WAIT
+
+# Rough average transfer sizes, used to estimate the bandwidth a blocked request would have cost.
+TYPICAL_BYTES = {
+    "image": 60_000,
+    "media": 500_000,
+    "font": 40_000,
+    "stylesheet": 30_000,
+    "script": 50_000,
+}
+DEFAULT_BYTES = 10_000
+
+# File extensions per resource type, for engines that can only block by URL pattern (Selenium/CDP).
+EXTENSIONS = {
+    "image": ["png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "avif", "bmp"],
+    "media": ["mp4", "webm", "mp3", "ogg", "wav", "m3u8", "mov"],
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "stylesheet": ["css"],
+}
+
+# Playwright wait_until values mapped onto Selenium page load strategies.
+SELENIUM_LOAD_STRATEGY = {"commit": "none", "domcontentloaded": "eager", "load": "normal", "networkidle": "normal"}
+
+
+class PageLoadStats:
+    def __init__(self):
+        self.blocked = 0
+        self.blocked_by_type = {}
+        self.bytes_saved = 0
+        self.loaded = 0
+        self.bytes_loaded = 0
+
+    def record_blocked(self, resource_type):
+        self.blocked += 1
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+        self.bytes_saved += TYPICAL_BYTES.get(resource_type, DEFAULT_BYTES)
+
+    def record_loaded(self, nbytes):
+        self.loaded += 1
+        self.bytes_loaded += max(0, int(nbytes or 0))
+
+    def summary(self, url):
+        by_type = ", ".join(f"{k}: {v}" for k, v in sorted(self.blocked_by_type.items())) or "none"
+        return (f"Page load {url}: blocked {self.blocked} requests ({by_type}), "
+                f"~{self.bytes_saved // 1024} KB saved (est.), {self.loaded} loaded, "
+                f"{self.bytes_loaded // 1024} KB transferred.")
+
+
+class ResourceBlocker:
+    def __init__(self, resource_types=None, domains=None, wait_until=PAGE_LOAD_WAIT):
+        self.resource_types = set(BLOCK_RESOURCE_TYPES if resource_types is None else resource_types)
+        self.domains = [d.lower().lstrip(".") for d in (BLOCK_DOMAINS if domains is None else domains)]
+        self.wait_until = wait_until
+
+    def should_block(self, url, resource_type):
+        if resource_type in self.resource_types:
+            return True
+        host = (urlparse(url).hostname or "").lower()
+        return any(host == d or host.endswith("." + d) for d in self.domains)
+
+    # ---- Playwright ----
+    def route_handler(self, stats_ref):
+        # stats_ref() returns the PageLoadStats of the navigation currently in flight.
+        def handle(route):
+            request = route.request
+            if self.should_block(request.url, request.resource_type):
+                stats_ref().record_blocked(request.resource_type)
+                return route.abort()
+            return route.continue_()
+        return handle
+
+    def response_handler(self, stats_ref):
+        def handle(response):
+            stats_ref().record_loaded(response.headers.get("content-length", 0))
+        return handle
+
+    # ---- Selenium ----
+    def url_patterns(self):
+        patterns = [f"*.{ext}" for kind in sorted(self.resource_types) for ext in EXTENSIONS.get(kind, [])]
+        patterns += [f"*://{d}/*" for d in self.domains] + [f"*://*.{d}/*" for d in self.domains]
+        return patterns
+
+    def selenium_load_strategy(self):
+        return SELENIUM_LOAD_STRATEGY.get(self.wait_until, "normal")
+
+
+def stats_from_performance_log(entries):
+    # Builds PageLoadStats from Chrome "performance" log entries (CDP Network events).
+    stats = PageLoadStats()
+    types = {}
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError, TypeError):
+            continue
+        method, params = message.get("method"), message.get("params", {})
+        if method == "Network.requestWillBeSent":
+            types[params.get("requestId")] = (params.get("type") or "other").lower()
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            stats.record_blocked(types.get(params.get("requestId"), "other"))
+        elif method == "Network.loadingFinished":
+            stats.record_loaded(params.get("encodedDataLength", 0))
+    return stats
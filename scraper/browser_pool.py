@@ -0,0 +1,186 @@
+import asyncio
+import atexit
+import os
+import threading
+from config import JS_WAIT_SELECTOR, BROWSER_POOL_SIZE, BROWSER_POOL_MAX_NAVIGATIONS, HTTP_TIMEOUT
+from logger import logger
+from scraper.aio import BackgroundLoop
+from scraper.blocking import ResourceBlocker, PageLoadStats
+from scraper.scheduling import check_status
+
+STORAGE_STATE = "output/cookies/playwright_state.json"
+
+
+class PooledContext:
+    def __init__(self, context, page, generation):
+        self.context = context
+        self.page = page
+        self.generation = generation
+        self.navigations = 0
+        self.load_stats = PageLoadStats()
+
+
+class BrowserPool:
+    # One long-lived Chromium process handing out pre-warmed contexts (with the stored
+    # login state applied) to any thread. Contexts are recycled after max_navigations.
+    def __init__(self, size=BROWSER_POOL_SIZE, max_navigations=BROWSER_POOL_MAX_NAVIGATIONS,
+                 headless=True, storage_state=STORAGE_STATE):
+        self.size = max(1, size)
+        self.max_navigations = max(1, max_navigations)
+        self.headless = headless
+        self.storage_state = storage_state
+        self.blocker = ResourceBlocker()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.navigations = 0
+        self.recycled = 0
+        self._generation = 0
+        self._playwright = None
+        self._browser = None
+        self._idle = None
+        self._loop = BackgroundLoop("browser-pool")
+        self._loop.run(self._start())
+
+    async def _launch(self):
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        return await self._playwright.chromium.launch(headless=self.headless)
+
+    async def _start(self):
+        self._browser = await self._launch()
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._new_context())
+        logger.info(f"Browser pool started with {self.size} warm contexts.")
+
+    async def _new_context(self):
+        if self.storage_state and os.path.exists(self.storage_state):
+            context = await self._browser.new_context(storage_state=self.storage_state)
+        else:
+            context = await self._browser.new_context()
+        page = await context.new_page()
+        pooled = PooledContext(context, page, self._generation)
+        await context.route("**/*", self.blocker.route_handler(lambda: pooled.load_stats))
+        page.on("response", self.blocker.response_handler(lambda: pooled.load_stats))
+        return pooled
+
+    async def _recycle(self, pooled):
+        if pooled is not None:
+            try:
+                await pooled.context.close()
+            except Exception as e:
+                logger.warning(f"Failed to close pooled context: {e}")
+            self.recycled += 1
+        return await self._new_context()
+
+    async def _acquire(self):
+        # An empty slot (None) is left behind when a replacement context could not be opened;
+        # the next acquire tries again, so a failure never shrinks the pool.
+        pooled = await self._idle.get()
+        try:
+            if pooled is None or pooled.generation != self._generation:
+                pooled = await self._recycle(pooled)
+        except BaseException:
+            self._idle.put_nowait(None)
+            raise
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return pooled
+
+    async def _release(self, pooled):
+        self.in_use -= 1
+        try:
+            if pooled.navigations >= self.max_navigations or pooled.page.is_closed():
+                pooled = await self._recycle(pooled)
+        except Exception as e:
+            logger.warning(f"Failed to replace pooled context: {e}")
+            pooled = None
+        finally:
+            self._idle.put_nowait(pooled)
+
+    async def _with_page(self, fn):
+        pooled = await self._acquire()
+        try:
+            return await fn(pooled)
+        finally:
+            await self._release(pooled)
+
+    async def _fetch(self, pooled, url, wait_selector, timeout):
+        pooled.load_stats = PageLoadStats()
+        response = await pooled.page.goto(url, wait_until=self.blocker.wait_until, timeout=HTTP_TIMEOUT * 1000)
+        pooled.navigations += 1
+        self.navigations += 1
+        check_status(url, response)
+        try:
+            await pooled.page.wait_for_selector(wait_selector, timeout=timeout)
+        except Exception:
+            logger.warning(f"Timeout waiting for JS content: {wait_selector}")
+        logger.info(pooled.load_stats.summary(url))
+        return await pooled.page.content()
+
+    def fetch_html(self, url, wait_selector=JS_WAIT_SELECTOR, timeout=5000):
+        return self._loop.run(self._with_page(lambda pooled: self._fetch(pooled, url, wait_selector, timeout)))
+
+    def run(self, fn):
+        # Runs an async fn(page) on a pooled page, e.g. to drive a login form.
+        async def call(pooled):
+            pooled.navigations += 1
+            return await fn(pooled.page)
+        return self._loop.run(self._with_page(call))
+
+    def refresh(self):
+        # Called after the stored session changes; contexts pick it up on next acquire.
+        self._generation += 1
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "idle": self.size - self.in_use,
+            "utilization": round(self.in_use / self.size, 2),
+            "peak_in_use": self.peak_in_use,
+            "navigations": self.navigations,
+            "recycled": self.recycled,
+        }
+
+    def describe(self):
+        s = self.stats()
+        return (f"Browser pool: {s['in_use']}/{s['size']} contexts busy (peak {s['peak_in_use']}), "
+                f"{s['navigations']} navigations, {s['recycled']} recycled.")
+
+    async def _shutdown(self):
+        while not self._idle.empty():
+            pooled = self._idle.get_nowait()
+            if pooled is not None:
+                await pooled.context.close()
+        await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    def close(self):
+        try:
+            self._loop.run(self._shutdown(), timeout=30)
+        except Exception as e:
+            logger.warning(f"Browser pool shutdown failed: {e}")
+        self._loop.stop()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_browser_pool(headless=True):
+    with _pools_lock:
+        if headless not in _pools:
+            if not _pools:
+                atexit.register(shutdown_browser_pools)
+            _pools[headless] = BrowserPool(headless=headless)
+        return _pools[headless]
+
+
+def shutdown_browser_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,15 @@
+import os
+import threading
+
+
+def write_atomic(path, data):
+    # Saved sessions are read by other runs (and processes) at any time: write a temp file and
+    # rename it over the old one, so a reader sees either the previous file or the new one.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return path
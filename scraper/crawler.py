@@ -0,0 +1,211 @@
+import os
+import queue
+import re
+import threading
+from urllib.parse import urljoin, urlparse, urldefrag, parse_qsl
+from bs4 import BeautifulSoup
+from config import MAX_PAGES, CRAWL_WORKERS, CRAWL_PER_HOST, CRAWL_DELAY, SNAPSHOT_DIR
+from logger import logger
+from metrics import timed
+from scraper.scheduling import FetchScheduler
+
+PAGE_PARAMS = {"page", "p", "pg", "pagenum", "page_number", "pageno", "start", "offset"}
+NEXT_LABELS = {"next", "next page", "›", "»", ">", "→", "more results"}
+PAGE_PATH_RE = re.compile(r"/page/\d+/?$", re.IGNORECASE)
+
+
+def _is_page_url(parsed):
+    if PAGE_PATH_RE.search(parsed.path):
+        return True
+    return any(key.lower() in PAGE_PARAMS for key, _ in parse_qsl(parsed.query))
+
+
+def find_pagination_links(html, base_url):
+    soup = BeautifulSoup(html, "lxml")
+    host = urlparse(base_url).netloc
+    links = []
+
+    def add(href):
+        href = urldefrag(urljoin(base_url, href))[0]
+        if href.startswith("http") and urlparse(href).netloc == host and href not in links:
+            links.append(href)
+
+    for tag in soup.select("link[rel~=next][href], a[rel~=next][href]"):
+        add(tag["href"])
+
+    for a in soup.find_all("a", href=True):
+        text = a.get_text(" ", strip=True).lower()
+        label = (a.get("aria-label") or "").lower()
+        is_next = text in NEXT_LABELS or "next" in label
+        is_number = text.isdigit() or label.startswith("page")
+        if not (is_next or is_number):
+            continue
+        href = urljoin(base_url, a["href"])
+        if is_next or _is_page_url(urlparse(href)):
+            add(href)
+    return links
+
+
+def _is_offline(engine):
+    from scraper.strategies import STRATEGIES, load_strategy_class
+    return engine in STRATEGIES and getattr(load_strategy_class(engine), "offline", False)
+
+
+class Crawler:
+    def __init__(self, engine="requests", headless=True, max_pages=MAX_PAGES, workers=CRAWL_WORKERS,
+                 per_host=CRAWL_PER_HOST, delay=CRAWL_DELAY, scraper_factory=None, incremental=False,
+                 on_page=None, metrics=None, frontier=None, snapshot_dir=SNAPSHOT_DIR):
+        self.engine = engine
+        self.headless = headless
+        self.incremental = incremental
+        self.max_pages = max(1, int(max_pages))
+        self.workers = max(1, min(int(workers), self.max_pages))
+        if _is_offline(engine):
+            per_host, delay = self.workers, 0  # no site to be polite to
+        self.scheduler = FetchScheduler(per_host, delay, metrics=metrics)
+        self.scraper_factory = scraper_factory or self._default_factory
+        # Called as on_page(url, html) from the worker thread for every fetched page.
+        self.on_page = on_page
+        self.metrics = metrics
+        # Optional CrawlFrontier: finished pages are replayed from it instead of being refetched.
+        self.frontier = frontier
+        # Restored pages get their HTML back from the snapshot archive for on_page; the URLs
+        # whose HTML could not be found are listed here once crawl() has replayed them.
+        self.snapshot_dir = snapshot_dir
+        self.missing_html = []
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._threads = []
+        self._login_lock = threading.Lock()
+        self._shared = None
+        self._stop = threading.Event()
+
+    def _default_factory(self):
+        from scraper.web_scraper import WebScraper
+        return WebScraper(engine=self.engine, headless=self.headless, incremental=self.incremental)
+
+    def _open_scraper(self):
+        with self._login_lock:
+            if self._shared is not None:
+                return self._shared
+            with timed(self.metrics, "startup", engine=self.engine):
+                scraper = self.scraper_factory()
+            with timed(self.metrics, "login", engine=self.engine):
+                scraper.login()
+            # Thread-safe engines (e.g. the async HTTP pool) are shared by every worker.
+            if getattr(getattr(scraper, "strategy", None), "thread_safe", False):
+                self._shared = scraper
+            return scraper
+
+    def _fetch(self, scraper, url):
+        html = self.scheduler.fetch(url, lambda: scraper.get_html(url))
+        if self.frontier is not None:
+            self.frontier.fetched(url, html)
+        if self.on_page is not None:
+            self.on_page(url, html)
+        with timed(self.metrics, "parse", url=url) as fields:
+            listings = scraper.extract_data(html)
+            links = find_pagination_links(html, url) if self.max_pages > 1 else []
+            fields.update(listings=len(listings), links=len(links))
+        return listings, links
+
+    def _worker(self):
+        # Browser sessions are bound to the thread that opened them, so each worker owns
+        # its scraper for the whole crawl and closes it on the way out.
+        scraper = None
+        try:
+            while True:
+                url = self._tasks.get()
+                if url is None:
+                    break
+                if self._stop.is_set():
+                    self._results.put((url, [], [], None))
+                    continue
+                try:
+                    if scraper is None:
+                        scraper = self._open_scraper()
+                    listings, links = self._fetch(scraper, url)
+                    self._results.put((url, listings, links, None))
+                except Exception as e:
+                    self._results.put((url, [], [], e))
+        finally:
+            if scraper is not None and scraper is not self._shared:
+                try:
+                    scraper.close()
+                except Exception as e:
+                    logger.warning(f"Failed to close scraper: {e}")
+
+    def crawl(self, start_url):
+        # Yields (url, listings, error) for each page as soon as it has been fetched and parsed.
+        # With a frontier, pages finished by an earlier attempt come first, straight from the store.
+        done, pending = [], [start_url]
+        if self.frontier is not None:
+            done, pending = self.frontier.restore(start_url)
+            if done:
+                logger.info(f"Resuming crawl: {len(done)} pages restored, {len(pending)} still to fetch.")
+        seen = {start_url, *pending, *(url for url, _, _, _ in done)}
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"crawler-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        for url in pending:
+            self._tasks.put(url)
+        outstanding = len(pending)
+        try:
+            if self.on_page is not None and done:
+                self._replay_html(done)
+            for url, listings, _, _ in done:
+                yield url, listings, None
+            while outstanding and not self._stop.is_set():
+                url, listings, links, error = self._results.get()
+                outstanding -= 1
+                if error is not None:
+                    logger.warning(f"Crawl fetch failed for {url}: {error}")
+                    if self.frontier is not None:
+                        self.frontier.fail(url, error)
+                    yield url, [], error
+                    continue
+                new_links = [link for link in links if link not in seen][:max(0, self.max_pages - len(seen))]
+                seen.update(new_links)
+                if self.frontier is not None:
+                    self.frontier.complete(url, listings, links, new_links)
+                for link in new_links:
+                    self._tasks.put(link)
+                    outstanding += 1
+                logger.info(f"Crawled {url}: {len(listings)} listings, {len(links)} pagination links.")
+                yield url, listings, None
+        finally:
+            logger.info(f"Fetch scheduling: {self.scheduler.describe()}")
+            self.close()
+
+    def _replay_html(self, done):
+        store = None
+        if os.path.isdir(os.path.join(self.snapshot_dir, "objects")):
+            from scraper.snapshots import SnapshotStore
+            store = SnapshotStore(self.snapshot_dir)
+        try:
+            for url, _, _, html_hash in done:
+                html = store.load(html_hash) if store is not None and html_hash else None
+                if html is None:
+                    self.missing_html.append(url)
+                else:
+                    self.on_page(url, html)
+        finally:
+            if store is not None:
+                store.close()
+        if self.missing_html:
+            logger.info(f"No archived HTML for {len(self.missing_html)} of {len(done)} restored pages.")
+
+    def close(self):
+        self._stop.set()
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._shared is not None:
+            shared, self._shared = self._shared, None
+            try:
+                shared.close()
+            except Exception as e:
+                logger.warning(f"Failed to close scraper: {e}")
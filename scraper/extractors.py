@@ -0,0 +1,128 @@
+import hashlib
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup
+from config import LISTING_SELECTORS
+from logger import logger
+
+SEPARATOR = " | "
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class SoupExtractor:
+    # Original BeautifulSoup implementation, kept as the fallback backend.
+    def __init__(self, selectors=LISTING_SELECTORS):
+        self.selector_str = ", ".join(selectors)
+
+    def extract(self, html):
+        soup = BeautifulSoup(html, "lxml")
+        listing_tags = soup.select(self.selector_str)
+        if not listing_tags:
+            listing_tags = soup.find_all("div")
+
+        extracted = []
+        seen = set()
+        for tag in listing_tags:
+            if tag.name in ["script", "style"]:
+                continue
+            text = tag.get_text(separator=SEPARATOR, strip=True)
+            if text and text not in seen:
+                seen.add(text)
+                extracted.append(text)
+        return extracted
+
+
+class LxmlExtractor:
+    # Single pass over lxml's native tree: the selectors are compiled into one XPath
+    # up front, nested matches are collapsed and listings are deduped by digest.
+    def __init__(self, selectors=LISTING_SELECTORS):
+        from lxml.cssselect import CSSSelector
+        self.selector = CSSSelector(", ".join(selectors))
+
+    @staticmethod
+    def parse(html):
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        parser = lxml.html.HTMLParser(encoding="utf-8")
+        tree = lxml.html.document_fromstring(html, parser=parser)
+        etree.strip_elements(tree, "script", "style", with_tail=False)
+        return tree
+
+    @staticmethod
+    def _repeated(siblings):
+        # Same parent and tag, and a class in common ("card" and "card card--featured" repeat).
+        classes = [set((el.get("class") or "").split()) for el in siblings]
+        return (len({(el.getparent(), el.tag) for el in siblings}) == 1
+                and (set.intersection(*classes) or not any(classes)))
+
+    @classmethod
+    def top_level(cls, matches):
+        # Keeps the outermost match of each nested group, unless its matched children are two
+        # or more repeated siblings: then it is a list container and its children win. A card's
+        # own parts (card-body, card-footer) stay in the card.
+        match_set = set(matches)
+        children = {el: [] for el in matches}
+        roots = []
+        for el in matches:
+            parent = next((a for a in el.iterancestors() if a in match_set), None)
+            (children[parent] if parent is not None else roots).append(el)
+
+        result = []
+        stack = list(reversed(roots))
+        while stack:
+            el = stack.pop()
+            if len(children[el]) >= 2 and cls._repeated(children[el]):
+                stack.extend(reversed(children[el]))
+            else:
+                result.append(el)
+        return result
+
+    def elements(self, tree):
+        matches = self.selector(tree)
+        if matches:
+            return self.top_level(matches)
+        # Fallback mirrors the old find_all("div"), but only innermost divs so text is not repeated.
+        return [div for div in tree.iter("div") if next(div.iterdescendants("div"), None) is None]
+
+    @staticmethod
+    def element_text(el):
+        return SEPARATOR.join(part.strip() for part in el.itertext() if part.strip())
+
+    def outside_text(self, html):
+        # The page's text around the listing cards (navigation, filters, footer), joined like a listing.
+        try:
+            tree = self.parse(html)
+        except (etree.ParserError, ValueError):
+            return ""
+        for el in self.elements(tree):
+            el.drop_tree()
+        return self.element_text(tree)
+
+    def extract(self, html):
+        try:
+            tree = self.parse(html)
+        except (etree.ParserError, ValueError):
+            return []
+        extracted = []
+        seen = set()
+        for el in self.elements(tree):
+            text = self.element_text(el)
+            if not text:
+                continue
+            digest = _digest(text)
+            if digest not in seen:
+                seen.add(digest)
+                extracted.append(text)
+        return extracted
+
+
+def get_extractor(backend="lxml", selectors=LISTING_SELECTORS):
+    if backend == "lxml":
+        try:
+            return LxmlExtractor(selectors)
+        except Exception as e:
+            logger.warning(f"lxml extractor unavailable ({e}), falling back to BeautifulSoup.")
+    return SoupExtractor(selectors)
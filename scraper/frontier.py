@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from config import FRONTIER_PATH, FRONTIER_RESUME_MAX_AGE
+from scraper.snapshots import content_hash
+
+
+# A run owned by another host counts as live while it was updated this recently.
+REMOTE_OWNER_TTL = 600
+HOST = socket.gethostname()
+
+
+def run_id(url, max_pages):
+    return hashlib.sha1(f"{url}\x1f{int(max_pages)}".encode("utf-8")).hexdigest()[:16]
+
+
+def _owner_alive(owner, updated, active):
+    # owner is "host:pid:token" of the CrawlFrontier that last ran the id.
+    host, _, rest = (owner or "").partition(":")
+    pid, _, token = rest.partition(":")
+    if host != HOST:
+        return bool(owner) and time.time() - updated < REMOTE_OWNER_TTL
+    if not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return token in active
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class CrawlFrontier:
+    # Durable state of one run (start URL + page budget): every known page URL with its status,
+    # HTML hash, listings and pagination links, plus each finished LLM batch. A run that did not
+    # finish is resumed from here, and a completed one drops its pages and batches.
+    # While the run is in flight (in this process or another), a second run of the same URL and
+    # budget works under a throwaway id instead of sharing or resuming its state; throwaway
+    # state is deleted however that run ends. A run older than max_age hours is started over.
+    _tokens = set()
+    _tokens_lock = threading.Lock()
+
+    def __init__(self, url, max_pages, path=FRONTIER_PATH, resume=True, max_age=FRONTIER_RESUME_MAX_AGE):
+        self.run_id = run_id(url, max_pages)
+        self.token = uuid.uuid4().hex[:8]
+        self.owner = f"{HOST}:{os.getpid()}:{self.token}"
+        self.throwaway = False
+        self.expired = False
+        with self._tokens_lock:
+            self._tokens.add(self.token)
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # WAL keeps every commit durable across a crash without blocking readers, and
+        # synchronous=NORMAL only syncs at checkpoints, which is plenty for resumable work.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id TEXT PRIMARY KEY, url TEXT NOT NULL, status TEXT NOT NULL, started REAL NOT NULL, "
+            "updated REAL NOT NULL, owner TEXT);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "run_id TEXT NOT NULL, url TEXT NOT NULL, status TEXT NOT NULL, added INTEGER NOT NULL, "
+            "completed INTEGER, html_hash TEXT, listings TEXT, links TEXT, error TEXT, updated REAL NOT NULL, "
+            "PRIMARY KEY (run_id, url));"
+            "CREATE TABLE IF NOT EXISTS batches ("
+            "run_id TEXT NOT NULL, key TEXT NOT NULL, output TEXT NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (run_id, key));"
+        )
+        if "owner" not in [column[1] for column in self._db.execute("PRAGMA table_info(runs)")]:
+            self._db.execute("ALTER TABLE runs ADD COLUMN owner TEXT")
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            with self._tokens_lock:
+                active = set(self._tokens)
+            # Throwaway runs left behind by processes that died are never resumed; drop them.
+            for stale, owner, updated in self._db.execute(
+                "SELECT run_id, owner, updated FROM runs WHERE run_id LIKE ?", (f"{self.run_id}-%",)
+            ).fetchall():
+                if not _owner_alive(owner, updated, active):
+                    self._delete(stale, runs=True)
+            row = self._db.execute("SELECT status, owner, updated, started FROM runs WHERE run_id = ?",
+                                   (self.run_id,)).fetchone()
+            if row and row[0] == "running" and _owner_alive(row[1], row[2], active):
+                self.run_id = f"{self.run_id}-{self.token}"
+                self.throwaway, row = True, None
+            now = time.time()
+            self.resumed = bool(resume and row and row[0] != "complete")
+            if self.resumed and max_age and now - row[3] > max_age * 3600:
+                self.resumed, self.expired = False, True
+            # A resumed run keeps its start time, so its age counts from the oldest stored page.
+            self.started = row[3] if self.resumed else now
+            if not self.resumed:
+                self._delete(self.run_id)
+            self._db.execute(
+                "INSERT INTO runs (run_id, url, status, started, updated, owner) VALUES (?, ?, 'running', ?, ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET status = 'running', started = excluded.started, "
+                "updated = excluded.updated, owner = excluded.owner",
+                (self.run_id, url, self.started, now, self.owner),
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._seq = self._db.execute(
+            "SELECT MAX(MAX(added), COALESCE(MAX(completed), 0)) FROM pages WHERE run_id = ?", (self.run_id,)
+        ).fetchone()[0] or 0
+
+    def _delete(self, run, runs=False):
+        self._db.execute("DELETE FROM pages WHERE run_id = ?", (run,))
+        self._db.execute("DELETE FROM batches WHERE run_id = ?", (run,))
+        if runs:
+            self._db.execute("DELETE FROM runs WHERE run_id = ?", (run,))
+
+    def _next(self):
+        self._seq += 1
+        return self._seq
+
+    def _add(self, urls):
+        now = time.time()
+        for url in urls:
+            self._db.execute(
+                "INSERT OR IGNORE INTO pages (run_id, url, status, added, updated) VALUES (?, ?, 'pending', ?, ?)",
+                (self.run_id, url, self._next(), now),
+            )
+
+    def restore(self, start_url):
+        # Returns (done, pending): finished pages as (url, listings, links, html_hash) in the
+        # order they completed, and the URLs still to fetch (failed pages get another try).
+        with self._lock, self._db:
+            self._add([start_url])
+            rows = self._db.execute(
+                "SELECT url, status, listings, links, html_hash FROM pages WHERE run_id = ? "
+                "ORDER BY status != 'done', COALESCE(completed, added)",
+                (self.run_id,),
+            ).fetchall()
+        done = [(url, json.loads(listings), json.loads(links), html_hash)
+                for url, status, listings, links, html_hash in rows if status == "done"]
+        return done, [url for url, status, _, _, _ in rows if status != "done"]
+
+    def fetched(self, url, html):
+        # Same hash as the snapshot archive, so a page's exact HTML can be looked up there.
+        with self._lock, self._db:
+            self._db.execute("UPDATE pages SET html_hash = ?, updated = ? WHERE run_id = ? AND url = ?",
+                             (content_hash(html), time.time(), self.run_id, url))
+
+    def complete(self, url, listings, links, new_links=()):
+        # Marks the page done and queues the links it discovered in the same transaction, so a
+        # crash can never lose pages the crawl had already decided to visit.
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE pages SET status = 'done', completed = ?, listings = ?, links = ?, error = NULL, updated = ? "
+                "WHERE run_id = ? AND url = ?",
+                (self._next(), json.dumps(listings), json.dumps(links), time.time(), self.run_id, url),
+            )
+            self._add(new_links)
+
+    def fail(self, url, error):
+        with self._lock, self._db:
+            self._db.execute("UPDATE pages SET status = 'failed', error = ?, updated = ? WHERE run_id = ? AND url = ?",
+                             (str(error)[:500], time.time(), self.run_id, url))
+
+    def batch_output(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT output FROM batches WHERE run_id = ? AND key = ?",
+                                   (self.run_id, key)).fetchone()
+        return row[0] if row else None
+
+    def save_batch(self, key, output):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO batches (run_id, key, output, updated) VALUES (?, ?, ?, ?)",
+                             (self.run_id, key, output, time.time()))
+
+    def finish(self, status="complete"):
+        # A completed run has nothing left to resume, and a throwaway one can never be resumed.
+        with self._lock, self._db:
+            self._db.execute("UPDATE runs SET status = ?, updated = ? WHERE run_id = ?",
+                             (status, time.time(), self.run_id))
+            if status == "complete" or self.throwaway:
+                self._delete(self.run_id, runs=self.throwaway)
+
+    def describe(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM pages WHERE run_id = ? GROUP BY status",
+                                           (self.run_id,)).fetchall())
+            batches = self._db.execute("SELECT COUNT(*) FROM batches WHERE run_id = ?", (self.run_id,)).fetchone()[0]
+        age = (time.time() - self.started) / 3600
+        return (f"Frontier: started {age:.1f}h ago, {counts.get('done', 0)} pages done, {counts.get('pending', 0)} pending, "
+                f"{counts.get('failed', 0)} failed, {batches} LLM batches saved.")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+        with self._tokens_lock:
+            self._tokens.discard(self.token)
@@ -0,0 +1,147 @@
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from config import INCREMENTAL_DB_PATH
+
+
+def _connect(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+class ConditionalStore:
+    # Remembers ETag/Last-Modified and the last body per URL so unchanged pages come back as 304s.
+    def __init__(self, path=INCREMENTAL_DB_PATH):
+        self._lock = threading.Lock()
+        self._db = _connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def headers_for(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def body_for(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT body FROM http_cache WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def remember(self, url, headers, body):
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if not (etag or last_modified):
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, body, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, time.time()),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# Card labels that lead many listings and say nothing about which listing it is.
+BADGES = {
+    "featured", "new", "new listing", "just listed", "sold", "under offer", "premium", "promoted", "sponsored",
+    "ad", "top", "hot", "exclusive", "price reduced", "reduced", "open home", "auction", "sale", "deal",
+}
+PRICE_RE = re.compile(r"[\s$€£¥.,%+/\d-]*\d[\s$€£¥.,%+/\d-]*(k|m|pw|pm)?", re.I)
+
+
+def listing_key(text, occurrence=0):
+    # Identity of a listing across runs: its first text fragment that is not a badge ("Featured")
+    # or a price, usually the title or address. The occurrence suffix only separates listings
+    # that still share that fragment.
+    fragments = [part.strip().lower() for part in text.split(" | ") if part.strip()] or [""]
+    head = next((part for part in fragments if part not in BADGES and not PRICE_RE.fullmatch(part)), fragments[0])
+    return f"{head}#{occurrence}" if occurrence else head
+
+
+def fingerprint(text):
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class ListingFingerprints:
+    # Per-search record of listing fingerprints, used to forward only new or changed listings.
+    def __init__(self, path=INCREMENTAL_DB_PATH):
+        self._db = _connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            "scope TEXT NOT NULL, key TEXT NOT NULL, fingerprint TEXT NOT NULL, text TEXT NOT NULL, "
+            "seen_at REAL NOT NULL, PRIMARY KEY (scope, key))"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _current(listings):
+        current, occurrences = {}, {}
+        for text in listings:
+            head = listing_key(text)
+            key = listing_key(text, occurrences.get(head, 0))
+            occurrences[head] = occurrences.get(head, 0) + 1
+            current[key] = (fingerprint(text), text)
+        return current
+
+    def _previous(self, scope):
+        return {
+            key: (fp, text)
+            for key, fp, text in self._db.execute(
+                "SELECT key, fingerprint, text FROM listings WHERE scope = ?", (scope,)
+            )
+        }
+
+    def diff(self, scope, listings):
+        # Returns (added, changed, removed) listing texts; nothing is recorded until commit().
+        previous, current = self._previous(scope), self._current(listings)
+        added = [text for key, (_, text) in current.items() if key not in previous]
+        changed = [text for key, (fp, text) in current.items() if key in previous and previous[key][0] != fp]
+        removed = [text for key, (_, text) in previous.items() if key not in current]
+        return added, changed, removed
+
+    def commit(self, scope, listings, processed=None):
+        # Records the listings of `processed` (all of them when None) as seen, out of the same
+        # full crawl passed to diff(), and forgets listings that are gone. Anything trimmed away
+        # or left unprocessed by a failed run stays new for the next run.
+        current = self._current(listings)
+        processed = None if processed is None else set(processed)
+        now = time.time()
+        self._db.executemany(
+            "DELETE FROM listings WHERE scope = ? AND key = ?",
+            [(scope, key) for key in self._previous(scope) if key not in current],
+        )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO listings (scope, key, fingerprint, text, seen_at) VALUES (?, ?, ?, ?, ?)",
+            [(scope, key, fp, text, now) for key, (fp, text) in current.items()
+             if processed is None or text in processed],
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+def write_delta_csv(path, added, changed, removed):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Change", "Key", "Listing"])
+        for change, items in (("added", added), ("changed", changed), ("removed", removed)):
+            for text in items:
+                writer.writerow([change, listing_key(text), text])
+    return path
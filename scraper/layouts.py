@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from urllib.parse import urljoin, urlparse
+from config import LAYOUTS_DIR, LAYOUT_MIN_FILL
+from logger import logger
+from scraper.extractors import LxmlExtractor
+
+SPACE_RE = re.compile(r"\s+")
+NUMBER_RE = re.compile(r"\d[\d,.]*")
+NON_WORD_RE = re.compile(r"\W+")
+
+
+def _norm(text):
+    return SPACE_RE.sub(" ", text or "").strip().strip('"').lower()
+
+
+def _card_key(text):
+    # Listing text compared across extractors: lxml and bs4 join and trim text nodes differently,
+    # so only the words count.
+    return NON_WORD_RE.sub(" ", text).lower().strip()
+
+
+def _is_number(value):
+    return bool(value) and NUMBER_RE.fullmatch(value.replace(" ", "")) is not None
+
+
+def _domain(url):
+    return urlparse(url).netloc.lower()
+
+
+def prompt_hash(prompt):
+    return hashlib.sha1(prompt.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def layout_path(url, layouts_dir=LAYOUTS_DIR):
+    return os.path.join(layouts_dir, re.sub(r"[^a-z0-9.-]+", "_", _domain(url)) + ".json")
+
+
+def _step(el):
+    classes = [c for c in sorted((el.get("class") or "").split()) if "'" not in c][:2]
+    cond = "".join(f"[contains(concat(' ', normalize-space(@class), ' '), ' {c} ')]" for c in classes)
+    return f"{el.tag}{cond}", bool(classes)
+
+
+def _xpath_for(el, card):
+    # Descendant path from the card: the target's tag/classes, anchored on its parent when unclassed.
+    step, has_class = _step(el)
+    parent = el.getparent()
+    if not has_class and parent is not None and parent is not card:
+        step = f"{_step(parent)[0]}/{step}"
+    return f".//{step}"
+
+
+def _field_spec(card, el, attr, number):
+    xpath = _xpath_for(el, card)
+    index = card.xpath(xpath).index(el)
+    return (xpath, index, attr, number)
+
+
+def _candidates(card, value, base_url):
+    # Yields (priority, depth, element, attr, number) for every element that holds `value`.
+    wanted = _norm(value)
+    for el in card.iter():
+        if not isinstance(el.tag, str):
+            continue
+        depth = sum(1 for _ in el.iterancestors())
+        for attr in ("href", "src"):
+            link = el.get(attr)
+            if link and wanted.startswith(("http", "/")) and _norm(urljoin(base_url, link)).endswith(wanted.rstrip("/")):
+                yield 0, depth, el, attr, False
+        text = _norm(" ".join(el.itertext()))
+        if text == wanted:
+            yield 1, depth, el, None, False
+        elif _is_number(value) and wanted in text and len(text) <= len(wanted) + 20:
+            yield 2, depth, el, None, True
+
+
+def _best_card(cards, row):
+    values = [_norm(v) for v in row if len(_norm(v)) >= 2]
+    if not values:
+        return None
+    scored = [(sum(v in text for v in values), card) for card, text in cards]
+    score, card = max(scored, key=lambda pair: pair[0], default=(0, None))
+    return card if score * 2 >= len(values) else None
+
+
+def _cards(html):
+    extractor = LxmlExtractor()
+    tree = extractor.parse(html)
+    return [(card, _norm(extractor.element_text(card))) for card in extractor.elements(tree)]
+
+
+def learn_layout(url, prompt, pages_html, header, rows):
+    # Derives a field -> selector mapping for the domain from rows the LLM produced.
+    votes = {name: Counter() for name in header}
+    cards = [(card, text, page_url) for page_url, html in pages_html.items() for card, text in _cards(html)]
+    pages = {card: page_url for card, _, page_url in cards}
+    cards = [(card, text) for card, text, _ in cards]
+    matched = 0
+    for row in rows:
+        card = _best_card(cards, row)
+        if card is None:
+            continue
+        matched += 1
+        for name, value in zip(header, row):
+            if not value.strip():
+                continue
+            found = sorted(_candidates(card, value, pages[card]), key=lambda c: (c[0], -c[1]))
+            if found:
+                _, _, el, attr, number = found[0]
+                votes[name][_field_spec(card, el, attr, number)] += 1
+    if not matched:
+        return None
+
+    fields = {}
+    for name, counter in votes.items():
+        if not counter:
+            logger.info(f"Layout learning: no selector found for '{name}'.")
+            return None
+        (xpath, index, attr, number), support = counter.most_common(1)[0]
+        if support * 5 < matched * 3:
+            logger.info(f"Layout learning: selector for '{name}' only matched {support}/{matched} rows.")
+            return None
+        fields[name] = {"xpath": xpath, "index": index, "attr": attr, "number": number}
+    return {
+        "domain": _domain(url),
+        "prompt_hash": prompt_hash(prompt),
+        "header": list(header),
+        "fields": fields,
+        "learned_from_rows": matched,
+        "learned_at": time.time(),
+    }
+
+
+def save_layout(layout, url, layouts_dir=LAYOUTS_DIR):
+    path = layout_path(url, layouts_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(layout, f, indent=2)
+    return path
+
+
+def load_layout(url, prompt, layouts_dir=LAYOUTS_DIR):
+    path = layout_path(url, layouts_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        layout = json.load(f)
+    # A layout answers one specific prompt; a different column request needs the LLM again.
+    return layout if layout.get("prompt_hash") == prompt_hash(prompt) else None
+
+
+def _field_value(card, spec, page_url):
+    matches = card.xpath(spec["xpath"])
+    if spec["index"] >= len(matches):
+        return ""
+    el = matches[spec["index"]]
+    if spec["attr"]:
+        link = el.get(spec["attr"]) or ""
+        return urljoin(page_url, link) if link else ""
+    text = SPACE_RE.sub(" ", " ".join(el.itertext())).strip()
+    if spec["number"]:
+        found = NUMBER_RE.search(text)
+        return found.group(0) if found else ""
+    return text
+
+
+def apply_layout(layout, pages_html, wanted=None):
+    # Returns rows for every card (optionally only cards whose listing text is in `wanted`), once
+    # per listing: repeats of a card and cards nested in one already taken are skipped.
+    extractor = LxmlExtractor()
+    wanted = None if wanted is None else {_card_key(text) for text in wanted}
+    rows, seen, taken = [], set(), set()
+    for page_url, html in pages_html.items():
+        tree = extractor.parse(html)
+        for card in extractor.elements(tree):
+            key = _card_key(extractor.element_text(card))
+            if key in seen or (wanted is not None and key not in wanted) or \
+                    any(parent in taken for parent in card.iterancestors()):
+                continue
+            seen.add(key)
+            taken.add(card)
+            rows.append([_field_value(card, layout["fields"][name], page_url) for name in layout["header"]])
+    return rows
+
+
+def validate_rows(layout, rows, min_fill=LAYOUT_MIN_FILL):
+    if not rows:
+        return False, "no rows extracted"
+    for i, name in enumerate(layout["header"]):
+        filled = sum(1 for row in rows if row[i].strip())
+        if filled < min_fill * len(rows):
+            return False, f"column '{name}' filled in {filled}/{len(rows)} rows"
+    return True, ""
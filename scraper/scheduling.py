@@ -0,0 +1,199 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from config import (
+    CRAWL_PER_HOST, CRAWL_DELAY, FETCH_RETRIES, FETCH_BACKOFF, FETCH_MAX_BACKOFF, FETCH_BURST,
+    FETCH_BREAKER_THRESHOLD, FETCH_BREAKER_COOLDOWN,
+)
+from logger import logger
+from metrics import timed
+
+THROTTLE_STATUSES = {429, 503}
+
+
+class FetchError(Exception):
+    # Raised by engines that do not surface HTTP errors themselves (browsers) for a bad status.
+    def __init__(self, url, status, retry_after=None):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+def check_status(url, response):
+    # For browser navigations: turn throttling and server errors into a retryable FetchError.
+    status = getattr(response, "status", None)
+    if status is not None and (status in THROTTLE_STATUSES or status >= 500):
+        raise FetchError(url, status, (getattr(response, "headers", None) or {}).get("retry-after"))
+
+
+def parse_retry_after(value):
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(error):
+    # Returns (kind, status, retry_after); kind is "throttled", "retry" or "fatal".
+    response = getattr(error, "response", None)
+    status = getattr(error, "status", None) or getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = parse_retry_after(getattr(error, "retry_after", None) or headers.get("retry-after"))
+    if status in THROTTLE_STATUSES:
+        return "throttled", status, retry_after
+    if status is not None and 400 <= status < 500 and status != 408:
+        return "fatal", status, None
+    # 5xx, 408 and transport errors (timeouts, resets, DNS) are worth another try.
+    return "retry", status, retry_after
+
+
+class TokenBucket:
+    # Refills one token every `interval` seconds up to `burst`; take() reserves a token and
+    # returns how long the caller must wait for it.
+    def __init__(self, interval, burst=1):
+        self.interval = max(0.0, interval)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        if self.interval > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+        else:
+            self._tokens = float(self.burst)
+        self._updated = now
+        self._tokens -= 1
+        return max(0.0, -self._tokens * self.interval)
+
+
+class HostState:
+    # Per-host adaptive limits: concurrency and request interval back off multiplicatively on
+    # throttling and recover additively on success (AIMD), guarded by a circuit breaker.
+    def __init__(self, per_host, delay, burst, threshold, cooldown):
+        self.max_limit = max(1, per_host)
+        self.limit = float(self.max_limit)
+        self.base_interval = max(0.0, delay)
+        self.bucket = TokenBucket(self.base_interval, burst)
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.active = 0
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial = False
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0, "failures": 0}
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            now = time.monotonic()
+            if self.open_until > now or (self.open_until and self.trial):
+                raise CircuitOpen(f"circuit open, retry in {max(0.0, self.open_until - now):.0f}s")
+            if self.open_until:
+                self.trial = True  # half-open: this request decides whether the circuit closes
+            while self.active >= int(self.limit):
+                self.cond.wait()
+            self.active += 1
+            self.stats["requests"] += 1
+            wait = self.bucket.take()
+        if wait:
+            time.sleep(wait)
+
+    def release(self, outcome, retry_after=None):
+        with self.cond:
+            self.active -= 1
+            if outcome in ("ok", "fatal"):
+                # The host answered; a 4xx is the request's fault, not a sign of overload.
+                self.failures = 0
+                self.open_until, self.trial = 0.0, False
+            if outcome == "ok":
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.bucket.interval = max(self.base_interval, self.bucket.interval * 0.9)
+            elif outcome in ("throttled", "retry"):
+                self.failures += 1
+                self.stats["throttled" if outcome == "throttled" else "failures"] += 1
+                if outcome == "throttled":
+                    self.limit = max(1.0, self.limit / 2)
+                    self.bucket.interval = min(FETCH_MAX_BACKOFF,
+                                               max(self.bucket.interval * 2, retry_after or 0, FETCH_BACKOFF))
+                if self.failures >= self.threshold or self.trial:
+                    self.open_until, self.trial = time.monotonic() + self.cooldown, False
+            self.cond.notify_all()
+
+    def describe(self, host):
+        state = "open" if self.open_until > time.monotonic() else "closed"
+        return (f"{host}: {self.stats['requests']} requests, {self.stats['throttled']} throttled, "
+                f"{self.stats['retries']} retries, concurrency {int(self.limit)}/{self.max_limit}, "
+                f"interval {self.bucket.interval:.2f}s, circuit {state}")
+
+
+class FetchScheduler:
+    # Shared by every worker of a crawl: rate limits each host, retries transient failures with
+    # jittered exponential backoff (honouring Retry-After) and fails fast while a host's circuit is open.
+    def __init__(self, per_host=CRAWL_PER_HOST, delay=CRAWL_DELAY, retries=FETCH_RETRIES, burst=FETCH_BURST,
+                 breaker_threshold=FETCH_BREAKER_THRESHOLD, breaker_cooldown=FETCH_BREAKER_COOLDOWN, metrics=None):
+        self.per_host = per_host
+        self.delay = delay
+        self.retries = max(0, retries)
+        self.burst = burst
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.metrics = metrics
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def host_state(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostState(self.per_host, self.delay, self.burst,
+                                              self.breaker_threshold, self.breaker_cooldown)
+            return self._hosts[host]
+
+    @staticmethod
+    def backoff(attempt, retry_after=None):
+        delay = min(FETCH_MAX_BACKOFF, FETCH_BACKOFF * 2 ** attempt) * (0.5 + random.random())
+        return min(FETCH_MAX_BACKOFF, max(delay, retry_after or 0))
+
+    def fetch(self, url, fetch_fn):
+        state = self.host_state(url)
+        for attempt in range(self.retries + 1):
+            with timed(self.metrics, "throttle", url=url):
+                state.acquire()
+            try:
+                with timed(self.metrics, "fetch", url=url, attempt=attempt + 1) as fields:
+                    result = fetch_fn()
+                    if isinstance(result, str):
+                        fields["bytes"] = len(result.encode("utf-8"))
+            except Exception as e:
+                kind, status, retry_after = classify(e)
+                state.release(kind, retry_after)
+                if kind == "fatal" or attempt == self.retries:
+                    raise
+                delay = self.backoff(attempt, retry_after)
+                with state.cond:
+                    state.stats["retries"] += 1
+                logger.warning(f"Fetch {url} failed ({status or type(e).__name__}), attempt {attempt + 1}; "
+                               f"retrying in {delay:.1f}s")
+                with timed(self.metrics, "backoff", url=url, status=status):
+                    time.sleep(delay)
+                continue
+            state.release("ok")
+            return result
+
+    def describe(self):
+        with self._lock:
+            hosts = dict(self._hosts)
+        return "; ".join(state.describe(host) for host, state in hosts.items()) or "no requests"
@@ -0,0 +1,325 @@
+import atexit
+import json
+import os
+import pickle
+import threading
+import time
+from config import (
+    JS_WAIT_SELECTOR, HTTP_TIMEOUT, SELENIUM_POOL_SIZE, SELENIUM_POOL_MIN_SIZE, SELENIUM_POOL_MAX_NAVIGATIONS,
+    SELENIUM_WAIT_TIMEOUT, SELENIUM_DRIVER_PATH, SELENIUM_DRIVER_TTL,
+)
+from logger import logger
+from scraper.blocking import ResourceBlocker, PageLoadStats, stats_from_performance_log
+from scraper.cookies import write_atomic
+
+COOKIE_PATH = "output/cookies/selenium_cookies.pkl"
+DRIVER_CACHE_PATH = "output/state/chromedriver.json"
+
+_driver_lock = threading.Lock()
+_driver_path = None
+
+
+def resolve_chromedriver(cache_path=DRIVER_CACHE_PATH, ttl=SELENIUM_DRIVER_TTL):
+    # ChromeDriverManager().install() checks the browser and driver versions (over the network)
+    # on every call, so the answer is kept for the process and on disk for `ttl` seconds.
+    # Returns None when no driver could be resolved, leaving it to Selenium Manager.
+    global _driver_path
+    with _driver_lock:
+        if _driver_path is not None:
+            return _driver_path or None
+        if SELENIUM_DRIVER_PATH:
+            _driver_path = SELENIUM_DRIVER_PATH
+            return _driver_path
+        cached = None
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            pass
+        usable = cached is not None and os.path.exists(cached.get("path", ""))
+        if usable and time.time() - cached.get("resolved_at", 0) < ttl:
+            _driver_path = cached["path"]
+            return _driver_path
+        try:
+            from webdriver_manager.chrome import ChromeDriverManager
+            _driver_path = ChromeDriverManager().install()
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump({"path": _driver_path, "resolved_at": time.time()}, f)
+        except Exception as e:
+            if usable:
+                logger.warning(f"Chromedriver check failed ({e}), reusing {cached['path']}.")
+                _driver_path = cached["path"]
+            else:
+                logger.warning(f"Chromedriver could not be resolved ({e}), leaving it to Selenium Manager.")
+                _driver_path = ""
+        return _driver_path or None
+
+
+def _enable_blocking(driver, blocker):
+    patterns = blocker.url_patterns()
+    if not patterns:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        logger.warning(f"Selenium request blocking unavailable: {e}")
+
+
+def new_driver(headless=True, blocker=None):
+    # No implicit wait: element lookups fail fast, and waiting is done explicitly with wait_for.
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from scraper.strategies import random_user_agent
+    blocker = blocker or ResourceBlocker()
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+    options.add_argument(f"user-agent={random_user_agent()}")
+    options.page_load_strategy = blocker.selenium_load_strategy()
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    path = resolve_chromedriver()
+    driver = webdriver.Chrome(service=Service(path) if path else Service(), options=options)
+    driver.set_page_load_timeout(HTTP_TIMEOUT)
+    _enable_blocking(driver, blocker)
+    return driver
+
+
+def save_cookies(driver, path=COOKIE_PATH):
+    write_atomic(path, pickle.dumps(driver.get_cookies()))
+
+
+def load_cookies(driver, path=COOKIE_PATH):
+    # Set through CDP, which accepts cookies for any domain without first navigating there.
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb") as f:
+        cookies = pickle.load(f)
+    params = []
+    for cookie in cookies:
+        cookie = dict(cookie)
+        if "expiry" in cookie:
+            cookie["expires"] = cookie.pop("expiry")
+        params.append(cookie)
+    try:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": params})
+    except Exception as e:
+        logger.warning(f"Selenium cookies could not be loaded: {e}")
+        return False
+    logger.info("Selenium cookies loaded.")
+    return True
+
+
+def wait_for(driver, selector, timeout=SELENIUM_WAIT_TIMEOUT):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    try:
+        return WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+    except Exception:
+        return None
+
+
+def page_load_stats(driver):
+    try:
+        return stats_from_performance_log(driver.get_log("performance"))
+    except Exception:
+        return PageLoadStats()
+
+
+def fetch_page(driver, url, wait_selector=JS_WAIT_SELECTOR, timeout=SELENIUM_WAIT_TIMEOUT):
+    page_load_stats(driver)  # drop log entries from earlier navigations
+    driver.get(url)
+    if wait_for(driver, wait_selector, timeout) is None:
+        logger.warning(f"Timeout waiting for JS content: {wait_selector}")
+    html = driver.page_source
+    logger.info(page_load_stats(driver).summary(url))
+    return html
+
+
+class PooledDriver:
+    def __init__(self, driver, generation):
+        self.driver = driver
+        self.generation = generation
+        self.navigations = 0
+
+
+class SeleniumPool:
+    # Up to `size` Chrome instances kept warm across runs and handed to one thread at a time.
+    # `min_size` of them start in a background thread as soon as the pool is built, the rest on
+    # demand, all with the saved cookies applied. They pick up new cookies after refresh() and
+    # are replaced after max_navigations or once their session dies.
+    def __init__(self, size=SELENIUM_POOL_SIZE, max_navigations=SELENIUM_POOL_MAX_NAVIGATIONS, headless=True,
+                 cookie_path=COOKIE_PATH, driver_factory=None, min_size=SELENIUM_POOL_MIN_SIZE):
+        self.size = max(1, size)
+        self.max_navigations = max(1, max_navigations)
+        self.headless = headless
+        self.cookie_path = cookie_path
+        self.blocker = ResourceBlocker()
+        self.driver_factory = driver_factory or (lambda: new_driver(self.headless, self.blocker))
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.navigations = 0
+        self.started = 0
+        self.recycled = 0
+        self._generation = 0
+        self._running = 0
+        self._idle = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._warmer = None
+        if min_size > 0:
+            self._warmer = threading.Thread(target=self._warm, args=(min(min_size, self.size),), daemon=True,
+                                            name="selenium-pool-warmup")
+            self._warmer.start()
+
+    def _warm(self, count):
+        # Each driver holds its slot while starting, so acquire() waits for it instead of starting another.
+        for _ in range(count):
+            with self._cond:
+                if self._closed or self._running >= self.size:
+                    return
+                self._running += 1
+            try:
+                pooled = self._start()
+            except Exception as e:
+                logger.warning(f"Selenium pool warm-up failed: {e}")
+                with self._cond:
+                    self._running -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                closed = self._closed
+                if closed:
+                    self._running -= 1
+                else:
+                    self._idle.append(pooled)
+                    self._cond.notify()
+            if closed:
+                pooled.driver.quit()
+                return
+
+    def _start(self):
+        started = time.perf_counter()
+        driver = self.driver_factory()
+        load_cookies(driver, self.cookie_path)
+        self.started += 1
+        logger.info(f"Selenium pool started Chrome #{self.started} in {time.perf_counter() - started:.1f}s.")
+        return PooledDriver(driver, self._generation)
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and self._running >= self.size:
+                self._cond.wait()
+            pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                self._running += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        try:
+            if pooled is None:
+                pooled = self._start()
+            elif pooled.generation != self._generation:
+                load_cookies(pooled.driver, self.cookie_path)
+                pooled.generation = self._generation
+            return pooled
+        except Exception:
+            self._discard(pooled)
+            raise
+
+    def _discard(self, pooled):
+        if pooled is not None:
+            try:
+                pooled.driver.quit()
+            except Exception as e:
+                logger.warning(f"Failed to quit pooled driver: {e}")
+        with self._cond:
+            self._running -= 1
+            self.in_use -= 1
+            self._cond.notify()
+
+    def _release(self, pooled):
+        if pooled.navigations >= self.max_navigations or not self._alive(pooled.driver):
+            self.recycled += 1
+            self._discard(pooled)
+            return
+        with self._cond:
+            self._idle.append(pooled)
+            self.in_use -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _alive(driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def run(self, fn):
+        # Runs fn(driver) on a pooled driver, e.g. to fetch a page or drive a login form.
+        pooled = self._acquire()
+        try:
+            return fn(pooled.driver)
+        finally:
+            pooled.navigations += 1
+            self.navigations += 1
+            self._release(pooled)
+
+    def fetch_html(self, url, wait_selector=JS_WAIT_SELECTOR, timeout=SELENIUM_WAIT_TIMEOUT):
+        return self.run(lambda driver: fetch_page(driver, url, wait_selector, timeout))
+
+    def refresh(self):
+        # Called after the saved cookies change; idle drivers reload them on next acquire.
+        self._generation += 1
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "running": self._running,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "started": self.started,
+            "navigations": self.navigations,
+            "recycled": self.recycled,
+        }
+
+    def describe(self):
+        s = self.stats()
+        return (f"Selenium pool: {s['in_use']}/{s['running']} drivers busy (size {s['size']}, peak {s['peak_in_use']}), "
+                f"{s['started']} started, {s['navigations']} navigations, {s['recycled']} recycled.")
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._running -= len(idle)
+        for pooled in idle:
+            try:
+                pooled.driver.quit()
+            except Exception as e:
+                logger.warning(f"Failed to quit pooled driver: {e}")
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_selenium_pool(headless=True):
+    with _pools_lock:
+        if headless not in _pools:
+            if not _pools:
+                atexit.register(shutdown_selenium_pools)
+            _pools[headless] = SeleniumPool(headless=headless)
+        return _pools[headless]
+
+
+def shutdown_selenium_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from config import SNAPSHOT_DIR, SNAPSHOT_RETENTION_DAYS
+from scraper.scheduling import FetchError
+
+
+def content_hash(html):
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+class SnapshotStore:
+    # Content-addressed archive of fetched pages: each distinct body is stored once, gzipped,
+    # under objects/<hash[:2]>/<hash>.html.gz, and index.sqlite3 maps (url, fetched_at) to hashes.
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        # Several CLI worker processes may record into the same archive, hence WAL and a busy timeout.
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite3"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "url TEXT NOT NULL, fetched_at REAL NOT NULL, hash TEXT NOT NULL, size INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS snapshots_url ON snapshots(url, fetched_at);"
+            "CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots(fetched_at);"
+            "CREATE INDEX IF NOT EXISTS snapshots_hash ON snapshots(hash);"
+        )
+
+    def _path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.html.gz")
+
+    def save(self, url, html, fetched_at=None):
+        digest = content_hash(html)
+        path = self._path(digest)
+        # The fetch is indexed before the object is written, so a concurrent prune never deletes
+        # an object it is about to refer to.
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO snapshots (url, fetched_at, hash, size) VALUES (?, ?, ?, ?)",
+                             (url, fetched_at or time.time(), digest, len(html)))
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so a crash or a concurrent writer never leaves a truncated object.
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+                f.write(html)
+            os.replace(tmp, path)
+        return digest
+
+    def load(self, digest):
+        try:
+            with gzip.open(self._path(digest), "rt", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def latest(self, url, before=None):
+        # Most recent snapshot of `url` (optionally as of `before`, a timestamp), or None.
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hash FROM snapshots WHERE url = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1",
+                (url, before or float("inf")),
+            ).fetchone()
+        return self.load(row[0]) if row else None
+
+    def history(self, url):
+        with self._lock:
+            return self._db.execute("SELECT fetched_at, hash, size FROM snapshots WHERE url = ? ORDER BY fetched_at",
+                                    (url,)).fetchall()
+
+    def urls(self, prefix=""):
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT url FROM snapshots WHERE url LIKE ? ESCAPE '\\' ORDER BY url",
+                                    (prefix.replace("%", r"\%").replace("_", r"\_") + "%",)).fetchall()
+        return [url for url, in rows]
+
+    def prune(self, max_age_days=SNAPSHOT_RETENTION_DAYS):
+        # Forgets fetches older than max_age_days (0 keeps everything) and deletes the objects no
+        # remaining fetch refers to; returns the number of fetches dropped.
+        if not max_age_days:
+            return 0
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock, self._db:
+            stale = [digest for digest, in self._db.execute(
+                "SELECT DISTINCT hash FROM snapshots WHERE fetched_at < ?", (cutoff,)).fetchall()]
+            dropped = self._db.execute("DELETE FROM snapshots WHERE fetched_at < ?", (cutoff,)).rowcount
+            for digest in stale:
+                if not self._db.execute("SELECT 1 FROM snapshots WHERE hash = ? LIMIT 1", (digest,)).fetchone():
+                    try:
+                        os.remove(self._path(digest))
+                    except FileNotFoundError:
+                        pass
+        return dropped
+
+    def describe(self):
+        with self._lock:
+            snapshots, urls, pages, size = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT url), COUNT(DISTINCT hash), COALESCE(SUM(size), 0) FROM snapshots"
+            ).fetchone()
+        stored = sum(entry.stat().st_size for folder in os.scandir(os.path.join(self.root, "objects"))
+                     if folder.is_dir() for entry in os.scandir(folder.path))
+        return (f"Snapshots: {snapshots} fetches of {urls} URLs, {pages} distinct pages, "
+                f"{size / 1e6:.1f} MB of HTML stored in {stored / 1e6:.1f} MB.")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ReplayStrategy:
+    # Serves pages from the snapshot archive instead of the network, so selectors, prompts and
+    # parsers can be iterated on at disk speed. Pages never archived fail like a 404.
+    thread_safe = True
+    offline = True
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR):
+        self.store = SnapshotStore(snapshot_dir)
+
+    def login(self):
+        pass
+
+    def fetch_html(self, url):
+        html = self.store.latest(url)
+        if html is None:
+            raise FetchError(url, 404)
+        return html
+
+    def close(self):
+        self.store.close()
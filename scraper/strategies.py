@@ -1,30 +1,48 @@
 
 import os
+import json
+import threading
 import time
 import pickle
+import asyncio
+import importlib
+import inspect
+from urllib.parse import urlparse
 from config import USERNAME, PASSWORD, LOGIN_URL, USERNAME_FIELD, PASSWORD_FIELD, JS_WAIT_SELECTOR
+from config import HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP_PER_HOST, HTTP2
+from config import LISTING_SELECTORS, AUTO_BROWSER_ENGINE, AUTO_MIN_LISTINGS, AUTO_ENGINE_PATH, AUTO_DECISION_TTL
 from logger import logger
-from fake_useragent import UserAgent
-from bs4 import BeautifulSoup
+from scraper.aio import BackgroundLoop
+from scraper.blocking import ResourceBlocker, PageLoadStats
+from scraper.cookies import write_atomic
+from scraper.incremental import ConditionalStore
+from scraper.scheduling import check_status
 import requests
 
-# Selenium imports
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+# Browser stacks (selenium, webdriver_manager, playwright) are imported inside the
+# strategies that use them, so HTTP-only runs never pay for loading them.
+
+_user_agents = None
+_user_agents_lock = threading.Lock()
+
+
+def random_user_agent():
+    # fake_useragent loads its browser data when first used, so it is imported and loaded once,
+    # by the first strategy that needs a User-Agent.
+    global _user_agents
+    with _user_agents_lock:
+        if _user_agents is None:
+            from fake_useragent import UserAgent
+            _user_agents = UserAgent()
+    return _user_agents.random
 
-# Playwright imports
-from playwright.sync_api import sync_playwright
 
 class RequestsStrategy:
     COOKIE_PATH = "output/cookies/requests_session.pkl"
-    def __init__(self):
+    def __init__(self, incremental=False):
         self.session = requests.Session()
-        self.session.headers.update({"User-Agent": UserAgent().random})
+        self.session.headers.update({"User-Agent": random_user_agent()})
+        self.conditional = ConditionalStore() if incremental else None
         self.load_session()
 
     def load_session(self):
@@ -34,16 +52,14 @@ class RequestsStrategy:
             logger.info("Requests session cookies loaded.")
 
     def save_session(self):
-        os.makedirs("output/cookies", exist_ok=True)
-        with open(self.COOKIE_PATH, "wb") as f:
-            pickle.dump(self.session.cookies, f)
+        write_atomic(self.COOKIE_PATH, pickle.dumps(self.session.cookies))
 
     def login(self):
         if not LOGIN_URL:
             logger.info('No LOGIN_URL provided, skipping login.')
             return
         data = {USERNAME_FIELD: USERNAME, PASSWORD_FIELD: PASSWORD}
-        r = self.session.post(LOGIN_URL, data=data, allow_redirects=True)
+        r = self.session.post(LOGIN_URL, data=data, allow_redirects=True, timeout=HTTP_TIMEOUT)
         if r.status_code == 200:
             logger.info("Requests login success.")
             self.save_session()
@@ -51,81 +67,209 @@ class RequestsStrategy:
             raise Exception(f"Requests login failed with status {r.status_code}.")
 
     def fetch_html(self, url):
-        r = self.session.get(url)
+        if self.conditional is None:
+            r = self.session.get(url, timeout=HTTP_TIMEOUT)
+            r.raise_for_status()
+            return r.text
+        r = self.session.get(url, headers=self.conditional.headers_for(url), timeout=HTTP_TIMEOUT)
+        if r.status_code == 304:
+            body = self.conditional.body_for(url)
+            if body is not None:
+                logger.info(f"{url} not modified, reusing stored copy.")
+                return body
+            r = self.session.get(url, timeout=HTTP_TIMEOUT)
         r.raise_for_status()
+        self.conditional.remember(url, r.headers, r.text)
         return r.text
 
+    def close(self):
+        self.session.close()
+        if self.conditional is not None:
+            self.conditional.close()
+
+
+class AsyncRequestsStrategy:
+    # Shares one pooled httpx client (keep-alive, compression, optional HTTP/2) across
+    # all callers; safe to use from several crawler threads at once.
+    COOKIE_PATH = RequestsStrategy.COOKIE_PATH
+    thread_safe = True
+
+    def __init__(self, per_host=HTTP_PER_HOST):
+        import httpx
+        self.per_host = max(1, per_host)
+        self._host_slots = {}
+        self._loop = BackgroundLoop("async-requests")
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.client = httpx.AsyncClient(
+            http2=HTTP2 and self._h2_available(),
+            limits=limits,
+            timeout=httpx.Timeout(HTTP_TIMEOUT),
+            follow_redirects=True,
+            headers={"User-Agent": random_user_agent()},
+        )
+        self.load_session()
+
+    @staticmethod
+    def _h2_available():
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.info("h2 not installed, async engine falling back to HTTP/1.1.")
+            return False
+
+    def load_session(self):
+        if os.path.exists(self.COOKIE_PATH):
+            with open(self.COOKIE_PATH, "rb") as f:
+                for cookie in pickle.load(f):
+                    self.client.cookies.jar.set_cookie(cookie)
+            logger.info("Async session cookies loaded.")
+
+    def save_session(self):
+        jar = requests.cookies.RequestsCookieJar()
+        for cookie in self.client.cookies.jar:
+            jar.set_cookie(cookie)
+        write_atomic(self.COOKIE_PATH, pickle.dumps(jar))
+
+    def login(self):
+        if not LOGIN_URL:
+            logger.info('No LOGIN_URL provided, skipping login.')
+            return
+        data = {USERNAME_FIELD: USERNAME, PASSWORD_FIELD: PASSWORD}
+        r = self._loop.run(self.client.post(LOGIN_URL, data=data))
+        if r.status_code == 200:
+            logger.info("Async login success.")
+            self.save_session()
+        else:
+            raise Exception(f"Async login failed with status {r.status_code}.")
+
+    def _host_slot(self, url):
+        # Only touched from the loop thread, so no lock is needed.
+        host = urlparse(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        return self._host_slots[host]
+
+    async def fetch(self, url):
+        async with self._host_slot(url):
+            r = await self.client.get(url)
+        r.raise_for_status()
+        return r.text
+
+    async def _fetch_all(self, urls):
+        return await asyncio.gather(*(self.fetch(url) for url in urls), return_exceptions=True)
+
+    def fetch_html(self, url):
+        return self._loop.run(self.fetch(url))
+
+    def fetch_many(self, urls):
+        # Returns page HTML (or the exception raised) for each URL, in input order.
+        return self._loop.run(self._fetch_all(urls))
+
+    def close(self):
+        self._loop.run(self.client.aclose())
+        self._loop.stop()
+
 
 class SeleniumStrategy:
     COOKIE_PATH = "output/cookies/selenium_cookies.pkl"
 
     def __init__(self, headless=True):
-        options = Options()
-        if headless:
-            options.add_argument("--headless=new")
-            options.add_argument("--disable-gpu")
-        options.add_argument(f"user-agent={UserAgent().random}")
-        self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-        self.driver.implicitly_wait(10)
+        from scraper.selenium_pool import new_driver, load_cookies
+        self.blocker = ResourceBlocker()
+        self.driver = new_driver(headless, self.blocker)
+        load_cookies(self.driver, self.COOKIE_PATH)
 
     def save_cookies(self):
-        os.makedirs("output/cookies", exist_ok=True)
-        with open(self.COOKIE_PATH, "wb") as f:
-            pickle.dump(self.driver.get_cookies(), f)
+        from scraper.selenium_pool import save_cookies
+        save_cookies(self.driver, self.COOKIE_PATH)
 
     def load_cookies(self):
-        if os.path.exists(self.COOKIE_PATH):
-            with open(self.COOKIE_PATH, "rb") as f:
-                cookies = pickle.load(f)
-            self.driver.get("about:blank")
-            for cookie in cookies:
-                self.driver.add_cookie(cookie)
-            logger.info("Selenium cookies loaded.")
+        from scraper.selenium_pool import load_cookies
+        load_cookies(self.driver, self.COOKIE_PATH)
 
     def login(self):
         if not LOGIN_URL:
             logger.info('No LOGIN_URL provided, skipping login.')
             return
-        self.driver.get(LOGIN_URL)
-        self._auto_fill_field(USERNAME_FIELD, USERNAME)
-        self._auto_fill_field(PASSWORD_FIELD, PASSWORD)
-        self._click_login_button()
-        time.sleep(2)
+        selenium_login(self.driver)
         self.save_cookies()
 
-    def _auto_fill_field(self, name, value):
-        try:
-            el = self.driver.find_element(By.NAME, name)
-            el.clear()
-            el.send_keys(value)
-        except Exception as e:
-            logger.warning(f"Field {name} not found or error: {e}")
-
-    def _click_login_button(self):
-        try:
-            btn = self.driver.find_element(By.CSS_SELECTOR, "button[type='submit'],input[type='submit']")
-            btn.click()
-        except Exception as e:
-            logger.warning(f"Login button not found or click failed: {e}")
-
     def fetch_html(self, url):
-        self.driver.get(url)
-        try:
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, JS_WAIT_SELECTOR))
-            )
-        except Exception:
-            logger.warning(f"Timeout waiting for JS content: {JS_WAIT_SELECTOR}")
-        return self.driver.page_source
+        from scraper.selenium_pool import fetch_page
+        return fetch_page(self.driver, url)
 
     def quit(self):
         self.driver.quit()
 
+    def close(self):
+        self.quit()
+
+
+def selenium_login(driver):
+    # Explicit waits only: each field gets a bounded wait instead of an implicit one on every lookup.
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from scraper.selenium_pool import wait_for
+    driver.get(LOGIN_URL)
+    for name, value in ((USERNAME_FIELD, USERNAME), (PASSWORD_FIELD, PASSWORD)):
+        el = wait_for(driver, f'[name="{name}"]')
+        if el is None:
+            logger.warning(f"Field {name} not found.")
+            continue
+        el.clear()
+        el.send_keys(value)
+    button = wait_for(driver, "button[type='submit'],input[type='submit']")
+    if button is None:
+        logger.warning("Login button not found.")
+        return
+    start_url = driver.current_url
+    button.click()
+    try:
+        WebDriverWait(driver, 10).until(lambda d: d.current_url != start_url)
+    except Exception:
+        logger.warning("Login did not navigate away from the form.")
+
+
+class PooledSeleniumStrategy:
+    # Borrows warm Chrome instances from the process-wide Selenium pool instead of starting
+    # Chrome (and resolving chromedriver) per run.
+    COOKIE_PATH = SeleniumStrategy.COOKIE_PATH
+    thread_safe = True
+
+    def __init__(self, headless=True):
+        from scraper.selenium_pool import get_selenium_pool
+        self.pool = get_selenium_pool(headless=headless)
+
+    def login(self):
+        if not LOGIN_URL:
+            logger.info('No LOGIN_URL provided, skipping login.')
+            return
+        if os.path.exists(self.COOKIE_PATH):
+            logger.info("Selenium login skipped, cookies exist.")
+            return
+        from scraper.selenium_pool import save_cookies
+        self.pool.run(lambda driver: (selenium_login(driver), save_cookies(driver, self.COOKIE_PATH)))
+        self.pool.refresh()
+        logger.info("Selenium login + cookies stored.")
+
+    def fetch_html(self, url):
+        return self.pool.fetch_html(url)
+
+    def close(self):
+        # The pool outlives the run; just report how busy it is.
+        logger.info(self.pool.describe())
+
 
 class PlaywrightStrategy:
     STORAGE_STATE = "output/cookies/playwright_state.json"
 
     def __init__(self, headless=True):
+        from playwright.sync_api import sync_playwright
         self.playwright = sync_playwright().start()
         self.browser = self.playwright.chromium.launch(headless=headless)
         self.context = None
@@ -137,6 +281,10 @@ class PlaywrightStrategy:
         else:
             self.context = self.browser.new_context()
             self.page = self.context.new_page()
+        self.blocker = ResourceBlocker()
+        self.load_stats = PageLoadStats()
+        self.context.route("**/*", self.blocker.route_handler(lambda: self.load_stats))
+        self.page.on("response", self.blocker.response_handler(lambda: self.load_stats))
 
     def login(self):
         if not LOGIN_URL:
@@ -150,15 +298,18 @@ class PlaywrightStrategy:
         self.page.fill(f'input[name="{PASSWORD_FIELD}"]', PASSWORD)
         self.page.click('button[type="submit"], input[type="submit"]')
         self.page.wait_for_timeout(2000)
-        self.context.storage_state(path=self.STORAGE_STATE)
+        write_atomic(self.STORAGE_STATE, json.dumps(self.context.storage_state()))
         logger.info("Playwright login + session stored.")
 
     def fetch_html(self, url):
-        self.page.goto(url)
+        self.load_stats = PageLoadStats()
+        response = self.page.goto(url, wait_until=self.blocker.wait_until, timeout=HTTP_TIMEOUT * 1000)
+        check_status(url, response)
         try:
             self.page.wait_for_selector(JS_WAIT_SELECTOR, timeout=5000)
         except Exception:
             logger.warning(f"Timeout waiting for JS content: {JS_WAIT_SELECTOR}")
+        logger.info(self.load_stats.summary(url))
         return self.page.content()
 
     def close(self):
@@ -167,14 +318,191 @@ class PlaywrightStrategy:
         self.playwright.stop()
 
 
-def get_strategy(engine, headless=True):
-    if engine == "requests":
-        return RequestsStrategy()
-    elif engine == "selenium":
-        return SeleniumStrategy(headless=headless)
-    elif engine == "playwright":
-        return PlaywrightStrategy(headless=headless)
-    else:
+class PooledPlaywrightStrategy:
+    # Borrows pages from the process-wide browser pool instead of launching Chromium per run.
+    STORAGE_STATE = PlaywrightStrategy.STORAGE_STATE
+    thread_safe = True
+
+    def __init__(self, headless=True):
+        from scraper.browser_pool import get_browser_pool
+        self.pool = get_browser_pool(headless=headless)
+
+    def login(self):
+        if not LOGIN_URL:
+            logger.info('No LOGIN_URL provided, skipping login.')
+            return
+        if os.path.exists(self.STORAGE_STATE):
+            logger.info("Playwright login skipped, storage state exists.")
+            return
+
+        async def submit_login(page):
+            await page.goto(LOGIN_URL)
+            await page.fill(f'input[name="{USERNAME_FIELD}"]', USERNAME)
+            await page.fill(f'input[name="{PASSWORD_FIELD}"]', PASSWORD)
+            await page.click('button[type="submit"], input[type="submit"]')
+            await page.wait_for_timeout(2000)
+            return await page.context.storage_state()
+
+        write_atomic(self.STORAGE_STATE, json.dumps(self.pool.run(submit_login)))
+        self.pool.refresh()
+        logger.info("Playwright login + session stored.")
+
+    def fetch_html(self, url):
+        return self.pool.fetch_html(url)
+
+    def close(self):
+        # The pool outlives the run; just report how busy it is.
+        logger.info(self.pool.describe())
+
+
+class EngineChoices:
+    # Per-domain verdicts of the auto engine ("http" or "browser"), shared by every worker in
+    # the process and saved as JSON so later runs start with the right engine.
+    _lock = threading.Lock()
+    _cache = {}
+
+    def __init__(self, path=AUTO_ENGINE_PATH, ttl=AUTO_DECISION_TTL):
+        self.path = path
+        self.ttl = ttl
+        with self._lock:
+            if path not in self._cache:
+                self._cache[path] = self._load()
+            self.choices = self._cache[path]
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable engine choices in {self.path}: {e}")
+            return {}
+
+    def get(self, domain):
+        with self._lock:
+            choice = self.choices.get(domain)
+        if choice is None or (self.ttl and time.time() - choice["decided_at"] > self.ttl):
+            return None
+        return choice["engine"]
+
+    def set(self, domain, engine):
+        with self._lock:
+            choice = self.choices.get(domain)
+            # Unchanged verdicts are only rewritten (to push back their expiry) once half-way stale.
+            if choice and choice["engine"] == engine and (
+                    not self.ttl or time.time() - choice["decided_at"] < self.ttl / 2):
+                return
+            self.choices[domain] = {"engine": engine, "decided_at": time.time()}
+            write_atomic(self.path, json.dumps(self.choices, indent=2, sort_keys=True))
+        logger.info(f"Auto engine: {domain} uses {engine}.")
+
+
+class AutoStrategy:
+    # Fetches with the plain requests session and only escalates to a browser engine when the
+    # served HTML shows no listings (or the site refuses non-browser clients with a 403). The
+    # verdict is remembered per domain, so JS-only sites go straight to the browser next time
+    # and server-rendered ones never start one.
+    # Not shared between crawl workers: each one holds its own HTTP session and, once a domain
+    # escalates, its own browser, so a JS site costs one browser per worker (as plain playwright does).
+    thread_safe = False
+
+    def __init__(self, headless=True, incremental=False, browser_engine=AUTO_BROWSER_ENGINE,
+                 min_listings=AUTO_MIN_LISTINGS):
+        from lxml.cssselect import CSSSelector
+        self.headless = headless
+        self.browser_engine = browser_engine
+        self.min_listings = max(1, min_listings)
+        self.http = RequestsStrategy(incremental=incremental)
+        self.browser = None
+        self.choices = EngineChoices()
+        self.listing_selector = CSSSelector(", ".join(LISTING_SELECTORS))
+        try:
+            self.wait_selector = CSSSelector(JS_WAIT_SELECTOR) if JS_WAIT_SELECTOR else None
+        except Exception:
+            self.wait_selector = None
+
+    def login(self):
+        self.http.login()
+
+    def _browser(self):
+        # Started on the first escalation only; it logs in itself since it has its own session.
+        if self.browser is None:
+            logger.info(f"Auto engine: starting {self.browser_engine}.")
+            self.browser = get_strategy(self.browser_engine, self.headless)
+            self.browser.login()
+        return self.browser
+
+    def has_content(self, html):
+        from scraper.extractors import LxmlExtractor
+        try:
+            tree = LxmlExtractor.parse(html)
+        except Exception:
+            return False
+        if self.wait_selector is not None and self.wait_selector(tree):
+            return True
+        return len(LxmlExtractor.top_level(self.listing_selector(tree))) >= self.min_listings
+
+    def fetch_html(self, url):
+        domain = urlparse(url).netloc.lower()
+        if self.choices.get(domain) == "browser":
+            return self._browser().fetch_html(url)
+        try:
+            html = self.http.fetch_html(url)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 403:
+                raise
+            html = None
+        if html is not None and self.has_content(html):
+            self.choices.set(domain, "http")
+            return html
+        rendered = self._browser().fetch_html(url)
+        if html is None or self.has_content(rendered):
+            self.choices.set(domain, "browser")
+            return rendered
+        # Neither copy has listings (e.g. an empty last page): keep the cheaper verdict.
+        return html
+
+    def close(self):
+        self.http.close()
+        if self.browser is not None:
+            self.browser.close()
+
+
+# Engine name -> "module:Class". Targets are only imported when their engine is selected,
+# so plugins living in other modules can register here without slowing down startup.
+STRATEGIES = {}
+
+
+def register_strategy(name, target):
+    STRATEGIES[name] = target
+
+
+register_strategy("requests", "scraper.strategies:RequestsStrategy")
+register_strategy("async", "scraper.strategies:AsyncRequestsStrategy")
+register_strategy("selenium", "scraper.strategies:SeleniumStrategy")
+register_strategy("selenium-pool", "scraper.strategies:PooledSeleniumStrategy")
+register_strategy("playwright", "scraper.strategies:PlaywrightStrategy")
+register_strategy("playwright-pool", "scraper.strategies:PooledPlaywrightStrategy")
+register_strategy("replay", "scraper.snapshots:ReplayStrategy")
+register_strategy("auto", "scraper.strategies:AutoStrategy")
+
+
+def load_strategy_class(engine):
+    target = STRATEGIES.get(engine)
+    if target is None:
         raise ValueError(f"Unknown scraping engine: {engine}")
+    if not isinstance(target, str):
+        return target
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def get_strategy(engine, headless=True, **options):
+    # Each strategy only receives the options its constructor declares.
+    cls = load_strategy_class(engine)
+    options["headless"] = headless
+    params = inspect.signature(cls).parameters
+    return cls(**{k: v for k, v in options.items() if k in params})
         
 
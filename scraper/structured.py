@@ -0,0 +1,193 @@
+import json
+import re
+from urllib.parse import urljoin
+from config import STRUCTURED_MIN_FILL
+
+# Listing data that sites embed for search engines (JSON-LD) or for client-side hydration
+# (Next.js __NEXT_DATA__). Listings whose record holds the columns the prompt asks for get
+# their row straight from it; only the rest go to the LLM.
+JSON_LD_RE = re.compile(r"<script[^>]*type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>", re.S | re.I)
+NEXT_DATA_RE = re.compile(r"<script[^>]*id=[\"']__NEXT_DATA__[\"'][^>]*>(.*?)</script>", re.S | re.I)
+HEADER_BAD_CHARS = set(".:;!?{}()")
+
+LISTING_TYPES = {
+    "product", "offer", "aggregateoffer", "realestatelisting", "residence", "house", "apartment",
+    "singlefamilyresidence", "accommodation", "hotelroom", "place", "localbusiness", "event", "jobposting",
+    "vehicle", "car", "book", "movie", "recipe", "course",
+}
+
+# Record keys tried for a requested column, most specific first; a key also matches nested
+# paths ending in it ("price" matches "offers.price").
+COLUMN_KEYS = {
+    "title": ("name", "title", "headline", "address.streetaddress"),
+    "name": ("name", "title", "headline"),
+    "address": ("address.streetaddress", "address", "streetaddress", "location"),
+    "location": ("address.addresslocality", "addresslocality", "location", "suburb", "city", "region", "address"),
+    "price": ("offers.price", "offers.lowprice", "pricespecification.price", "price", "displayprice", "pricedisplay"),
+    "beds": ("numberofbedrooms", "bedrooms", "beds", "numberofrooms"),
+    "bedrooms": ("numberofbedrooms", "bedrooms", "beds", "numberofrooms"),
+    "baths": ("numberofbathroomstotal", "numberoffullbathrooms", "bathrooms", "baths"),
+    "bathrooms": ("numberofbathroomstotal", "numberoffullbathrooms", "bathrooms", "baths"),
+    "url": ("url", "offers.url", "link", "href", "@id"),
+    "link": ("url", "offers.url", "link", "href", "@id"),
+    "listingurl": ("url", "offers.url", "link", "href", "@id"),
+    "description": ("description", "summary"),
+    "image": ("image", "thumbnail", "photo"),
+}
+
+
+# First record keys of columns that name a listing, used to pair records with listing cards.
+IDENTITY_KEYS = ("name", "address.streetaddress", "url")
+
+
+def requested_columns(prompt):
+    # The CSV header the prompt asks for, taken from its last "Title,Price,Beds"-style line.
+    columns = None
+    for line in prompt.splitlines():
+        fields = [field.strip().strip('"') for field in line.split(",")]
+        if len(fields) < 2 or "{data}" in line:
+            continue
+        if all(fields) and all(len(f) <= 30 and len(f.split()) <= 4 and not HEADER_BAD_CHARS & set(f) for f in fields):
+            columns = fields
+    return columns
+
+
+def _scalar(value):
+    if isinstance(value, bool) or value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _flatten(value, prefix="", out=None):
+    # {"offers": {"price": 5}} -> {"offers.price": "5", "offers": "5"}; lists of objects keep
+    # their first entry, lists of scalars are joined.
+    out = {} if out is None else out
+    if isinstance(value, dict):
+        parts = []
+        for key, child in value.items():
+            if key == "@context":
+                continue
+            key = re.sub(r"[_-]", "", key.lower())
+            _flatten(child, f"{prefix}.{key}" if prefix else key, out)
+            if not key.startswith("@") and not isinstance(child, (dict, list)) and _scalar(child):
+                parts.append(_scalar(child))
+        if prefix and parts:
+            out.setdefault(prefix, ", ".join(parts))
+    elif isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value):
+            _flatten(value[0], prefix, out)
+        elif prefix:
+            out[prefix] = "; ".join(v for v in map(_scalar, value) if v)
+    elif prefix and _scalar(value):
+        out[prefix] = _scalar(value)
+    return out
+
+
+def _types(node):
+    types = node.get("@type", [])
+    return {t.lower() for t in ([types] if isinstance(types, str) else types) if isinstance(t, str)}
+
+
+def _json_ld_records(node, records):
+    if isinstance(node, list):
+        for item in node:
+            _json_ld_records(item, records)
+    elif isinstance(node, dict):
+        types = _types(node)
+        if "itemlist" in types:
+            for element in node.get("itemListElement", []):
+                if isinstance(element, dict):
+                    item = element.get("item", element)
+                    records.append(item if isinstance(item, dict) else {"url": item})
+        elif types & LISTING_TYPES:
+            records.append(node)
+        else:
+            for key, child in node.items():
+                if key != "@context":
+                    _json_ld_records(child, records)
+
+
+def _largest_record_list(node, best=(0, None)):
+    # The list of like-shaped objects with the most data, e.g. props.pageProps.listings.
+    if isinstance(node, dict):
+        for child in node.values():
+            best = _largest_record_list(child, best)
+    elif isinstance(node, list):
+        items = [item for item in node if isinstance(item, dict)]
+        if len(items) >= 2 and len(items) * 5 >= len(node) * 4:
+            shared = set(items[0]).intersection(*items[1:])
+            if len(shared) >= 2 and len(items) * len(shared) > best[0]:
+                best = (len(items) * len(shared), items)
+        for item in node:
+            best = _largest_record_list(item, best)
+    return best
+
+
+def _load(blob):
+    try:
+        return json.loads(blob.strip())
+    except ValueError:
+        return None
+
+
+def extract_records(html):
+    # Flattened listing records from the page's JSON-LD, or failing that its __NEXT_DATA__.
+    records = []
+    for blob in JSON_LD_RE.findall(html):
+        _json_ld_records(_load(blob), records)
+    if not records:
+        match = NEXT_DATA_RE.search(html)
+        if match:
+            records = _largest_record_list(_load(match.group(1)))[1] or []
+    return [_flatten(record) for record in records]
+
+
+def _keys_for(column):
+    normalized = re.sub(r"[^a-z0-9]+", "", column.lower())
+    return COLUMN_KEYS.get(normalized, ()) + (normalized,)
+
+
+def _value(record, keys):
+    for key in keys:
+        if record.get(key):
+            return record[key]
+        for path, value in record.items():
+            if value and path.endswith("." + key):
+                return value
+    return ""
+
+
+def identity_columns(columns):
+    # Indexes of the columns that identify a listing (title, address, URL), in prompt order.
+    found = []
+    for i, column in enumerate(columns):
+        keys = _keys_for(column)
+        if keys[0] in IDENTITY_KEYS or keys[-1].endswith(("title", "name", "url")):
+            found.append(i)
+    return found
+
+
+def structured_rows(pages_records, columns, min_fill=STRUCTURED_MIN_FILL):
+    # Returns (rows, reason): the rows of records that fill at least min_fill of the columns, and
+    # "" when every record does, otherwise the first column some records leave empty.
+    keys = [_keys_for(column) for column in columns]
+    rows, seen = [], set()
+    for page_url, records in pages_records.items():
+        for record in records:
+            row = []
+            for column_keys in keys:
+                value = _value(record, column_keys)
+                row.append(urljoin(page_url, value) if value.startswith("/") else value)
+            if any(row) and tuple(row) not in seen:
+                seen.add(tuple(row))
+                rows.append(row)
+    if not rows:
+        return [], "no structured records"
+    for i, name in enumerate(columns):
+        filled = sum(1 for row in rows if row[i])
+        if filled < len(rows):
+            reason = f"column '{name}' filled in {filled}/{len(rows)} records"
+            return [row for row in rows if sum(map(bool, row)) >= min_fill * len(columns)], reason
+    return rows, ""
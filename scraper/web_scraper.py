@@ -2,19 +2,32 @@ import os
 from bs4 import BeautifulSoup
 from scraper.strategies import get_strategy
 from logger import logger
-from config import LISTING_SELECTORS
+from scraper.extractors import get_extractor
+from config import EXTRACTOR_BACKEND, SNAPSHOTS_ENABLED
 
 class WebScraper:
-    def __init__(self, engine="requests", headless=True):
+    def __init__(self, engine="requests", headless=True, incremental=False, snapshots=SNAPSHOTS_ENABLED):
         self.engine_name = engine
         self.headless = headless
-        self.strategy = get_strategy(engine, headless)
+        self.strategy = get_strategy(engine, headless, incremental=incremental)
+        self.extractor = get_extractor(EXTRACTOR_BACKEND)
+        # Pages served from the archive are not archived again.
+        self.record_snapshots = snapshots and not getattr(self.strategy, "offline", False)
+        self._snapshots = None
 
     def login(self):
         self.strategy.login()
 
     def get_html(self, url, filename_prefix=""):
         html = self.strategy.fetch_html(url)
+        if self.record_snapshots:
+            if self._snapshots is None:
+                from scraper.snapshots import SnapshotStore
+                self._snapshots = SnapshotStore()
+                dropped = self._snapshots.prune()
+                if dropped:
+                    logger.info(f"Pruned {dropped} expired page snapshots.")
+            self._snapshots.save(url, html)
         if filename_prefix:
             os.makedirs("output/html", exist_ok=True)
             file_path = f"output/html/{filename_prefix}.html"
@@ -35,22 +48,9 @@ class WebScraper:
         return "\n".join(structure_lines[:20])
 
     def extract_data(self, html):
-        soup = BeautifulSoup(html, "lxml")
-        selector_str = ", ".join(LISTING_SELECTORS)
-        listing_tags = soup.select(selector_str)
-        if not listing_tags:
-            listing_tags = soup.find_all("div")
-
-        extracted = []
-        seen = set()
-        for tag in listing_tags:
-            if tag.name in ["script", "style"]:
-                continue
-            text = tag.get_text(separator=" | ", strip=True)
-            if text and text not in seen:
-                seen.add(text)
-                extracted.append(text)
-        return extracted
+        return self.extractor.extract(html)
 
     def close(self):
-        self.strategy.close()
\ No newline at end of file
+        self.strategy.close()
+        if self._snapshots is not None:
+            self._snapshots.close()
\ No newline at end of file
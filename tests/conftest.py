@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def metrics_path(tmp_path, monkeypatch):
+    # Runs started by tests log their timings under tmp_path, not in logs/metrics.jsonl.
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr("metrics.METRICS_PATH", str(path))
+    return path
@@ -0,0 +1,23 @@
+import json
+from scraper.blocking import ResourceBlocker, stats_from_performance_log
+
+
+def test_should_block_by_type_and_domain():
+    blocker = ResourceBlocker(resource_types=["image"], domains=["tracker.com"])
+    assert blocker.should_block("https://example.com/a.png", "image")
+    assert blocker.should_block("https://cdn.tracker.com/t.js", "script")
+    assert not blocker.should_block("https://example.com/app.js", "script")
+    assert "*.png" in blocker.url_patterns()
+
+
+def test_stats_from_performance_log():
+    def entry(method, **params):
+        return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+    stats = stats_from_performance_log([
+        entry("Network.requestWillBeSent", requestId="1", type="Image"),
+        entry("Network.loadingFailed", requestId="1", blockedReason="inspector"),
+        entry("Network.loadingFinished", requestId="2", encodedDataLength=2048),
+    ])
+    assert stats.blocked_by_type == {"image": 1}
+    assert stats.bytes_loaded == 2048
@@ -0,0 +1,86 @@
+import pytest
+from scraper.browser_pool import BrowserPool
+
+
+class FakePage:
+    def __init__(self):
+        self.url = None
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        self.url = url
+
+    async def wait_for_selector(self, selector, timeout):
+        pass
+
+    async def content(self):
+        return f"<html>{self.url}</html>"
+
+    def is_closed(self):
+        return False
+
+    def on(self, event, handler):
+        pass
+
+
+class FakeContext:
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = 0
+
+    async def new_context(self, **kwargs):
+        self.contexts += 1
+        return FakeContext()
+
+    async def close(self):
+        pass
+
+
+class FakeBrowserPool(BrowserPool):
+    async def _launch(self):
+        return FakeBrowser()
+
+
+def test_pool_recycles_contexts(tmp_path):
+    pool = FakeBrowserPool(size=2, max_navigations=2, storage_state=str(tmp_path / "state.json"))
+    try:
+        for i in range(5):
+            assert pool.fetch_html(f"https://example.com/{i}") == f"<html>https://example.com/{i}</html>"
+        stats = pool.stats()
+        assert stats["navigations"] == 5
+        assert stats["in_use"] == 0
+        assert stats["recycled"] == 2
+        pool.refresh()
+        pool.fetch_html("https://example.com/again")
+        assert pool.stats()["recycled"] == 3
+    finally:
+        pool.close()
+
+
+def test_failed_recycle_keeps_the_slot(tmp_path):
+    pool = FakeBrowserPool(size=1, max_navigations=1, storage_state=str(tmp_path / "state.json"))
+    try:
+        browser = pool._browser
+        new_context = browser.new_context
+
+        async def broken(**kwargs):
+            raise RuntimeError("browser crashed")
+
+        browser.new_context = broken
+        pool.fetch_html("https://example.com/1")  # the replacement context fails on release
+        with pytest.raises(RuntimeError, match="browser crashed"):
+            pool.fetch_html("https://example.com/2")
+        browser.new_context = new_context
+        assert pool.fetch_html("https://example.com/3") == "<html>https://example.com/3</html>"
+        assert pool.stats()["in_use"] == 0
+    finally:
+        pool.close()
@@ -0,0 +1,44 @@
+import json
+import subprocess
+import sys
+import pytest
+import pipeline
+from cli import JOB_DEFAULTS, load_jobs, run_job
+
+
+def test_load_jobs_applies_defaults(tmp_path):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps({
+        "defaults": {"engine": "async"},
+        "jobs": [{"url": "https://a.com", "prompt": "{data}"}, {"name": "b c", "url": "https://b.com", "prompt": "{data}", "max_pages": 5}],
+    }))
+    jobs = load_jobs(str(path))
+    assert [job["name"] for job in jobs] == ["job1", "b_c"]
+    assert jobs[0]["engine"] == "async" and jobs[1]["max_pages"] == 5
+
+
+def test_load_jobs_requires_url_and_prompt(tmp_path):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps([{"url": "https://a.com"}]))
+    with pytest.raises(ValueError):
+        load_jobs(str(path))
+
+
+def test_run_job_writes_summary(tmp_path, monkeypatch):
+    def fake_pipeline(url, prompt, output_path, **kwargs):
+        state = pipeline.RunState()
+        state.log.append("done")
+        state.add_output(0, "Title,Price\nA,1")
+        state.output_path = output_path
+        yield state
+
+    monkeypatch.setattr(pipeline, "run_pipeline", fake_pipeline)
+    job = {**JOB_DEFAULTS, "name": "j", "url": "https://a.com", "prompt": "{data}"}
+    summary = run_job(job, str(tmp_path))
+    assert summary["status"] == "ok" and summary["output"].endswith("j.csv")
+    assert (tmp_path / "j.log").read_text() == "done"
+
+
+def test_cli_import_skips_gradio():
+    code = "import sys, cli, pipeline; sys.exit('gradio' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
@@ -0,0 +1,34 @@
+from agent.compaction import compact_listings, fragments, learn_boilerplate
+
+LISTINGS = [
+    "Featured | 1 Main St |  Auckland | $500,000 | 3 | beds | Save",
+    "Featured | 2 High St | Wellington | $600,000 | 2 | beds | Save",
+    "3 Low Rd | Auckland | $700,000 | 4 | beds | Save",
+]
+
+
+def test_fragments_collapse_whitespace_and_repeats():
+    assert fragments("A  house |  A  house | | $1") == ["A house", "$1"]
+
+
+def test_learn_boilerplate_keeps_values_and_labels():
+    assert learn_boilerplate(LISTINGS) == {"Featured", "Save"}
+
+
+def test_compact_listings_reports_savings():
+    compacted, report = compact_listings(LISTINGS)
+    assert compacted[0] == "1 Main St | Auckland | $500,000 | 3 | beds"
+    assert report["tokens_after"] < report["tokens_before"]
+
+
+def test_compact_listings_truncates_to_budget(monkeypatch):
+    monkeypatch.setattr("agent.compaction.estimate_tokens", lambda text: 1)
+    compacted, _ = compact_listings(["a | b | c | d"], max_tokens=4)
+    assert compacted == ["a | b"]
+
+
+def test_only_fragments_seen_around_the_cards_are_stripped():
+    listings = ["House | 1 Main St | Save", "House | 2 High St | Save", "Unit | 3 Low Rd | Save"]
+    assert learn_boilerplate(listings) == {"House", "Save"}
+    compacted, _ = compact_listings(listings, outside={"Save", "Sign in"})
+    assert compacted[0] == "House | 1 Main St"
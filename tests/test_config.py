@@ -1,5 +1,6 @@
 import json
-from config import load_config, CONFIG_PATH
+import pytest
+from config import as_bool, load_config, CONFIG_PATH
 
 def test_load_config_valid_json(tmp_path, monkeypatch):
     test_config = tmp_path / "config.json"
@@ -8,4 +9,10 @@ def test_load_config_valid_json(tmp_path, monkeypatch):
     monkeypatch.setattr("config.CONFIG_PATH", str(test_config))  # Patch the global path
     config = load_config()
 
-    assert config["USERNAME"] == "test"
\ No newline at end of file
+    assert config["USERNAME"] == "test"
+
+def test_as_bool_reads_strings():
+    assert [as_bool(v) for v in (True, 0, "false", " No ", "off", "0", "", "TRUE", "yes", "1")] == \
+        [True, False, False, False, False, False, False, True, True, True]
+    with pytest.raises(ValueError):
+        as_bool("maybe")
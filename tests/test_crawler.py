@@ -0,0 +1,34 @@
+from scraper.crawler import Crawler, find_pagination_links
+
+PAGES = {
+    "https://example.com/list": '<div class="card">A</div><a href="/list?page=2">2</a><a href="/list?page=3">3</a>',
+    "https://example.com/list?page=2": '<div class="card">B</div><a rel="next" href="/list?page=3">Next</a>',
+    "https://example.com/list?page=3": '<div class="card">C</div><a href="/list?page=4">4</a>',
+    "https://example.com/list?page=4": '<div class="card">D</div>',
+}
+
+
+class FakeScraper:
+    def login(self):
+        pass
+
+    def get_html(self, url):
+        return PAGES[url]
+
+    def extract_data(self, html):
+        return [html.split(">")[1].split("<")[0]]
+
+    def close(self):
+        pass
+
+
+def test_find_pagination_links():
+    html = '<a href="/list?page=2">2</a><a href="/about">About</a><a href="https://other.com/?page=3">3</a>'
+    assert find_pagination_links(html, "https://example.com/list") == ["https://example.com/list?page=2"]
+
+
+def test_crawl_honors_max_pages():
+    crawler = Crawler(max_pages=3, workers=2, delay=0, scraper_factory=FakeScraper)
+    results = list(crawler.crawl("https://example.com/list"))
+    assert len(results) == 3
+    assert sorted(listings[0] for _, listings, _ in results) == ["A", "B", "C"]
@@ -0,0 +1,65 @@
+import pytest
+from agent.csv_stream import CsvStreamParser, MalformedOutput
+from agent.lang_processor import process_batches
+
+
+def feed_chars(parser, text):
+    emitted = []
+    for char in text:
+        emitted.extend(parser.feed(char))
+    return emitted + parser.finish()
+
+
+def test_rows_emitted_as_lines_complete():
+    parser = CsvStreamParser()
+    assert parser.feed("Here you go:\n```csv\nTitle,Price,Notes\nVilla,$1") == []
+    assert parser.feed("00\nUnit,") == [["Villa", "$100", ""]]
+    rows = feed_chars(parser, '"$2,50"0,"two\nlines"\n```\nHope this helps, cheers!')
+    assert rows == [["Unit", "$2,500", "two lines"]]
+    assert parser.text().splitlines() == ["Title,Price,Notes", "Villa,$100,", 'Unit,"$2,500",two lines']
+
+
+def test_one_column_table_in_a_fence():
+    parser = CsvStreamParser()
+    assert feed_chars(parser, "Titles:\n```\nTitle\nOak St\n\"Elm, Rd\"\n```") == [["Oak St"], ["Elm, Rd"]]
+    assert parser.bad_rows == []
+
+
+def test_headers_remapped_to_first_batch_order():
+    reference = {}
+    first, second = CsvStreamParser(reference), CsvStreamParser(reference)
+    feed_chars(first, "Title,Price\nA,1\n")
+    assert feed_chars(second, "price,title\n2,B\n") == [["B", "2"]]
+    assert second.header == ["Title", "Price"]
+
+
+def test_malformed_output_aborts_stream():
+    parser = CsvStreamParser(max_bad_rows=1)
+    parser.feed("Title,Price\nA,1,extra,columns\n")
+    with pytest.raises(MalformedOutput):
+        parser.feed("I cannot help with that\n")
+
+
+def test_malformed_stream_is_closed_and_retried(monkeypatch):
+    closed, attempts = [], []
+
+    class FlakyLLM:
+        llm_type, model_name = "openai", "gpt-4"
+
+        def stream_response(self, prompt):
+            attempts.append(prompt)
+            try:
+                if len(attempts) == 1:
+                    yield "Title,Price\n" + "oops,1,2,3\n" * 10
+                    yield "never consumed\n"
+                else:
+                    yield "Title,Price\nListing 1,$1\n"
+            finally:
+                closed.append(len(attempts))
+
+    monkeypatch.setattr("agent.lang_processor.LLMHandler", FlakyLLM)
+    monkeypatch.setattr("agent.lang_processor._retry_delay", lambda error, attempt: 0)
+    events = list(process_batches(["Listing 1"], "{data}", retries=2, stream=True))
+    assert events[-1] == (0, ["Listing 1"], "Title,Price\nListing 1,$1", True)
+    assert [done for *_, done in events] == [False, True]
+    assert closed == [1, 2]
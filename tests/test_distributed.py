@@ -0,0 +1,112 @@
+import threading
+import pytest
+import agent.lang_processor
+import pipeline
+from distributed import SqliteQueue, Worker, main, remote_batches
+from pipeline import run_pipeline
+
+START = "https://example.com/list"
+PAGES = {
+    START: '<div class="card">A</div><a rel="next" href="/list?page=2">Next</a>',
+    START + "?page=2": '<div class="card">B</div>',
+}
+
+
+class FakeScraper:
+    def __init__(self, engine, headless):
+        self.engine = engine
+
+    def login(self):
+        pass
+
+    def get_html(self, url):
+        return PAGES[url]
+
+    def extract_data(self, html):
+        return [html.split(">")[1].split("<")[0]]
+
+    def close(self):
+        pass
+
+
+def fake_batches(data, prompt, **kwargs):
+    yield 0, data, "Title,Price\n" + "\n".join(f"{item},$1" for item in data), True
+
+
+def test_lease_expires_and_is_reclaimed(tmp_path):
+    queue = SqliteQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2)
+    assert queue.put("run", "page", "u1", {"url": "u1"})
+    assert not queue.put("run", "page", "u1", {"url": "u1"})
+
+    first = queue.lease("w1", lease_seconds=-1)  # already expired, as if w1 had died
+    assert queue.lease("w2", kinds=("llm",)) is None
+    second = queue.lease("w2")
+    assert (second.id, second.attempts) == (first.id, 2)
+    assert not queue.heartbeat(first, "w1")
+    assert queue.heartbeat(second, "w2")
+
+    assert queue.complete(second, {"ok": True})
+    assert not queue.complete(first, {"ok": False})  # the late duplicate is dropped
+    [(seq, key, status, result, error)] = queue.finished("run", "page")
+    assert (key, status, result) == ("u1", "done", {"ok": True})
+    assert queue.pending("run", "page") == 0
+    queue.close()
+
+
+def test_failed_task_is_retried_then_given_up(tmp_path):
+    queue = SqliteQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2)
+    queue.put("run", "page", "u1", {})
+    assert queue.fail(queue.lease("w1"), "boom")
+    assert queue.finished("run", "page") == []
+    queue.fail(queue.lease("w2"), "boom again")
+    [(_, _, status, _, error)] = queue.finished("run", "page")
+    assert (status, error) == ("failed", "boom again")
+    assert queue.lease("w3") is None
+    assert "page 1 failed" in queue.describe()
+    queue.close()
+
+
+def test_lease_expired_on_last_attempt_is_reported(tmp_path):
+    queue = SqliteQueue(str(tmp_path / "queue.sqlite3"), max_attempts=1)
+    queue.put("run", "llm", "b1", {})
+    queue.lease("w1", lease_seconds=-1)
+    assert queue.lease("w2") is None
+    [(_, key, status, _, error)] = queue.finished("run", "llm")
+    assert (key, status, error) == ("b1", "failed", "lease expired 1 times")
+    assert queue.pending("run", "llm") == 0
+    queue.close()
+
+
+def test_remote_batches_stop_without_workers(tmp_path):
+    queue = SqliteQueue(str(tmp_path / "queue.sqlite3"))
+    cancel = threading.Event()
+    cancel.set()
+    assert list(remote_batches(queue, "run", poll=0.01, cancel_event=cancel)(["A"], "{data}")) == []
+    with pytest.raises(RuntimeError, match="No LLM batch finished"):
+        list(remote_batches(queue, "run", poll=0.01, idle_timeout=0.05)(["A"], "{data}"))
+    queue.close()
+
+
+def test_coordinator_with_worker(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(pipeline, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr("distributed.LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(agent.lang_processor, "process_batches", fake_batches)
+    path = str(tmp_path / "queue.sqlite3")
+    queue = SqliteQueue(path)
+    worker = Worker(queue, worker_id="w1", poll=0.01, scraper_factory=FakeScraper)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    try:
+        states = list(run_pipeline(START, "{data}", max_pages=2, max_listings=10, use_layouts=True,
+                                   output_path=str(tmp_path / "out.csv"), queue_path=path))
+    finally:
+        worker.stop_event.set()
+        thread.join()
+    assert sorted(row[0] for row in states[-1].rows) == ["A", "B"]
+    assert any("learned layouts" in line and "disabled" in line for line in states[-1].log)
+    assert worker.done == 3 and worker.failed == 0
+    assert queue.counts() == {}  # a finished run clears its tasks
+    queue.close()
+
+    main(["status", "--queue", path])
+    assert capsys.readouterr().out.strip() == "Queue: empty"
@@ -0,0 +1,22 @@
+import agent.llm
+import pipeline
+from agent import clients
+from benchmarks.mock_site import MockSite
+from benchmarks.stub_llm import StubLLMServer
+
+
+def test_pipeline_end_to_end_against_local_stubs(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(agent.llm, "LLM_TYPE", "deepseek")
+    monkeypatch.setattr(pipeline, "LLM_CACHE_ENABLED", False)
+    try:
+        with MockSite(pages=3, cards=4) as site, StubLLMServer(reply=None) as llm:
+            monkeypatch.setattr(agent.llm, "DEEPSEEK_API_URL", f"{llm.url}/v1")
+            for state in pipeline.run_pipeline(site.url, "Extract Title and Price:\n{data}", max_pages=3,
+                                               max_listings=100, output_path="out.csv"):
+                pass
+        assert site.requests == 3
+        assert state.header == ["Title", "Price"] and len(state.rows) == 12
+        assert state.rows[0] == ["0 Queen Street, Auckland Central", "500,000"]
+    finally:
+        clients.close_clients()
@@ -0,0 +1,40 @@
+from scraper.extractors import LxmlExtractor, SoupExtractor
+
+HTML = """
+<html><body>
+<section class="results-card-list">
+  <div class="card"><div class="card-body">1 Main St<script>track()</script> | $500k</div></div>
+  <div class="card card--featured"><div class="card-body">2 High St <span>$600k</span></div></div>
+  <div class="card"><div class="card-body">2 High St <span>$600k</span></div></div>
+</section>
+</body></html>
+"""
+
+
+def test_lxml_keeps_outermost_cards_and_dedupes():
+    listings = LxmlExtractor(["div[class*='card']", "section[class*='card']"]).extract(HTML)
+    assert listings == ["1 Main St | $500k", "2 High St | $600k"]
+
+
+def test_lxml_keeps_card_parts_together():
+    html = "".join(f'<div class="card"><div class="card-body">House {x} | ${p}k</div>'
+                   f'<div class="card-footer">Agent {a}</div></div>' for x, p, a in (("A", 500, "X"), ("B", 600, "Y")))
+    selectors = ["div[class*='card']"]
+    assert LxmlExtractor(selectors).extract(html) == ["House A | $500k | Agent X", "House B | $600k | Agent Y"]
+    assert SoupExtractor(selectors).extract(html)[0] == "House A | $500k | Agent X"
+
+
+def test_outside_text_skips_the_cards():
+    html = "<nav>Buy | Save</nav>" + HTML.replace("</body>", "<footer>About us</footer></body>")
+    assert LxmlExtractor(["div[class*='card']"]).outside_text(html) == "Buy | Save | About us"
+
+
+def test_lxml_fallback_uses_innermost_divs():
+    html = "<html><body><div><div>Test Listing</div><div>Other</div></div></body></html>"
+    assert LxmlExtractor(["article"]).extract(html) == ["Test Listing", "Other"]
+
+
+def test_backends_agree_on_flat_cards():
+    html = "<ul><li class='listing'>A <b>1</b></li><li class='listing'>B <b>2</b></li></ul>"
+    selectors = ["li[class*='listing']"]
+    assert LxmlExtractor(selectors).extract(html) == SoupExtractor(selectors).extract(html)
@@ -0,0 +1,157 @@
+import os
+import re
+from agent.lang_processor import process_batches
+from scraper.crawler import Crawler
+from scraper.frontier import CrawlFrontier, HOST
+
+START = "https://example.com/list"
+PAGES = {
+    START: '<div class="card">A</div><a rel="next" href="/list?page=2">Next</a>',
+    START + "?page=2": '<div class="card">B</div><a rel="next" href="/list?page=3">Next</a>',
+    START + "?page=3": '<div class="card">C</div>',
+}
+
+
+def scraper_factory(fetched, fail=()):
+    class FakeScraper:
+        def login(self):
+            pass
+
+        def get_html(self, url):
+            fetched.append(url)
+            if url in fail:
+                raise ConnectionError("connection reset")
+            return PAGES[url]
+
+        def extract_data(self, html):
+            return [html.split(">")[1].split("<")[0]]
+
+        def close(self):
+            pass
+    return FakeScraper
+
+
+def crawl(path, fetched, fail=()):
+    frontier = CrawlFrontier(START, 3, path=path)
+    crawler = Crawler(max_pages=3, workers=1, delay=0, scraper_factory=scraper_factory(fetched, fail),
+                      frontier=frontier)
+    results = list(crawler.crawl(START))
+    return frontier, results
+
+
+def test_interrupted_crawl_resumes_without_refetching(tmp_path, monkeypatch):
+    monkeypatch.setattr("scraper.scheduling.FetchScheduler.backoff", staticmethod(lambda attempt, retry_after=None: 0))
+    path = str(tmp_path / "frontier.sqlite3")
+    fetched = []
+    frontier, results = crawl(path, fetched, fail={START + "?page=3"})
+    assert [error is None for _, _, error in results] == [True, True, False]
+    frontier.close()  # the run never finished, as after a crash
+
+    fetched.clear()
+    frontier, results = crawl(path, fetched)
+    assert frontier.resumed
+    assert fetched == [START + "?page=3"]
+    assert [listings for _, listings, _ in results] == [["A"], ["B"], ["C"]]
+    frontier.finish()
+    frontier.close()
+
+    fetched.clear()
+    frontier, results = crawl(path, fetched)
+    assert not frontier.resumed and len(fetched) == 3  # a finished run starts over
+    frontier.close()
+
+
+def test_expired_run_starts_over(tmp_path, monkeypatch):
+    monkeypatch.setattr("scraper.scheduling.FetchScheduler.backoff", staticmethod(lambda attempt, retry_after=None: 0))
+    path = str(tmp_path / "frontier.sqlite3")
+    fetched = []
+    frontier, _ = crawl(path, fetched, fail={START + "?page=3"})
+    frontier._db.execute("UPDATE runs SET started = started - 3 * 3600")
+    frontier._db.commit()
+    frontier.close()
+
+    frontier = CrawlFrontier(START, 3, path=path, max_age=4)
+    assert frontier.resumed and "started 3.0h ago" in frontier.describe()
+    frontier.close()
+    frontier = CrawlFrontier(START, 3, path=path, max_age=2)
+    assert not frontier.resumed and frontier.expired
+    assert frontier.restore(START) == ([], [START])
+    frontier.close()
+
+
+class CountingLLM:
+    llm_type = "openai"
+    model_name = "gpt-4"
+    calls = []
+
+    def generate_response(self, prompt):
+        rows = re.findall(r"Listing \d+", prompt)
+        self.calls.append(rows)
+        return "Title,Price\n" + "\n".join(f"{row},$1" for row in rows)
+
+
+def test_saved_batches_are_not_prompted_again(monkeypatch, tmp_path):
+    monkeypatch.setattr("agent.lang_processor.LLMHandler", CountingLLM)
+    monkeypatch.setattr("agent.lang_processor.input_budget", lambda model: 10)
+    data = [f"Listing {i}" for i in range(4)]
+    frontier = CrawlFrontier(START, 1, path=str(tmp_path / "frontier.sqlite3"))
+    first = {i: output for i, _, output, done in process_batches(data, "{data}", stream=False, results=frontier)}
+    prompted = len(CountingLLM.calls)
+    second = {i: output for i, _, output, done in process_batches(data, "{data}", stream=False, results=frontier)}
+    assert prompted > 1 and len(CountingLLM.calls) == prompted
+    assert second == first
+    frontier.close()
+
+
+def test_concurrent_runs_do_not_share_state(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "frontier.sqlite3")
+    first = CrawlFrontier(START, 3, path=path)
+    second = CrawlFrontier(START, 3, path=path)
+    assert second.run_id != first.run_id and second.throwaway
+    second.finish("cancelled")  # throwaway state is never resumed, so it goes away
+    second.close()
+    first.close()  # left "running", as after a crash
+
+    db = sqlite3.connect(path)
+    assert [row[0] for row in db.execute("SELECT run_id FROM runs")] == [first.run_id]
+    # Owned by another live process on this host: not resumed, not shared.
+    db.execute("UPDATE runs SET owner = ?", (f"{HOST}:{os.getppid()}:x",))
+    db.commit()
+    third = CrawlFrontier(START, 3, path=path)
+    assert third.throwaway and not third.resumed
+    third.close()
+    # Owner gone (no such pid): the run is resumed, and dead throwaway runs are swept.
+    db.execute("UPDATE runs SET owner = ?", (f"{HOST}:999999999:x",))
+    db.commit()
+    fourth = CrawlFrontier(START, 3, path=path)
+    assert fourth.run_id == first.run_id and fourth.resumed
+    assert db.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 1
+    fourth.close()
+    db.close()
+
+
+def test_restored_pages_replay_archived_html(tmp_path, monkeypatch):
+    from scraper.snapshots import SnapshotStore
+    path = str(tmp_path / "frontier.sqlite3")
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    for url, html in PAGES.items():
+        store.save(url, html)
+    store.close()
+    frontier, _ = crawl(path, [])
+    frontier.close()
+
+    seen = {}
+    frontier = CrawlFrontier(START, 3, path=path)
+    crawler = Crawler(max_pages=3, workers=1, delay=0, scraper_factory=scraper_factory([]), frontier=frontier,
+                      on_page=seen.__setitem__, snapshot_dir=str(tmp_path / "snapshots"))
+    list(crawler.crawl(START))
+    assert seen == PAGES and crawler.missing_html == []
+    frontier.close()
+
+    frontier = CrawlFrontier(START, 3, path=path)
+    crawler = Crawler(max_pages=3, workers=1, delay=0, scraper_factory=scraper_factory([]), frontier=frontier,
+                      on_page=seen.__setitem__, snapshot_dir=str(tmp_path / "missing"))
+    list(crawler.crawl(START))
+    assert len(crawler.missing_html) == 3
+    frontier.close()
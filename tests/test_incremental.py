@@ -0,0 +1,57 @@
+import csv
+from scraper.incremental import ListingFingerprints, ConditionalStore, write_delta_csv
+
+
+def test_fingerprint_diff(tmp_path):
+    store = ListingFingerprints(path=str(tmp_path / "state.sqlite3"))
+    url = "https://example.com/list"
+    first = ["1 Main St | $500k", "2 High St | $600k"]
+    assert store.diff(url, first) == (first, [], [])
+    store.commit(url, first)
+    second = ["1 Main St | $450k", "3 Low Rd | $700k"]
+    added, changed, removed = store.diff(url, second)
+    assert added == ["3 Low Rd | $700k"]
+    assert changed == ["1 Main St | $450k"]
+    assert removed == ["2 High St | $600k"]
+    store.close()
+
+    path = write_delta_csv(str(tmp_path / "delta.csv"), added, changed, removed)
+    with open(path, encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["Change", "Key", "Listing"]
+    assert [row[0] for row in rows[1:]] == ["added", "changed", "removed"]
+
+
+def test_only_processed_listings_are_committed(tmp_path):
+    store = ListingFingerprints(path=str(tmp_path / "state.sqlite3"))
+    url = "https://example.com/list"
+    listings = ["1 Main St | $500k", "2 High St | $600k", "3 Low Rd | $700k"]
+    store.diff(url, listings)
+    assert store.diff(url, listings)[0] == listings  # diffing alone records nothing
+    store.commit(url, listings, processed=listings[:1])
+    assert store.diff(url, listings) == (listings[1:], [], [])
+    store.commit(url, listings[1:], processed=[])
+    assert store.diff(url, listings[1:]) == (listings[1:], [], [])
+    assert store.diff(url, listings)[2] == []  # dropped keys are gone, not reported as removed again
+    store.close()
+
+
+def test_badged_listings_keep_their_keys_when_reordered(tmp_path):
+    store = ListingFingerprints(path=str(tmp_path / "state.sqlite3"))
+    url = "https://example.com/list"
+    first = ["Featured | $500k | 1 Main St", "Featured | 2 High St | $600k", "NEW | 3 Low Rd"]
+    store.commit(url, first)
+    assert store.diff(url, [first[2], first[1], first[0]]) == ([], [], [])
+    assert store.diff(url, ["Featured | 2 High St | $650k", first[0]]) == ([], ["Featured | 2 High St | $650k"],
+                                                                           ["NEW | 3 Low Rd"])
+    store.close()
+
+
+def test_conditional_headers(tmp_path):
+    store = ConditionalStore(path=str(tmp_path / "state.sqlite3"))
+    url = "https://example.com/list"
+    assert store.headers_for(url) == {}
+    store.remember(url, {"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, "<html></html>")
+    assert store.headers_for(url) == {"If-None-Match": '"abc"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert store.body_for(url) == "<html></html>"
+    store.close()
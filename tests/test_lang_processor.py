@@ -1,4 +1,6 @@
-from agent.lang_processor import langchain_process
+import re
+from agent.lang_processor import langchain_process, langchain_process_batched, make_batches, csv_lines, merge_csv_outputs
+from agent.cache import LLMCache
 
 class MockLLM:
     def generate_response(self, prompt):
@@ -9,4 +11,116 @@ def test_langchain_process(monkeypatch):
     scraped = ["Listing 1", "Listing 2"]
     prompt = "Summarize: {data}"
     result = langchain_process(scraped, prompt)
-    assert "Mocked response" in result
\ No newline at end of file
+    assert "Mocked response" in result
+
+class MockBatchLLM:
+    llm_type = "openai"
+    model_name = "gpt-4"
+
+    def generate_response(self, prompt):
+        rows = re.findall(r"Listing \d+", prompt)
+        return "```csv\nTitle,Price\n" + "\n".join(f"{row},$1" for row in rows) + "\n```"
+
+    def stream_response(self, prompt):
+        output = self.generate_response(prompt)
+        for start in range(0, len(output), 7):
+            yield output[start:start + 7]
+
+
+def test_make_batches_respects_budget(monkeypatch):
+    monkeypatch.setattr("agent.lang_processor.estimate_tokens", lambda text: 10 if text.startswith("x") else 0)
+    batches = make_batches(["x" * 40] * 10, "{data}", budget=25)
+    assert len(batches) == 5
+    assert sum(len(b) for b in batches) == 10
+
+
+def test_langchain_process_batched_merges_csv(monkeypatch):
+    monkeypatch.setattr("agent.lang_processor.LLMHandler", MockBatchLLM)
+    monkeypatch.setattr("agent.lang_processor.input_budget", lambda model: 10)
+    scraped = [f"Listing {i}" for i in range(6)]
+    result = langchain_process_batched(scraped, "Extract: {data}", concurrency=3)
+    lines = result.splitlines()
+    assert lines[0] == "Title,Price"
+    assert lines.count("Title,Price") == 1
+    assert lines[1:] == [f"Listing {i},$1" for i in range(6)]
+
+
+def test_csv_lines_keeps_rows_that_fit_the_header():
+    assert csv_lines("Here are the titles:\nTitle\nOak St\n\"Elm, Rd\"") == ["Title", "Oak St", '"Elm, Rd"']
+    assert csv_lines("```csv\nTitle\nOak St\n```\nDone.") == ["Title", "Oak St"]
+    assert csv_lines("Sure.\nTitle,Price\nA,1\nB,\nC,2,,\nD,2,x\nHope this helps") == \
+        ["Title,Price", "A,1", "B,", "C,2,,"]
+
+
+def test_merge_matches_quoted_headers():
+    merged = merge_csv_outputs(['"Title, short",Price\nA,1', '"title, short", price\nB,2'])
+    assert merged.splitlines() == ['"Title, short",Price', "A,1", "B,2"]
+
+
+def test_cached_listings_skip_llm(monkeypatch, tmp_path):
+    calls = []
+
+    class CountingLLM(MockBatchLLM):
+        def generate_response(self, prompt):
+            calls.append(prompt)
+            return super().generate_response(prompt)
+
+    monkeypatch.setattr("agent.lang_processor.LLMHandler", CountingLLM)
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"))
+    first = langchain_process_batched(["Listing 1", "Listing 2"], "Extract: {data}", cache=cache)
+    second = langchain_process_batched(["Listing 1", "Listing 2", "Listing 3"], "Extract: {data}", cache=cache)
+    assert first.splitlines() == ["Title,Price", "Listing 1,$1", "Listing 2,$1"]
+    assert second.splitlines() == ["Title,Price", "Listing 1,$1", "Listing 2,$1", "Listing 3,$1"]
+    assert len(calls) == 2 and "Listing 1" not in calls[1]
+    assert (cache.hits, cache.misses) == (2, 3)
+    cache.close()
+
+
+def test_cache_keys_come_from_uncompacted_text(monkeypatch, tmp_path):
+    from agent.lang_processor import process_batches
+    monkeypatch.setattr("agent.lang_processor.LLMHandler", MockBatchLLM)
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"))
+    raw = ["Listing 1 | Sponsored", "Listing 2 | Sponsored"]
+    # The same listings compact differently once their neighbours change.
+    list(process_batches(["Listing 1", "Listing 2"], "Extract: {data}", cache=cache, key_texts=raw))
+    [(index, _, output, _)] = process_batches(raw, "Extract: {data}", cache=cache, key_texts=raw)
+    assert index == -1 and output.splitlines() == ["Title,Price", "Listing 1,$1", "Listing 2,$1"]
+    cache.close()
+
+
+def test_cache_matches_rows_by_content(tmp_path):
+    from agent.lang_processor import _store_rows
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"))
+    batch = ["12 Oak St | $650,000 | 3 beds", "4 Elm Rd | $720,000 | 4 beds", "9 Ash Ave | POA"]
+    keys = {item: cache.make_key("m", "p", item) for item in batch}
+    # Reordered rows, plus one row the model made up from two listings.
+    output = "Title,Price\n4 Elm Rd,\"$720,000\"\n12 Oak St,\"$650,000\"\n9 Ash Ave / 12 Oak St,POA"
+    _store_rows(cache, keys, "header", batch, output)
+    assert cache.get(keys[batch[0]]) == '12 Oak St,"$650,000"'
+    assert cache.get(keys[batch[1]]) == '4 Elm Rd,"$720,000"'
+    assert cache.get(keys[batch[2]]) is None
+    cache.close()
+
+
+def test_cancel_stops_streams_in_flight(monkeypatch):
+    import threading
+    import time
+    from agent.lang_processor import process_batches
+    cancel, closed = threading.Event(), threading.Event()
+
+    class EndlessLLM(MockBatchLLM):
+        def stream_response(self, prompt):
+            try:
+                yield "Title,Price\nListing 1,$1\n"
+                while True:
+                    time.sleep(0.01)
+                    yield " "
+            finally:
+                closed.set()
+
+    monkeypatch.setattr("agent.lang_processor.LLMHandler", EndlessLLM)
+    events = process_batches(["Listing 1"], "{data}", stream=True, cancel_event=cancel)
+    assert next(events)[3] is False
+    cancel.set()
+    assert list(events) == []
+    assert closed.wait(2)  # the worker closed the stream instead of reading it forever
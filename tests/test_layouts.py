@@ -0,0 +1,63 @@
+from scraper.layouts import learn_layout, apply_layout, validate_rows, save_layout, load_layout
+
+CARD = """
+<div class="tm-property-search-card">
+  <a class="tile" href="/listing/{id}">
+    <h3 class="title">{title}</h3>
+    <span class="price">${price}</span>
+    <ul class="attrs"><li>{beds} beds</li><li>{baths} baths</li></ul>
+    <p class="address">{suburb}, Auckland</p>
+  </a>
+</div>
+"""
+LISTINGS = [
+    {"id": 1, "title": "Sunny villa", "price": "950,000", "beds": 3, "baths": 1, "suburb": "Ponsonby"},
+    {"id": 2, "title": "Modern townhouse", "price": "1,250,000", "beds": 4, "baths": 2, "suburb": "Grey Lynn"},
+    {"id": 3, "title": "Cosy unit", "price": "610,000", "beds": 2, "baths": 1, "suburb": "Mt Eden"},
+]
+HEADER = ["Title", "Price", "Beds", "Baths", "Location", "URL"]
+
+
+def page(listings):
+    return "<html><body>" + "".join(CARD.format(**item) for item in listings) + "</body></html>"
+
+
+def llm_rows(listings):
+    return [[item["title"], item["price"], str(item["beds"]), str(item["baths"]),
+             f"{item['suburb']}, Auckland", f"https://www.trademe.co.nz/listing/{item['id']}"]
+            for item in listings]
+
+
+def test_learned_layout_reproduces_llm_rows(tmp_path):
+    url = "https://www.trademe.co.nz/a/property/residential/sale"
+    layout = learn_layout(url, "{data}", {url: page(LISTINGS)}, HEADER, llm_rows(LISTINGS))
+    assert layout is not None and layout["learned_from_rows"] == 3
+
+    save_layout(layout, url, str(tmp_path))
+    assert load_layout(url, "another prompt {data}", str(tmp_path)) is None
+    layout = load_layout(url, "{data}", str(tmp_path))
+
+    fresh = [{"id": 9, "title": "Family home", "price": "1,100,000", "beds": 5, "baths": 3, "suburb": "Epsom"}]
+    rows = apply_layout(layout, {url + "?page=2": page(fresh)})
+    assert rows == llm_rows(fresh)
+    assert validate_rows(layout, rows) == (True, "")
+
+
+def test_changed_markup_fails_validation():
+    url = "https://www.trademe.co.nz/a/property"
+    layout = learn_layout(url, "{data}", {url: page(LISTINGS)}, HEADER, llm_rows(LISTINGS))
+    redesigned = page(LISTINGS).replace('class="price"', 'class="amount"')
+    valid, reason = validate_rows(layout, apply_layout(layout, {url: redesigned}))
+    assert not valid and "Price" in reason
+
+
+def test_apply_layout_matches_bs4_listings_once():
+    from scraper.extractors import SoupExtractor
+    url = "https://www.trademe.co.nz/a/property"
+    layout = learn_layout(url, "{data}", {url: page(LISTINGS)}, HEADER, llm_rows(LISTINGS))
+    html = page(LISTINGS[:2])
+    # Texts as another backend might join them: other separators, spacing and case.
+    wanted = {text.replace(" | ", "\n").upper() for text in SoupExtractor([".tm-property-search-card"]).extract(html)}
+    pages = {url: html, url + "?page=2": page(LISTINGS[1:])}  # the townhouse is repeated
+    assert apply_layout(layout, pages, wanted=wanted) == llm_rows(LISTINGS[:2])
+    assert apply_layout(layout, pages) == llm_rows(LISTINGS)
@@ -0,0 +1,49 @@
+import threading
+from agent import clients
+from agent.llm import LLMHandler
+from benchmarks.stub_llm import StubLLMServer
+
+
+def test_registry_builds_each_client_once():
+    built = []
+    try:
+        first = clients.get_client(("test", "model"), lambda: built.append(1) or object())
+        assert clients.get_client(("test", "model"), lambda: built.append(1) or object()) is first
+        assert len(built) == 1
+    finally:
+        clients.close_clients()
+
+
+def test_deepseek_calls_share_one_connection():
+    handler = LLMHandler()
+    try:
+        with StubLLMServer(reply="Title,Price\nA,1") as server:
+            handler.deepseek_url = f"{server.url}/v1"
+            answers = [handler._call_deepseek_api("p", "stub", "key") for _ in range(3)]
+            streamed = "".join(handler._stream_deepseek_api("p", "stub", "key"))
+        assert answers == ["Title,Price\nA,1"] * 3 and streamed == "Title,Price\nA,1"
+        assert server.requests == 4 and len(server.connections) == 1
+    finally:
+        clients.close_clients()
+
+
+def test_threads_get_own_sessions_over_one_pool():
+    handler = LLMHandler()
+    sessions = []
+
+    def call():
+        sessions.append(clients.http_session("deepseek"))
+        handler._call_deepseek_api("p", "stub", "key")
+
+    try:
+        with StubLLMServer(reply="Title,Price\nA,1") as server:
+            handler.deepseek_url = f"{server.url}/v1"
+            for _ in range(3):
+                thread = threading.Thread(target=call)
+                thread.start()
+                thread.join()
+        assert len({id(session) for session in sessions}) == 3
+        assert len({id(session.get_adapter("http://")) for session in sessions}) == 1
+        assert server.requests == 3 and len(server.connections) == 1
+    finally:
+        clients.close_clients()
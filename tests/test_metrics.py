@@ -0,0 +1,54 @@
+import json
+import socket
+import urllib.request
+import pytest
+from metrics import Registry, RunMetrics, start_metrics_server, stop_metrics_server
+
+
+def test_run_metrics_writes_json_lines_and_summary(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    registry = Registry()
+    metrics = RunMetrics(path=str(path), registry=registry, url="https://example.com")
+    with metrics.stage("fetch", url="https://example.com") as fields:
+        fields["bytes"] = 100
+    metrics.record("llm", 0.5, tokens_in=40, tokens_out=10)
+    with pytest.raises(ValueError):
+        with metrics.stage("parse"):
+            raise ValueError("bad html")
+    metrics.finish("ok")
+
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [e["event"] for e in events] == ["stage", "stage", "stage", "summary"]
+    assert events[2]["error"] == "ValueError: bad html"
+    summary = events[-1]
+    assert list(summary["stages"]) == ["fetch", "parse", "llm"]
+    assert (summary["tokens_in"], summary["tokens_out"], summary["bytes"]) == (40, 10, 100)
+    assert "llm" in metrics.describe()
+
+    text = registry.render()
+    assert 'chatcrawler_stage_seconds_count{stage="llm"} 1' in text
+    assert 'chatcrawler_stage_seconds_bucket{stage="llm",le="0.5"} 1' in text
+    assert 'chatcrawler_llm_tokens_total{direction="in"} 40' in text
+    assert 'chatcrawler_runs_total{status="ok"} 1' in text
+
+
+def test_metrics_endpoint_serves_registry():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = start_metrics_server(port, host="127.0.0.1")
+    try:
+        RunMetrics(path="").record("fetch", 0.01)
+        body = urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics").read().decode()
+        assert 'chatcrawler_stage_seconds_count{stage="fetch"}' in body
+    finally:
+        stop_metrics_server()
+
+
+def test_fetches_log_encoded_bytes_to_metrics_path(metrics_path):
+    from scraper.scheduling import FetchScheduler
+    metrics = RunMetrics(registry=None)
+    FetchScheduler(delay=0, metrics=metrics).fetch("https://example.com/", lambda: "<p>café</p>")
+    metrics.finish("ok")
+    events = [json.loads(line) for line in metrics_path.read_text().splitlines()]
+    assert events[-2]["bytes"] == 12 and events[-1]["bytes"] == 12
@@ -0,0 +1,100 @@
+import threading
+import pytest
+import pipeline
+from pipeline import run_pipeline, RunCancelled
+
+
+class FakeCrawler:
+    def __init__(self, **kwargs):
+        pass
+
+    def crawl(self, url):
+        yield url, ["Listing 1", "Listing 2"], None
+        yield url + "?page=2", ["Listing 2", "Listing 3"], None
+
+
+def fake_batches(data, prompt, retries=3, cache=None, **kwargs):
+    for i, item in enumerate(data):
+        yield i, [item], f"Title,Price\n{item},$1", True
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    monkeypatch.setattr(pipeline, "Crawler", FakeCrawler)
+    monkeypatch.setattr(pipeline, "process_batches", fake_batches)
+    monkeypatch.setattr(pipeline, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(pipeline, "FRONTIER_ENABLED", False)
+
+
+def test_pipeline_streams_pages_and_rows(fakes, tmp_path):
+    output = tmp_path / "out.csv"
+    row_counts = [len(state.rows) for state in run_pipeline(
+        "https://example.com", "{data}", max_listings=10, max_pages=2, output_path=str(output))]
+    assert row_counts[-1] == 3
+    assert row_counts.count(0) >= 3  # pages were reported before any LLM output
+    assert output.read_text().splitlines()[0] == "Title,Price"
+
+
+def test_pipeline_cancel(fakes, tmp_path):
+    cancel = threading.Event()
+    run = run_pipeline("https://example.com", "{data}", max_pages=2, output_path=str(tmp_path / "out.csv"),
+                       cancel_event=cancel)
+    next(run)
+    cancel.set()
+    with pytest.raises(RunCancelled):
+        list(run)
+
+
+def test_pipeline_learns_layout_then_skips_llm(fakes, tmp_path, monkeypatch):
+    html = "<html><body>" + "".join(
+        f"<article><h3 class='title'>Home {i}</h3><span class='price'>${i},000</span></article>" for i in (1, 2)
+    ) + "</body></html>"
+
+    class PageCrawler:
+        def __init__(self, on_page=None, **kwargs):
+            self.on_page = on_page
+
+        def crawl(self, url):
+            self.on_page(url, html)
+            yield url, ["Home 1 | $1,000", "Home 2 | $2,000"], None
+
+    calls = []
+
+    def llm_batches(data, prompt, retries=3, cache=None, **kwargs):
+        calls.append(data)
+        yield 0, data, "Title,Price\nHome 1,\"1,000\"\nHome 2,\"2,000\"", True
+
+    monkeypatch.setattr(pipeline, "Crawler", PageCrawler)
+    monkeypatch.setattr(pipeline, "process_batches", llm_batches)
+    monkeypatch.setattr(pipeline, "load_layout", lambda url, prompt: load(url, prompt, str(tmp_path / "layouts")))
+    monkeypatch.setattr(pipeline, "save_layout", lambda layout, url: save(layout, url, str(tmp_path / "layouts")))
+    from scraper.layouts import load_layout as load, save_layout as save
+
+    for _ in range(2):
+        states = list(run_pipeline("https://example.com", "{data}", max_listings=10, use_layouts=True,
+                                   output_path=str(tmp_path / "out.csv")))
+    assert len(calls) == 1
+    assert states[-1].rows == [["Home 1", "1,000"], ["Home 2", "2,000"]]
+    assert any("skipping LLM" in line for line in states[-1].log)
+
+
+def test_incremental_records_only_processed_listings(fakes, tmp_path, monkeypatch):
+    from functools import partial
+    from scraper.incremental import ListingFingerprints
+    monkeypatch.setattr(pipeline, "ListingFingerprints", partial(ListingFingerprints, path=str(tmp_path / "s.db")))
+
+    def run(max_listings):
+        return list(run_pipeline("https://example.com", "{data}", max_listings=max_listings, max_pages=2,
+                                 incremental=True, output_path=str(tmp_path / "out.csv"),
+                                 delta_path=str(tmp_path / "delta.csv")))[-1]
+
+    def failing_batches(*args, **kwargs):
+        raise RuntimeError("model down")
+        yield
+
+    monkeypatch.setattr(pipeline, "process_batches", failing_batches)
+    with pytest.raises(RuntimeError):
+        run(10)
+    monkeypatch.setattr(pipeline, "process_batches", fake_batches)
+    assert [row[0] for row in run(2).rows] == ["Listing 1", "Listing 2"]
+    assert [row[0] for row in run(10).rows] == ["Listing 3"]
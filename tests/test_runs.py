@@ -0,0 +1,31 @@
+import os
+import threading
+from runs import RunScheduler, engine_class, new_workspace
+
+
+def test_workspaces_are_unique(tmp_path):
+    first = new_workspace("https://example.com/list", runs_dir=str(tmp_path))
+    second = new_workspace("https://example.com/list", runs_dir=str(tmp_path))
+    assert first != second and os.path.isdir(first) and "example.com" in first
+
+
+def test_scheduler_limits_each_engine_class_and_reports_queue():
+    scheduler = RunScheduler(limits={"browser": 1, "http": 2}, default_duration=30)
+    assert engine_class("requests") == "http" and engine_class("auto") == "browser"
+    browser = [scheduler.submit("playwright") for _ in range(3)]
+    http = [scheduler.submit("requests") for _ in range(2)]
+    assert [t.admitted for t in browser] == [True, False, False]
+    assert all(t.admitted for t in http)  # HTTP runs do not wait behind browsers
+    assert [t.position() for t in browser] == [0, 1, 2]
+    assert 0 < browser[1].eta() <= 30 < browser[2].eta() <= 60
+    assert "position 2" in browser[2].describe()
+
+    browser[2].release()  # cancelled while queued
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: browser[1].wait(timeout=5) and admitted.set())
+    waiter.start()
+    browser[0].release()
+    waiter.join()
+    assert admitted.is_set() and browser[1].position() == 0
+    stats = scheduler.stats()["browser"]
+    assert (stats["running"], stats["queued"]) == (1, 0) and stats["avg_seconds"] < 30  # learned from the real run
@@ -0,0 +1,84 @@
+import pytest
+import scraper.scheduling as scheduling
+from scraper.scheduling import CircuitOpen, FetchError, FetchScheduler, HostState, TokenBucket, classify
+
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = type("Response", (), {"status_code": status, "headers": headers or {}})()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scheduling.time, "sleep", calls.append)
+    return calls
+
+
+def test_retries_throttled_fetch_honoring_retry_after(sleeps):
+    scheduler = FetchScheduler(delay=0, retries=2)
+    replies = [HTTPError(503, {"retry-after": "7"}), "<html>ok</html>"]
+
+    def fetch():
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    assert scheduler.fetch("https://example.com/a", fetch) == "<html>ok</html>"
+    assert sleeps[0] == 7  # with sleep stubbed out, the bucket then waits out the widened interval too
+    state = scheduler.host_state("https://example.com/b")
+    assert state.stats["throttled"] == 1 and state.stats["retries"] == 1
+    assert state.bucket.interval == pytest.approx(7 * 0.9)
+
+
+def test_client_errors_are_not_retried(sleeps):
+    scheduler = FetchScheduler(delay=0, retries=3)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        raise HTTPError(404)
+
+    with pytest.raises(HTTPError):
+        scheduler.fetch("https://example.com/missing", fetch)
+    assert len(calls) == 1 and sleeps == []
+
+
+def test_circuit_opens_after_repeated_failures(sleeps):
+    scheduler = FetchScheduler(delay=0, retries=1, breaker_threshold=2, breaker_cooldown=60)
+
+    def fetch():
+        raise FetchError("https://example.com/", 502)
+
+    with pytest.raises(FetchError):
+        scheduler.fetch("https://example.com/", fetch)
+    with pytest.raises(CircuitOpen):
+        scheduler.fetch("https://example.com/other", lambda: "never fetched")
+    assert scheduler.fetch("https://elsewhere.com/", lambda: "ok") == "ok"
+
+
+def test_throttling_halves_concurrency_and_success_recovers():
+    state = HostState(per_host=4, delay=0, burst=1, threshold=10, cooldown=1)
+    state.acquire()
+    state.release("throttled", 2)
+    assert state.limit == 2 and state.bucket.interval == 2
+    for _ in range(4):
+        state.acquire()
+        state.release("ok")
+    assert 3 <= state.limit <= 4 and state.bucket.interval < 2
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(interval=1.0, burst=2)
+    waits = [bucket.take() for _ in range(4)]
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(1.0, abs=0.01) and waits[3] == pytest.approx(2.0, abs=0.01)
+
+
+def test_classify():
+    assert classify(HTTPError(429, {"retry-after": "3"})) == ("throttled", 429, 3.0)
+    assert classify(HTTPError(403))[0] == "fatal"
+    assert classify(HTTPError(408))[0] == "retry"
+    assert classify(TimeoutError())[0] == "retry"
@@ -0,0 +1,101 @@
+import json
+import pickle
+import sys
+import types
+import scraper.selenium_pool as selenium_pool
+from scraper.selenium_pool import SeleniumPool, fetch_page, resolve_chromedriver
+
+
+class FakeElement:
+    pass
+
+
+class FakeDriver:
+    def __init__(self):
+        self.current_url = "about:blank"
+        self.cdp = []
+        self.quit_called = False
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.cdp.append((cmd, params))
+
+    def get(self, url):
+        self.current_url = url
+
+    def find_element(self, by, selector):
+        return FakeElement()
+
+    def get_log(self, kind):
+        return []
+
+    @property
+    def page_source(self):
+        return f"<html>{self.current_url}</html>"
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_pool_reuses_warm_drivers_with_cookies(tmp_path):
+    cookie_path = tmp_path / "cookies.pkl"
+    cookie_path.write_bytes(pickle.dumps([{"name": "session", "value": "abc", "domain": ".example.com", "expiry": 1}]))
+    drivers = []
+
+    def factory():
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    pool = SeleniumPool(size=2, max_navigations=3, cookie_path=str(cookie_path), driver_factory=factory, min_size=0)
+    for i in range(4):
+        assert pool.fetch_html(f"https://example.com/{i}") == f"<html>https://example.com/{i}</html>"
+    assert pool.stats()["started"] == 2 and pool.stats()["recycled"] == 1
+    assert drivers[0].quit_called
+    assert drivers[0].cdp == [("Network.setCookies", {"cookies": [
+        {"name": "session", "value": "abc", "domain": ".example.com", "expires": 1}]})]
+
+    pool.refresh()
+    pool.fetch_html("https://example.com/again")
+    assert len(drivers[1].cdp) == 2  # cookies reapplied after the saved session changed
+    pool.close()
+    assert drivers[1].quit_called
+
+
+def test_pool_starts_min_size_drivers_before_first_acquire(tmp_path):
+    drivers = []
+
+    def factory():
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    pool = SeleniumPool(size=3, cookie_path=str(tmp_path / "none.pkl"), driver_factory=factory, min_size=2)
+    pool._warmer.join(5)
+    assert len(drivers) == 2 and pool.stats()["running"] == 2 and pool.stats()["in_use"] == 0
+    pool.fetch_html("https://example.com/1")
+    assert len(drivers) == 2  # served by a warm driver
+    pool.close()
+    assert all(driver.quit_called for driver in drivers)
+
+
+def test_fetch_page_uses_explicit_wait():
+    driver = FakeDriver()
+    assert fetch_page(driver, "https://example.com/list", "div.card", timeout=0.1) == "<html>https://example.com/list</html>"
+
+
+def test_chromedriver_is_resolved_once_and_cached(tmp_path, monkeypatch):
+    installs = []
+
+    class FakeManager:
+        def install(self):
+            installs.append(1)
+            return str(driver)
+
+    driver = tmp_path / "chromedriver"
+    driver.write_text("")
+    cache = tmp_path / "chromedriver.json"
+    monkeypatch.setitem(sys.modules, "webdriver_manager.chrome", types.SimpleNamespace(ChromeDriverManager=FakeManager))
+    monkeypatch.setattr(selenium_pool, "_driver_path", None)
+    assert resolve_chromedriver(str(cache), ttl=60) == str(driver)
+    assert resolve_chromedriver(str(cache), ttl=60) == str(driver)
+    monkeypatch.setattr(selenium_pool, "_driver_path", None)  # a new process reads the cache file
+    assert resolve_chromedriver(str(cache), ttl=60) == str(driver)
+    assert len(installs) == 1 and json.loads(cache.read_text())["path"] == str(driver)
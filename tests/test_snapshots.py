@@ -0,0 +1,80 @@
+import gzip
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from scraper.crawler import Crawler
+from scraper.scheduling import FetchError
+from scraper.snapshots import SnapshotStore, content_hash
+from scraper.web_scraper import WebScraper
+
+
+def test_store_dedups_and_indexes_by_time(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    first = store.save("https://example.com/a", "<html>v1</html>", fetched_at=100)
+    assert store.save("https://example.com/b", "<html>v1</html>", fetched_at=100) == first
+    store.save("https://example.com/a", "<html>v2</html>", fetched_at=200)
+
+    objects = [name for _, _, names in os.walk(tmp_path / "objects") for name in names]
+    assert sorted(objects) == sorted(f"{content_hash(v)}.html.gz" for v in ("<html>v1</html>", "<html>v2</html>"))
+    with gzip.open(tmp_path / "objects" / first[:2] / f"{first}.html.gz", "rt") as f:
+        assert f.read() == "<html>v1</html>"
+
+    assert store.latest("https://example.com/a") == "<html>v2</html>"
+    assert store.latest("https://example.com/a", before=150) == "<html>v1</html>"
+    assert [h for _, h, _ in store.history("https://example.com/a")] == [first, content_hash("<html>v2</html>")]
+    assert store.urls("https://example.com/") == ["https://example.com/a", "https://example.com/b"]
+    assert "3 fetches of 2 URLs, 2 distinct pages" in store.describe()
+    store.close()
+
+
+def test_prune_drops_expired_fetches_and_orphaned_pages(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    shared = store.save("https://example.com/a", "<html>shared</html>", fetched_at=100)
+    store.save("https://example.com/b", "<html>shared</html>")
+    gone = store.save("https://example.com/c", "<html>old</html>", fetched_at=100)
+    assert store.prune(max_age_days=0) == 0
+    assert store.prune(max_age_days=30) == 2
+    assert store.history("https://example.com/a") == [] and store.load(gone) is None
+    assert not os.path.exists(tmp_path / "objects" / gone[:2] / f"{gone}.html.gz")
+    assert store.load(shared) == "<html>shared</html>"  # still referenced by the fresh fetch of /b
+    assert store.urls() == ["https://example.com/b"]
+    store.close()
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = f"<html><body><div class='card'>{self.path}</div></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_recorded_pages_replay_offline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/list"
+    try:
+        scraper = WebScraper(engine="requests")
+        live = scraper.get_html(url)
+        scraper.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    crawler = Crawler(engine="replay", max_pages=1)
+    assert crawler.scheduler.delay == 0
+    [(page_url, listings, error)] = list(crawler.crawl(url))
+    assert error is None and listings == ["/list"]
+
+    replay = WebScraper(engine="replay")
+    assert replay.get_html(url) == live
+    with pytest.raises(FetchError):
+        replay.get_html(url + "?page=2")
+    replay.close()
+    assert len(SnapshotStore().history(url)) == 1  # replayed pages are not archived again
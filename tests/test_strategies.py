@@ -0,0 +1,139 @@
+import os
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from scraper.strategies import AsyncRequestsStrategy, STRATEGIES, get_strategy
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = f"<html><body><div class='card'>{self.path}</div></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_async_strategy_fetch_many(site, tmp_path, monkeypatch):
+    monkeypatch.setattr(AsyncRequestsStrategy, "COOKIE_PATH", str(tmp_path / "cookies.pkl"))
+    strategy = AsyncRequestsStrategy(per_host=2)
+    try:
+        urls = [f"{site}/page/{i}" for i in range(5)]
+        pages = strategy.fetch_many(urls)
+        assert [f"/page/{i}" in html for i, html in enumerate(pages)] == [True] * 5
+        assert "/single" in strategy.fetch_html(f"{site}/single")
+    finally:
+        strategy.close()
+
+
+def test_requests_engine_skips_browser_imports(tmp_path):
+    code = (
+        "import sys; from scraper.web_scraper import WebScraper; WebScraper(engine='requests').close(); "
+        "sys.exit(any(m in sys.modules for m in ('selenium', 'playwright', 'webdriver_manager', 'gradio')))"
+    )
+    env = {**os.environ, "PYTHONPATH": os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}
+    assert subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env).returncode == 0
+
+
+def test_user_agent_data_loads_on_first_use(tmp_path):
+    code = (
+        "import sys, cli, scraper.strategies as s; loaded = 'fake_useragent' in sys.modules; "
+        "s.random_user_agent(); sys.exit(loaded or 'fake_useragent' not in sys.modules)"
+    )
+    env = {**os.environ, "PYTHONPATH": os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}
+    assert subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env).returncode == 0
+
+
+def test_registered_strategy_gets_declared_options_only(monkeypatch):
+    class DummyStrategy:
+        def __init__(self, incremental=False):
+            self.incremental = incremental
+
+    monkeypatch.setitem(STRATEGIES, "dummy", DummyStrategy)
+    strategy = get_strategy("dummy", headless=False, incremental=True)
+    assert isinstance(strategy, DummyStrategy) and strategy.incremental
+    with pytest.raises(ValueError):
+        get_strategy("nope")
+
+
+class LayoutHandler(BaseHTTPRequestHandler):
+    # /ssr serves listing cards in the HTML; /js serves an empty shell that a browser would fill in.
+    def do_GET(self):
+        cards = "".join(f"<article>Home {i}</article>" for i in range(3)) if self.path.startswith("/ssr") else ""
+        body = f"<html><body><div id='app'>{cards}</div></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_auto_engine_escalates_only_when_needed(tmp_path, monkeypatch):
+    from config import AUTO_ENGINE_PATH
+    from scraper.strategies import AutoStrategy, EngineChoices
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(EngineChoices, "_cache", {})
+    rendered = []
+
+    class FakeBrowser:
+        def login(self):
+            pass
+
+        def fetch_html(self, url):
+            rendered.append(url)
+            return "<html><body>" + "<article>Rendered</article>" * 3 + "</body></html>"
+
+        def close(self):
+            pass
+
+    monkeypatch.setitem(STRATEGIES, "fake-browser", FakeBrowser)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LayoutHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ssr, js = f"http://127.0.0.1:{server.server_port}/ssr", f"http://localhost:{server.server_port}/js"
+    try:
+        strategy = AutoStrategy(browser_engine="fake-browser")
+        assert "Home 0" in strategy.fetch_html(ssr)
+        assert strategy.browser is None
+        assert "Rendered" in strategy.fetch_html(js)
+        assert "Rendered" in strategy.fetch_html(js + "?page=2")
+        strategy.close()
+        assert rendered == [js, js + "?page=2"]
+        assert not AutoStrategy.thread_safe  # every crawl worker gets its own
+        assert os.listdir(os.path.dirname(AUTO_ENGINE_PATH) or ".") == [os.path.basename(AUTO_ENGINE_PATH)]
+
+        monkeypatch.setattr(EngineChoices, "_cache", {})  # read back from disk, as a later run would
+        choices = EngineChoices()
+        assert choices.get(f"127.0.0.1:{server.server_port}") == "http"
+        assert choices.get(f"localhost:{server.server_port}") == "browser"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_saved_sessions_are_replaced_atomically(tmp_path, monkeypatch):
+    from scraper.strategies import RequestsStrategy
+    path = str(tmp_path / "cookies" / "session.pkl")
+    monkeypatch.setattr(RequestsStrategy, "COOKIE_PATH", path)
+    strategy = RequestsStrategy()
+    strategy.session.cookies.set("sid", "1", domain="example.com")
+    strategy.save_session()
+    strategy.session.cookies.set("sid", "2", domain="example.com")
+    strategy.save_session()
+    assert os.listdir(tmp_path / "cookies") == ["session.pkl"]  # no temp files left behind
+    assert RequestsStrategy().session.cookies.get("sid") == "2"
@@ -0,0 +1,142 @@
+import json
+import pipeline
+from pipeline import run_pipeline
+from scraper.structured import requested_columns, extract_records, identity_columns, structured_rows
+
+PROMPT = """Extract the following fields from each listing.
+Format the result as a CSV table with the following columns:
+Title,Price,Beds,URL
+
+{data}"""
+
+
+def json_ld(*items):
+    data = {"@context": "https://schema.org", "@type": "ItemList", "itemListElement": [
+        {"@type": "ListItem", "position": i + 1, "item": item} for i, item in enumerate(items)]}
+    return f'<script type="application/ld+json">{json.dumps(data)}</script>'
+
+
+HOUSE = {"@type": "SingleFamilyResidence", "name": "12 Oak St", "numberOfBedrooms": 3, "url": "/homes/12",
+         "offers": {"@type": "Offer", "price": 650000.0, "priceCurrency": "NZD"}}
+
+
+def test_requested_columns():
+    assert requested_columns(PROMPT) == ["Title", "Price", "Beds", "URL"]
+    assert requested_columns("Extract each property's Title, Price, Location, and Listing URL. Output as a CSV:\n"
+                             "{data}") is None
+
+
+def test_identity_columns():
+    assert identity_columns(["Title", "Price", "Beds", "URL"]) == [0, 3]
+    assert identity_columns(["Listing Title", "Address", "Price"]) == [0, 1]
+    assert identity_columns(["Price", "Beds"]) == []
+
+
+def test_json_ld_item_list():
+    html = "<html><head>" + json_ld(HOUSE, {**HOUSE, "name": "4 Elm Rd", "url": "/homes/4"}) + \
+           '<script type="application/ld+json">{"@type": "WebSite", "name": "Homes"}</script></head></html>'
+    records = {"https://example.com/list": extract_records(html)}
+    rows, reason = structured_rows(records, ["Title", "Price", "Beds", "URL"])
+    assert reason == ""
+    assert rows == [["12 Oak St", "650000", "3", "https://example.com/homes/12"],
+                    ["4 Elm Rd", "650000", "3", "https://example.com/homes/4"]]
+
+
+def test_next_data_and_incomplete_columns():
+    state = {"props": {"pageProps": {"nav": [{"label": "Buy"}], "results": [
+        {"listing_title": "Flat 1", "price": {"amount": 900}, "bedrooms": 1},
+        {"listing_title": "Flat 2", "price": {"amount": 950}, "bedrooms": 2},
+    ]}}}
+    html = f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(state)}</script>'
+    records = {"https://example.com/rent": extract_records(html)}
+    rows, reason = structured_rows(records, ["Listing Title", "Price", "Bedrooms"])
+    assert (rows, reason) == ([["Flat 1", "900", "1"], ["Flat 2", "950", "2"]], "")
+    _, reason = structured_rows(records, ["Listing Title", "Agent"])
+    assert reason == "column 'Agent' filled in 0/2 records"
+
+
+def test_pipeline_skips_llm_with_structured_data(tmp_path, monkeypatch):
+    html = json_ld(HOUSE, {**HOUSE, "name": "4 Elm Rd"}) + "<article>12 Oak St</article><article>4 Elm Rd</article>"
+
+    class PageCrawler:
+        def __init__(self, on_page=None, **kwargs):
+            self.on_page = on_page
+
+        def crawl(self, url):
+            self.on_page(url, html)
+            yield url, ["12 Oak St", "4 Elm Rd"], None
+
+    def no_llm(*args, **kwargs):
+        raise AssertionError("LLM should not be called")
+
+    monkeypatch.setattr(pipeline, "Crawler", PageCrawler)
+    monkeypatch.setattr(pipeline, "process_batches", no_llm)
+    monkeypatch.setattr(pipeline, "FRONTIER_ENABLED", False)
+    state = list(run_pipeline("https://example.com/list", PROMPT, max_listings=10,
+                              output_path=str(tmp_path / "out.csv")))[-1]
+    assert state.header == ["Title", "Price", "Beds", "URL"]
+    assert [row[0] for row in state.rows] == ["12 Oak St", "4 Elm Rd"]
+    assert (tmp_path / "out.csv").read_text().startswith("Title,Price,Beds,URL\n12 Oak St,650000,3,")
+
+
+def test_incomplete_records_leave_only_their_listings_to_llm(tmp_path, monkeypatch):
+    html = json_ld(HOUSE, {**HOUSE, "name": "4 Elm Rd", "offers": {}}) + \
+        "<article>12 Oak St $650,000</article><article>4 Elm Rd</article><article>7 Ash Ln</article>"
+    records = {"https://example.com/list": extract_records(html)}
+    rows, reason = structured_rows(records, ["Title", "Price", "Beds", "URL"])
+    assert reason == "column 'Price' filled in 1/2 records" and [row[0] for row in rows] == ["12 Oak St"]
+    assert len(structured_rows(records, ["Title", "Price", "Beds", "URL"], min_fill=0.75)[0]) == 2
+
+    class PageCrawler:
+        def __init__(self, on_page=None, **kwargs):
+            self.on_page = on_page
+
+        def crawl(self, url):
+            self.on_page(url, html)
+            yield url, ["12 Oak St $650,000", "4 Elm Rd", "7 Ash Ln"], None
+
+    sent = []
+
+    def fake_llm(data, prompt, **kwargs):
+        sent.extend(data)
+        yield 0, data, "Title,Price,Beds,URL\n" + "\n".join(f"{item},1,1,u" for item in data), True
+
+    monkeypatch.setattr(pipeline, "Crawler", PageCrawler)
+    monkeypatch.setattr(pipeline, "process_batches", fake_llm)
+    monkeypatch.setattr(pipeline, "FRONTIER_ENABLED", False)
+    monkeypatch.setattr(pipeline, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(pipeline, "COMPACTION_ENABLED", False)
+    state = list(run_pipeline("https://example.com/list", PROMPT, max_listings=10,
+                              output_path=str(tmp_path / "out.csv")))[-1]
+    assert sent == ["4 Elm Rd", "7 Ash Ln"]
+    assert [row[:2] for row in state.rows] == [["12 Oak St", "650000"], ["4 Elm Rd", "1"], ["7 Ash Ln", "1"]]
+
+
+def test_records_only_pair_with_the_listing_they_name(tmp_path, monkeypatch):
+    # The record for 99 Pine Ave shares its price with the 4 Elm Rd card, but must not fill its row.
+    html = json_ld(HOUSE, {**HOUSE, "name": "99 Pine Ave", "url": "/homes/99"}) + \
+        "<article>12 Oak St</article><article>4 Elm Rd 650000</article>"
+
+    class PageCrawler:
+        def __init__(self, on_page=None, **kwargs):
+            self.on_page = on_page
+
+        def crawl(self, url):
+            self.on_page(url, html)
+            yield url, ["12 Oak St", "4 Elm Rd 650000"], None
+
+    sent = []
+
+    def fake_llm(data, prompt, **kwargs):
+        sent.extend(data)
+        yield 0, data, "Title,Price,Beds,URL\n" + "\n".join(f"{item},1,1,u" for item in data), True
+
+    monkeypatch.setattr(pipeline, "Crawler", PageCrawler)
+    monkeypatch.setattr(pipeline, "process_batches", fake_llm)
+    monkeypatch.setattr(pipeline, "FRONTIER_ENABLED", False)
+    monkeypatch.setattr(pipeline, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(pipeline, "COMPACTION_ENABLED", False)
+    state = list(run_pipeline("https://example.com/list", PROMPT, max_listings=10,
+                              output_path=str(tmp_path / "out.csv")))[-1]
+    assert sent == ["4 Elm Rd 650000"]
+    assert [row[0] for row in state.rows] == ["12 Oak St", "4 Elm Rd 650000"]
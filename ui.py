@@ -1,5 +1,6 @@
 import gradio as gr
 from main import run_scraper_live, update_config, load_config
+from config import MAX_PAGES
 
 
 def create_ui(cfg, run_scraper_live_fn, update_config_fn):
@@ -10,6 +11,9 @@ def create_ui(cfg, run_scraper_live_fn, update_config_fn):
             with gr.Row():
                 url_input = gr.Text(label="Website URL", value=cfg.get("URL", "https://example.com/"))
                 headless_toggle = gr.Checkbox(value=True, label="Run Headless")
+                incremental_toggle = gr.Checkbox(value=False, label="Incremental (new/changed listings only)")
+                layouts_toggle = gr.Checkbox(value=False, label="Use learned layouts (skip LLM when valid)")
+                resume_toggle = gr.Checkbox(value=True, label="Resume interrupted run")
 
             prompt_input = gr.Textbox(
                 label="Prompt Template",
@@ -19,15 +23,18 @@ def create_ui(cfg, run_scraper_live_fn, update_config_fn):
 
             with gr.Row():
                 engine_choice = gr.Dropdown(
-                    ["requests", "selenium", "playwright"],
-                    value="playwright",
+                    ["auto", "requests", "async", "selenium", "selenium-pool", "playwright", "playwright-pool",
+                     "replay"],
+                    value="auto",
                     label="Scraper Engine"
                 )
                 retry_slider = gr.Slider(minimum=1, maximum=5, value=3, label="Retries")
-                listing_slider = gr.Slider(minimum=1, maximum=20, value=5, step=1, label="🔢 Listings to Analyze")
+                listing_slider = gr.Slider(minimum=1, maximum=500, value=5, step=1, label="🔢 Listings to Analyze")
+                pages_slider = gr.Slider(minimum=1, maximum=50, value=MAX_PAGES, step=1, label="📑 Pages to Crawl")
 
             with gr.Row():
                 run_button = gr.Button("🚀 Start Scraper")
+                cancel_btn = gr.Button("⏹️ Cancel", variant="stop")
                 reset_btn = gr.Button("♻️ Reset", variant="secondary")
             
             with gr.Row():
@@ -43,12 +50,15 @@ def create_ui(cfg, run_scraper_live_fn, update_config_fn):
                 )
                 download_link = gr.File(label="📁 Download CSV File")
 
-            run_button.click(
+            run_event = run_button.click(
                 fn=run_scraper_live_fn,
-                inputs=[url_input, prompt_input, engine_choice, headless_toggle, retry_slider, listing_slider],
+                inputs=[url_input, prompt_input, engine_choice, headless_toggle, retry_slider, listing_slider, pages_slider, incremental_toggle,
+                        layouts_toggle, resume_toggle],
                 outputs=[logs_box, output_box, csv_table, download_link]
             )
 
+            cancel_btn.click(fn=None, inputs=None, outputs=None, cancels=[run_event])
+
             reset_btn.click(
                 lambda: ("", "", [], None),
                 inputs=[],